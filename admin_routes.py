@@ -0,0 +1,38 @@
+import sys
+from flask import Blueprint, jsonify
+from models import db
+from routes.auth_routes import token_required, token_cache_stats
+from request_metrics import metrics
+from stock_events import hub
+import response_cache
+import audit_log
+
+admin_bp = Blueprint('admin', __name__)
+
+@admin_bp.route('/metrics', methods=['GET'])
+@token_required
+def get_metrics(current_user):
+    if current_user.role != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
+
+    # Per-endpoint stats need METRICS_ENABLED; the subsystem counters are always live.
+    # Everything here is for the worker process that served this request.
+    email = sys.modules.get('utils.email_sender')  # None until this worker sent its first alert
+    output = metrics.snapshot()
+    output.update({
+        'db_pool': db.engine.pool.status(),
+        'token_cache': token_cache_stats(),
+        'response_cache': response_cache.stats(),
+        'stock_stream': hub.stats(),
+        'email': email.get_stats() if email else None,
+        'audit_log_pending': audit_log.pending()
+    })
+    return jsonify(output)
+
+@admin_bp.route('/metrics', methods=['DELETE'])
+@token_required
+def reset_metrics(current_user):
+    if current_user.role != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
+    metrics.reset()
+    return jsonify({'message': 'Metrics reset'})
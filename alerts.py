@@ -0,0 +1,111 @@
+import atexit
+import threading
+from sqlalchemy import event
+from cache import TTLCache
+from config import Config
+from inventory_stats import is_low
+from models import User
+
+# Admin recipient list, refreshed on any User change or after the TTL
+_recipients = TTLCache(maxsize=1, ttl=Config.ALERT_RECIPIENT_TTL)
+
+# product_id -> latest (name, sku, stock, threshold) waiting for the next digest
+_pending = {}
+_pending_recipients = []
+_lock = threading.Lock()
+_timer = None
+# Default for old_threshold: the threshold did not change (None is a cleared threshold)
+_UNCHANGED = object()
+
+def record_stock_change(product_id, name, sku, old_stock, new_stock, threshold, old_threshold=_UNCHANGED):
+    """
+    Call after a committed stock or threshold change. Alerts only when the
+    product crosses from above its threshold to at/below it, by a stock drop or
+    a raised threshold (pass old_threshold when it changed); a restock before
+    the digest goes out withdraws the pending alert. A NULL stock or threshold
+    is never low, as in the dashboard counters. Returns True if an alert was queued.
+    """
+    if not is_low(new_stock, threshold):
+        with _lock:
+            _pending.pop(product_id, None)
+        return False
+    if is_low(old_stock, threshold if old_threshold is _UNCHANGED else old_threshold):
+        # Already low before this change; just keep a pending digest entry current
+        with _lock:
+            if product_id in _pending:
+                _pending[product_id] = (name, sku, new_stock, threshold)
+        return False
+
+    recipients = get_admin_emails()
+    if not recipients:
+        return False
+
+    if Config.ALERT_DIGEST_INTERVAL <= 0:
+        _send_digest({product_id: (name, sku, new_stock, threshold)}, recipients)
+        return True
+
+    global _timer, _pending_recipients
+    with _lock:
+        _pending[product_id] = (name, sku, new_stock, threshold)
+        _pending_recipients = recipients
+        if _timer is None:
+            _timer = threading.Timer(Config.ALERT_DIGEST_INTERVAL, flush_digest)
+            _timer.daemon = True
+            _timer.start()
+    return True
+
+def flush_digest():
+    # Sends everything collected since the last digest, one email per admin
+    global _timer, _pending
+    with _lock:
+        pending, _pending = _pending, {}
+        recipients = _pending_recipients
+        if _timer is not None:
+            _timer.cancel()
+            _timer = None
+    if pending:
+        _send_digest(pending, recipients)
+
+atexit.register(flush_digest)
+
+def get_admin_emails():
+    # Needs an app context on a cache miss
+    emails = _recipients.get('admins')
+    if emails is None:
+        rows = User.query.with_entities(User.email).filter_by(role='admin').all()
+        emails = [row.email for row in rows if row.email]
+        _recipients.set('admins', emails)
+    return emails
+
+@event.listens_for(User, 'after_insert')
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_recipients(mapper, connection, target):
+    _recipients.clear()
+
+def _send_digest(pending, recipients):
+    items = sorted(pending.values(), key=lambda item: item[2])
+    if len(items) == 1:
+        subject = f"URGENT: Low Stock Report - {items[0][0]}"
+    else:
+        subject = f"URGENT: Low Stock Report - {len(items)} products"
+
+    body = "LOW STOCK REPORT\n"
+    for name, sku, stock, threshold in items:
+        body += (
+            f"--------------------------------------------------\n"
+            f"Product Name : {name}\n"
+            f"SKU          : {sku}\n"
+            f"Current Stock: {stock} (Below Limit)\n"
+            f"Min Threshold: {threshold}\n"
+        )
+    body += (
+        f"--------------------------------------------------\n\n"
+        f"STATUS: CRITICAL ACTION REQUIRED\n"
+        f"Immediate action is required to restock {'this item' if len(items) == 1 else 'these items'} "
+        f"and prevent stock-outs.\n"
+    )
+    # The SMTP stack (and .env loading) is imported by the first alert, not at worker boot
+    from utils.email_sender import send_email_async
+    for email in recipients:
+        send_email_async(subject, email, body)
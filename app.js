@@ -190,8 +190,8 @@ async function loadDashboardStats() {
         // Initialize Chart
         const ctx = document.getElementById('inventoryChart');
         if (ctx) {
-            // Fetch products and group by category for the chart.
-            const pData = await apiCall('/products');
+            // Fetch products and group by category for the chart (only the columns it needs).
+            const pData = await apiCall('/products?fields=category,stock_quantity');
             const categories = {};
             pData.products.forEach(p => {
                 const cat = p.category || 'Other';
@@ -368,7 +368,7 @@ async function loadProductsView() {
     let html = `
         <div class="actions" style="margin-bottom: 20px;">
             ${userRole === 'admin' ? '<button class="btn btn-primary" onclick="showAddProductModal()">+ Add Product</button>' : ''}
-            <input type="text" id="product-search" placeholder="Search products..." style="padding: 8px; border: 1px solid #ddd; border-radius: 4px; width: 200px;" onkeyup="filterProducts()">
+            <input type="text" id="product-search" placeholder="Search products..." style="padding: 8px; border: 1px solid #ddd; border-radius: 4px; width: 200px;" oninput="filterProducts()">
         </div>
         
         <!-- Add Product Form (Hidden by default, or modal) -->
@@ -407,6 +407,7 @@ async function loadProductsView() {
                 <tr><td colspan="7">Loading...</td></tr>
             </tbody>
         </table>
+        <button id="products-load-more" class="btn btn-primary" style="display: none; margin-top: 10px;">Load more</button>
     `;
 
     contentArea.innerHTML = html;
@@ -416,24 +417,41 @@ async function loadProductsView() {
         document.getElementById('add-product-form').addEventListener('submit', handleAddProduct);
     }
 
+    loadProductPage();
+}
+
+const PRODUCT_PAGE_SIZE = 50;
+
+// One page of products matching the search box; "Load more" follows next_cursor and appends
+async function loadProductPage(cursor = null) {
+    const tbody = document.getElementById('products-table-body');
+    const loadMore = document.getElementById('products-load-more');
+    const query = document.getElementById('product-search').value.trim();
+    const params = new URLSearchParams({ limit: PRODUCT_PAGE_SIZE });
+    if (query) params.set('q', query);
+    if (cursor) params.set('cursor', cursor);
     try {
-        const data = await apiCall('/products');
-        renderProductsTable(data.products);
+        const data = await apiCall('/products?' + params.toString());
+        // A newer search replaced the box contents while this page was loading
+        if (document.getElementById('product-search').value.trim() !== query) return;
+        loadMore.style.display = data.next_cursor ? '' : 'none';
+        loadMore.onclick = () => loadProductPage(data.next_cursor);
+        renderProductsTable(data.products, cursor !== null);
     } catch (e) {
-        contentArea.innerHTML += `<p style="color:red">Error loading products: ${e.message}</p>`;
+        tbody.innerHTML = `<tr><td colspan="7" style="color:red">Error loading products: ${e.message}</td></tr>`;
     }
 }
 
-function renderProductsTable(products) {
+function renderProductsTable(products, append = false) {
     const tbody = document.getElementById('products-table-body');
     const userRole = localStorage.getItem('user_role');
 
-    if (products.length === 0) {
+    if (!append && products.length === 0) {
         tbody.innerHTML = '<tr><td colspan="7">No products found.</td></tr>';
         return;
     }
 
-    tbody.innerHTML = products.map(p => {
+    const rows = products.map(p => {
         const status = p.stock_quantity <= p.min_stock_threshold ?
             `<span style="color:red; font-weight:bold;">Low Stock</span>` :
             `<span style="color:green;">In Stock</span>`;
@@ -453,6 +471,11 @@ function renderProductsTable(products) {
             </tr>
         `;
     }).join('');
+    if (append) {
+        tbody.insertAdjacentHTML('beforeend', rows);
+    } else {
+        tbody.innerHTML = rows;
+    }
 }
 
 function showAddProductModal() {
@@ -485,13 +508,11 @@ async function deleteProduct(id) {
     }
 }
 
+// Searches server-side (SKU, name, category, supplier) once typing pauses
+let productSearchTimer = null;
 function filterProducts() {
-    const query = document.getElementById('product-search').value.toLowerCase();
-    const rows = document.querySelectorAll('#products-table-body tr');
-    rows.forEach(row => {
-        const text = row.innerText.toLowerCase();
-        row.style.display = text.includes(query) ? '' : 'none';
-    });
+    clearTimeout(productSearchTimer);
+    productSearchTimer = setTimeout(() => loadProductPage(), 250);
 }
 
 // Transaction Management
@@ -541,6 +562,7 @@ async function loadTransactionsView() {
                 <tr><td colspan="5">Loading...</td></tr>
             </tbody>
         </table>
+        <button id="tx-load-more" class="btn btn-primary" style="display: none; margin-top: 10px;">Load more</button>
     `;
 
     contentArea.innerHTML = html;
@@ -549,7 +571,7 @@ async function loadTransactionsView() {
 
     // Load Products for Select
     try {
-        const pData = await apiCall('/products');
+        const pData = await apiCall('/products?fields=id,sku,name,stock_quantity');
         const select = document.getElementById('tx-product-select');
         select.innerHTML = '<option value="">-- Select Product --</option>' +
             pData.products.map(p => `<option value="${p.id}">${p.sku} - ${p.name} (Stock: ${p.stock_quantity})</option>`).join('');
@@ -561,15 +583,19 @@ async function loadTransactionsView() {
     loadTransactionHistory();
 }
 
-async function loadTransactionHistory() {
+// The API returns one page (newest first) plus next_cursor; "Load more" appends the next page
+async function loadTransactionHistory(cursor = null) {
     const tbody = document.getElementById('tx-table-body');
+    const loadMore = document.getElementById('tx-load-more');
     try {
-        const data = await apiCall('/transactions');
-        if (data.transactions.length === 0) {
+        const data = await apiCall('/transactions' + (cursor ? `?cursor=${encodeURIComponent(cursor)}` : ''));
+        loadMore.style.display = data.next_cursor ? '' : 'none';
+        loadMore.onclick = () => loadTransactionHistory(data.next_cursor);
+        if (!cursor && data.transactions.length === 0) {
             tbody.innerHTML = '<tr><td colspan="5">No transactions found.</td></tr>';
             return;
         }
-        tbody.innerHTML = data.transactions.map(t => `
+        const rows = data.transactions.map(t => `
             <tr>
                 <td>${new Date(t.timestamp).toLocaleString()}</td>
                 <td>${t.product_sku} - ${t.product_name}</td>
@@ -582,6 +608,11 @@ async function loadTransactionHistory() {
                 <td>${t.user}</td>
             </tr>
         `).join('');
+        if (cursor) {
+            tbody.insertAdjacentHTML('beforeend', rows);
+        } else {
+            tbody.innerHTML = rows;
+        }
     } catch (e) {
         tbody.innerHTML = `<tr><td colspan="5" style="color:red">${e.message}</td></tr>`;
     }
@@ -600,7 +631,7 @@ async function handleTransaction(e) {
         // Also refresh product list in dropdown to show new stock? 
         // Ideally yes, but for MVP maybe just letting them know is fine or re-fetch.
         // Let's re-fetch products to update stock in dropdown
-        const pData = await apiCall('/products');
+        const pData = await apiCall('/products?fields=id,sku,name,stock_quantity');
         const select = document.getElementById('tx-product-select');
         const currentVal = select.value;
         select.innerHTML = '<option value="">-- Select Product --</option>' +
@@ -681,13 +712,8 @@ async function rejectUser(id) {
 
 async function loadAdminLogsView() {
     const contentArea = document.getElementById('content-area');
-    contentArea.innerHTML = '<h3>Employee Login Logs</h3><div id="logs-list">Loading...</div>';
-
-    try {
-        const data = await apiCall('/auth/logs');
-        const logs = data.logs;
-
-        let html = `
+    contentArea.innerHTML = `
+        <h3>Employee Login Logs</h3>
         <div class="table-container">
         <table id="logs-table">
             <thead>
@@ -699,32 +725,52 @@ async function loadAdminLogsView() {
                     <th>Duration</th>
                 </tr>
             </thead>
-            <tbody>
-        `;
+            <tbody id="logs-table-body">
+                <tr><td colspan="5">Loading...</td></tr>
+            </tbody>
+        </table>
+        </div>
+        <button id="logs-load-more" class="btn btn-primary" style="display: none; margin-top: 10px;">Load more</button>
+    `;
+    loadLoginLogs();
+}
 
-        if (logs.length === 0) {
-            html += '<tr><td colspan="5">No logs found.</td></tr>';
-        } else {
-            logs.forEach(log => {
-                const loginDate = new Date(log.login_time);
-                const logoutDate = log.logout_time ? new Date(log.logout_time) : null;
-                const duration = logoutDate ? Math.round((logoutDate - loginDate) / 60000) + ' mins' : 'Active';
+// One page of logs (newest first); "Load more" follows next_cursor and appends
+async function loadLoginLogs(cursor = null) {
+    const tbody = document.getElementById('logs-table-body');
+    const loadMore = document.getElementById('logs-load-more');
+    try {
+        const data = await apiCall('/auth/logs' + (cursor ? `?cursor=${encodeURIComponent(cursor)}` : ''));
+        const logs = data.logs;
+        loadMore.style.display = data.next_cursor ? '' : 'none';
+        loadMore.onclick = () => loadLoginLogs(data.next_cursor);
 
-                html += `
-                <tr>
-                    <td>${log.name || log.username}</td>
-                    <td>${log.role}</td>
-                    <td>${loginDate.toLocaleString()}</td>
-                    <td>${logoutDate ? logoutDate.toLocaleString() : '-'}</td>
-                    <td>${duration}</td>
-                </tr>
-                `;
-            });
+        if (!cursor && logs.length === 0) {
+            tbody.innerHTML = '<tr><td colspan="5">No logs found.</td></tr>';
+            return;
         }
+        let html = '';
+        logs.forEach(log => {
+            const loginDate = new Date(log.login_time);
+            const logoutDate = log.logout_time ? new Date(log.logout_time) : null;
+            const duration = logoutDate ? Math.round((logoutDate - loginDate) / 60000) + ' mins' : 'Active';
 
-        html += `</tbody></table></div>`;
-        contentArea.innerHTML = html;
+            html += `
+            <tr>
+                <td>${log.name || log.username}</td>
+                <td>${log.role}</td>
+                <td>${loginDate.toLocaleString()}</td>
+                <td>${logoutDate ? logoutDate.toLocaleString() : '-'}</td>
+                <td>${duration}</td>
+            </tr>
+            `;
+        });
+        if (cursor) {
+            tbody.insertAdjacentHTML('beforeend', html);
+        } else {
+            tbody.innerHTML = html;
+        }
     } catch (e) {
-        contentArea.innerHTML = `<p style="color:red">Error loading logs: ${e.message}</p>`;
+        tbody.innerHTML = `<tr><td colspan="5" style="color:red">Error loading logs: ${e.message}</td></tr>`;
     }
 }
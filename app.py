@@ -1,33 +1,92 @@
-from flask import Flask, render_template
+import importlib
+import click
+from flask import Flask, render_template, jsonify
 from flask_cors import CORS
 from config import Config
 from models import db
-from flask_migrate import Migrate
+from sqlalchemy.exc import OperationalError
+from db_engine import engine_options, configure_engine, is_statement_timeout
+from request_metrics import metrics
 
-app = Flask(__name__)
-app.config.from_object(Config)
+# Subsystems the request path imports on first use (analytics, exports, email).
+# A preloading server imports them once in the master so forked workers share them.
+DEFERRED_MODULES = (
+    'numpy', 'forecasting', 'classification', 'stock_history', 'exporter', 'utils.email_sender'
+)
 
-# Initialize Extensions
-CORS(app)
-db.init_app(app)
-migrate = Migrate(app, db)
+def create_app(config=Config):
+    """
+    Application factory: `config` is anything app.config.from_object accepts
+    (a class such as Config, an object or an import path).
+    """
+    app = Flask(__name__)
+    app.config.from_object(config)
+    if app.config['PROXY_COUNT']:
+        # request.remote_addr (login and registration throttling) becomes the client from X-Forwarded-For
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        count = app.config['PROXY_COUNT']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=count, x_proto=count, x_host=count)
 
-# Register Blueprints (Importing here to avoid circular dependencies)
-from routes.auth_routes import auth_bp
-from routes.product_routes import product_bp
-from routes.transaction_routes import transaction_bp
-from routes.report_routes import report_bp
+    # Initialize Extensions
+    CORS(app)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    db.init_app(app)
+    with app.app_context():
+        configure_engine(db.engine, app.config)
+        if app.config['METRICS_ENABLED']:
+            metrics.init_app(app, db.engine)
+    # Flask-Migrate pulls in alembic; only the `flask db ...` commands need it
+    if click.get_current_context(silent=True) is not None:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+    # Register Blueprints (Importing here to avoid circular dependencies)
+    from routes.auth_routes import auth_bp
+    from routes.product_routes import product_bp
+    from routes.transaction_routes import transaction_bp
+    from routes.report_routes import report_bp
+    from routes.admin_routes import admin_bp
+    from routes.location_routes import location_bp
+
+    app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(product_bp, url_prefix='/api/products')
+    app.register_blueprint(transaction_bp, url_prefix='/api/transactions')
+    app.register_blueprint(report_bp, url_prefix='/api/reports')
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
+    app.register_blueprint(location_bp, url_prefix='/api/locations')
+
+    app.add_url_rule('/', 'index', index)
+    app.register_error_handler(OperationalError, database_unavailable)
+    return app
 
-app.register_blueprint(auth_bp, url_prefix='/api/auth')
-app.register_blueprint(product_bp, url_prefix='/api/products')
-app.register_blueprint(transaction_bp, url_prefix='/api/transactions')
-app.register_blueprint(report_bp, url_prefix='/api/reports')
+def preload_deferred():
+    for name in DEFERRED_MODULES:
+        importlib.import_module(name)
 
-@app.route('/')
 def index():
     return render_template('index.html')
 
+def database_unavailable(e):
+    # Lock waits past DB_BUSY_TIMEOUT and statements past DB_STATEMENT_TIMEOUT end up here
+    db.session.rollback()
+    if is_statement_timeout(e):
+        return jsonify({'message': 'Query took too long. Narrow the request and try again.'}), 503
+    return jsonify({'message': 'Database is busy. Please try again.'}), 503, {'Retry-After': '1'}
+
+_default_app = None
+
+def __getattr__(name):
+    # `from app import app` (utility scripts, gunicorn app:app) builds the default app on first use,
+    # so importing this module for create_app() alone doesn't construct one
+    global _default_app
+    if name == 'app':
+        if _default_app is None:
+            _default_app = create_app()
+        return _default_app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 if __name__ == '__main__':
+    app = create_app()
     with app.app_context():
         db.create_all()
     app.run(debug=True)
@@ -0,0 +1,183 @@
+import atexit
+import datetime
+import threading
+from flask import current_app
+from sqlalchemy import insert, update, select, bindparam
+from config import Config
+from models import db, LoginLog
+
+# Write-behind buffer for login/logout audit rows. Requests only append to
+# memory; a background thread writes everything in one transaction at most
+# AUDIT_FLUSH_INTERVAL seconds later, which is also the durability bound.
+_lock = threading.Lock()
+_wakeup = threading.Event()
+_logins = []          # [{'user_id', 'login_time', 'logout_time'}] not yet written
+_logouts = {}         # user_id -> logout_time for logins already in the database
+_attempts = {}        # rejected row -> failed writes so far (see _flush_each)
+_app = None
+_thread = None
+
+def record_login(user_id):
+    _enqueue(lambda: _logins.append({
+        'user_id': user_id, 'login_time': datetime.datetime.utcnow(), 'logout_time': None
+    }))
+
+def record_logout(user_id):
+    now = datetime.datetime.utcnow()
+
+    def apply():
+        # Logout of a login still in the buffer: just complete the buffered row
+        for row in reversed(_logins):
+            if row['user_id'] == user_id:
+                if row['logout_time'] is None:
+                    row['logout_time'] = now
+                return
+        _logouts[user_id] = now
+    _enqueue(apply)
+
+def pending():
+    with _lock:
+        return len(_logins) + len(_logouts)
+
+def flush():
+    """
+    Writes all buffered audit rows now. Needs an app context (the flusher
+    thread and the atexit hook provide their own).
+    """
+    global _logins, _logouts
+    with _lock:
+        logins, _logins = _logins, []
+        logouts, _logouts = _logouts, {}
+    if not logins and not logouts:
+        return 0
+
+    try:
+        _write(logins, logouts)
+        db.session.commit()
+        return len(logins) + len(logouts)
+    except Exception as e:
+        db.session.rollback()
+        print(f"Audit log flush failed: {e}")
+    # One bad row (e.g. its user was deleted meanwhile) must not hold back the others
+    return _flush_each(logins, logouts)
+
+def _write(logins, logouts):
+    if logins:
+        db.session.execute(insert(LoginLog), logins)
+    if logouts:
+        # Close the user's most recent session if still open (index seek on user_id, login_time)
+        # (Core table: an ORM update() with a parameter list would mean bulk-by-primary-key)
+        log = LoginLog.__table__
+        latest = select(log.c.id).where(
+            log.c.user_id == bindparam('uid')
+        ).order_by(log.c.login_time.desc()).limit(1).scalar_subquery()
+        db.session.execute(
+            update(log).where(log.c.id == latest, log.c.logout_time.is_(None))
+            .values(logout_time=bindparam('ts')),
+            [{'uid': uid, 'ts': ts} for uid, ts in logouts.items()]
+        )
+
+def _flush_each(logins, logouts):
+    """
+    Retries a failed batch one row at a time, each under a savepoint. A row that
+    fails while the database is reachable is rejected; after AUDIT_MAX_ATTEMPTS
+    rejections it is dropped (and logged) instead of blocking every later flush.
+    During an outage nothing counts against the rows: all of them are kept.
+    """
+    rejected_logins, rejected_logouts = [], {}
+    written = 0
+    try:
+        for row in logins:
+            if _write_savepoint([row], {}):
+                written += 1
+                _attempts.pop(('login', row['user_id'], row['login_time']), None)
+            else:
+                rejected_logins.append(row)
+        for uid, ts in logouts.items():
+            if _write_savepoint([], {uid: ts}):
+                written += 1
+                _attempts.pop(('logout', uid, ts), None)
+            else:
+                rejected_logouts[uid] = ts
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Audit log flush failed: {e}")
+        _requeue(logins, logouts)
+        return 0
+
+    if written or _database_reachable():
+        rejected_logins = [row for row in rejected_logins if _keep(('login', row['user_id'], row['login_time']), row)]
+        rejected_logouts = {uid: ts for uid, ts in rejected_logouts.items() if _keep(('logout', uid, ts), ts)}
+    _requeue(rejected_logins, rejected_logouts)
+    return written
+
+def _write_savepoint(logins, logouts):
+    try:
+        with db.session.begin_nested():
+            _write(logins, logouts)
+        return True
+    except Exception:
+        return False
+
+def _database_reachable():
+    try:
+        db.session.execute(select(1))
+        return True
+    except Exception:
+        return False
+    finally:
+        db.session.rollback()
+
+def _keep(key, row):
+    with _lock:
+        attempts = _attempts[key] = _attempts.get(key, 0) + 1
+        if attempts < Config.AUDIT_MAX_ATTEMPTS:
+            return True
+        del _attempts[key]
+    print(f"Audit log row dropped after {attempts} failed writes: {row}")
+    return False
+
+def _requeue(logins, logouts):
+    # Put the rows back so the next flush retries them
+    with _lock:
+        _logins[:0] = logins
+        for uid, ts in logouts.items():
+            _logouts.setdefault(uid, ts)
+
+def _enqueue(apply):
+    global _app
+    if _app is None:
+        _app = current_app._get_current_object()
+    with _lock:
+        apply()
+        pending = len(_logins) + len(_logouts)
+    _ensure_flusher()
+    if pending >= Config.AUDIT_BUFFER_LIMIT:
+        # Backpressure instead of dropping audit rows: the caller writes the backlog itself
+        flush()
+    elif pending >= Config.AUDIT_BATCH_SIZE:
+        _wakeup.set()
+
+def _ensure_flusher():
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return
+    with _lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_flush_loop, name='audit-log-flusher', daemon=True)
+            _thread.start()
+
+def _flush_loop():
+    while True:
+        _wakeup.wait(Config.AUDIT_FLUSH_INTERVAL)
+        _wakeup.clear()
+        with _app.app_context():
+            flush()
+
+def _flush_at_exit():
+    if _app is not None:
+        with _app.app_context():
+            flush()
+
+atexit.register(_flush_at_exit)
@@ -1,12 +1,27 @@
 from flask import Blueprint, request, jsonify
-from models import db, User, LoginLog
+from models import db, User, LoginLog, AuthEpoch
+from cache import TTLCache
+from collections import namedtuple
+from sqlalchemy import event, inspect, select, update, insert
 import jwt
+import time
 import datetime
 from config import Config
 from functools import wraps
 
 auth_bp = Blueprint('auth', __name__)
 
+# Detached snapshot of the user a token resolved to, safe to share across requests
+AuthUser = namedtuple('AuthUser', ['id', 'username', 'name', 'email', 'role', 'status'])
+
+_token_cache = TTLCache(maxsize=Config.AUTH_CACHE_SIZE, ttl=Config.AUTH_CACHE_TTL)
+
+# Columns copied into AuthUser: changing one in any worker must reach every worker's cache
+_PRINCIPAL_FIELDS = ('username', 'name', 'email', 'role', 'status')
+AUTH_EPOCH_ID = 1
+_epoch_seen = None
+_next_epoch_check = 0.0
+
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -17,21 +32,108 @@ def token_required(f):
         if not token:
             return jsonify({'message': 'Token is missing!'}), 401
         
-        try:
-            data = jwt.decode(token, Config.SECRET_KEY, algorithms=["HS256"])
-            current_user = User.query.filter_by(id=data['id']).first()
-        except:
+        current_user = resolve_token(token)
+        if current_user is None:
             return jsonify({'message': 'Token is invalid!'}), 401
         
         return f(current_user, *args, **kwargs)
     return decorated
 
-from werkzeug.security import generate_password_hash, check_password_hash
+def resolve_token(token):
+    # Returns the AuthUser for a valid token, or None
+    _sync_auth_epoch()
+    epoch = _epoch_seen
+    current_user = _token_cache.get(token)
+    if current_user is None:
+        try:
+            data = jwt.decode(token, Config.SECRET_KEY, algorithms=["HS256"])
+            user = User.query.filter_by(id=data['id']).first()
+        except:
+            return None
+        if not user:
+            return None
+
+        current_user = AuthUser(user.id, user.username, user.name, user.email, user.role, user.status)
+        # Never cache past the token's own expiry, nor a user read before a change this worker just saw
+        if epoch == _epoch_seen:
+            _token_cache.set(token, current_user, ttl=data.get('exp', time.time() + Config.AUTH_CACHE_TTL) - time.time())
+    return current_user
+
+def _sync_auth_epoch():
+    """
+    Drops this worker's cached tokens when another one changed a user. One
+    primary-key read at most every AUTH_EPOCH_CHECK_SECONDS, so approve/reject
+    and role changes reach every worker within that bound, not the cache TTL.
+    """
+    global _epoch_seen, _next_epoch_check
+    now = time.monotonic()
+    if now < _next_epoch_check:
+        return
+    _next_epoch_check = now + Config.AUTH_EPOCH_CHECK_SECONDS
+    epoch = db.session.execute(select(AuthEpoch.epoch).where(AuthEpoch.id == AUTH_EPOCH_ID)).scalar() or 0
+    if epoch != _epoch_seen:
+        _token_cache.clear()
+        _epoch_seen = epoch
+
+def token_cache_stats():
+    return _token_cache.stats()
+
+def invalidate_user_tokens(user_id):
+    return _token_cache.discard_where(lambda principal: principal.id == user_id)
+
+@event.listens_for(User, 'after_update')
+def _evict_changed_user(mapper, connection, target):
+    # Covers approve and any role change, wherever it is made: evicted here at once, in the
+    # other workers at their next epoch check. A password rehash changes nothing cached.
+    invalidate_user_tokens(target.id)
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in _PRINCIPAL_FIELDS):
+        _bump_auth_epoch(connection)
+
+@event.listens_for(User, 'after_delete')
+def _evict_deleted_user(mapper, connection, target):
+    # Reject deletes the user
+    invalidate_user_tokens(target.id)
+    _bump_auth_epoch(connection)
+
+def _bump_auth_epoch(connection):
+    # Runs in the flush's transaction, so the bump commits (or rolls back) with the change
+    epochs = AuthEpoch.__table__
+    bumped = connection.execute(
+        update(epochs).where(epochs.c.id == AUTH_EPOCH_ID).values(epoch=epochs.c.epoch + 1)
+    )
+    if bumped.rowcount == 0:
+        connection.execute(insert(epochs).values(id=AUTH_EPOCH_ID, epoch=1))
+
+from password_hashing import hash_password, verify_password, needs_rehash, HasherBusy, auth_throttle, login_failures
+from pagination import parse_limit, encode_cursor, decode_cursor, parse_datetime
+from sqlalchemy import tuple_
+from sqlalchemy.orm import joinedload
+import audit_log
 import datetime
 import jwt
 
+def _throttled():
+    if auth_throttle.allow(request.remote_addr):
+        return None
+    return _too_many(auth_throttle)
+
+def _too_many(limiter):
+    response = jsonify({'message': 'Too many attempts, try again later'})
+    response.headers['Retry-After'] = str(limiter.retry_after())
+    return response, 429
+
+def _busy():
+    response = jsonify({'message': 'Server busy, please retry'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
+    throttled = _throttled()
+    if throttled:
+        return throttled
+
     # Force parse JSON even if Content-Type is missing/wrong
     data = request.get_json(force=True, silent=True)
     
@@ -56,7 +158,10 @@ def register():
         role = 'admin'
         status = 'approved'
 
-    hashed_password = generate_password_hash(data['password'], method='scrypt')
+    try:
+        hashed_password = hash_password(data['password'])
+    except HasherBusy:
+        return _busy()
     new_user = User(
         username=data['username'], 
         password_hash=hashed_password, 
@@ -77,13 +182,27 @@ def login():
     if not data or not data.get('username') or not data.get('password'):
         return jsonify({'message': 'Missing data'}), 400
 
+    # Only failures count, per username and client IP (see PROXY_COUNT behind a proxy),
+    # and the check comes before the hash so a guessing run can't burn scrypt time either
+    attempt = (str(data['username']), request.remote_addr)
+    if login_failures.blocked(attempt):
+        return _too_many(login_failures)
+
     user = User.query.filter_by(username=data['username']).first()
 
-    if not user or not check_password_hash(user.password_hash, data['password']):
-        return jsonify({'message': 'Invalid credentials'}), 401
-        
-    if user.status != 'approved':
-        return jsonify({'message': 'Account is pending approval.'}), 403
+    try:
+        if not user or not verify_password(user.password_hash, data['password']):
+            login_failures.record(attempt)
+            return jsonify({'message': 'Invalid credentials'}), 401
+            
+        if user.status != 'approved':
+            return jsonify({'message': 'Account is pending approval.'}), 403
+
+        # Transparently upgrade hashes made with older cost parameters
+        if needs_rehash(user.password_hash):
+            user.password_hash = hash_password(data['password'])
+    except HasherBusy:
+        return _busy()
 
     token = jwt.encode({
         'id': user.id,
@@ -91,10 +210,11 @@ def login():
         'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24)
     }, Config.SECRET_KEY, algorithm="HS256")
 
-    # Record Login Time
-    login_log = LoginLog(user_id=user.id)
-    db.session.add(login_log)
-    db.session.commit()
+    if db.session.dirty:
+        db.session.commit()
+
+    # Record Login Time (written behind by audit_log's flusher)
+    audit_log.record_login(user.id)
 
     return jsonify({"token": token, "role": user.role, "username": user.username})
 
@@ -125,6 +245,7 @@ def approve_user(current_user, id):
     user = User.query.get_or_404(id)
     user.status = 'approved'
     db.session.commit()
+    invalidate_user_tokens(id)
     return jsonify({'message': 'User approved'})
 
 @auth_bp.route('/reject/<int:id>', methods=['DELETE'])
@@ -136,18 +257,14 @@ def reject_user(current_user, id):
     user = User.query.get_or_404(id)
     db.session.delete(user)
     db.session.commit()
+    invalidate_user_tokens(id)
     return jsonify({'message': 'User rejected'})
 
 @auth_bp.route('/logout', methods=['POST'])
 @token_required
 def logout(current_user):
-    # Find the most recent login log for this user
-    last_log = LoginLog.query.filter_by(user_id=current_user.id).order_by(LoginLog.login_time.desc()).first()
-    
-    if last_log and not last_log.logout_time:
-        last_log.logout_time = datetime.datetime.utcnow()
-        db.session.commit()
-        
+    # Closes the most recent login log for this user, if still open
+    audit_log.record_logout(current_user.id)
     return jsonify({'message': 'Logged out successfully'})
 
 @auth_bp.route('/logs', methods=['GET'])
@@ -156,8 +273,29 @@ def get_login_logs(current_user):
     if current_user.role != 'admin':
         return jsonify({'message': 'Unauthorized'}), 403
         
-    # Join with User to get details efficiently if needed, but relationship works too
-    logs = LoginLog.query.order_by(LoginLog.login_time.desc()).all()
+    try:
+        limit = parse_limit(request.args)
+        # Newest first; the user is joined in so the loop below does no extra queries
+        query = LoginLog.query.options(joinedload(LoginLog.user)).order_by(
+            LoginLog.login_time.desc(), LoginLog.id.desc()
+        )
+        if request.args.get('user_id'):
+            query = query.filter(LoginLog.user_id == int(request.args['user_id']))
+        cursor = request.args.get('cursor')
+        if cursor:
+            login_time, log_id = decode_cursor(cursor)
+            query = query.filter(
+                tuple_(LoginLog.login_time, LoginLog.id) < tuple_(parse_datetime(login_time), int(log_id))
+            )
+    except (ValueError, TypeError):
+        return jsonify({'message': 'Invalid query parameters'}), 400
+
+    # Show this worker's buffered logins too
+    audit_log.flush()
+    logs = query.limit(limit + 1).all()
+    has_more = len(logs) > limit
+    logs = logs[:limit]
+
     output = []
     for log in logs:
         output.append({
@@ -167,6 +305,12 @@ def get_login_logs(current_user):
             'login_time': log.login_time.isoformat(),
             'logout_time': log.logout_time.isoformat() if log.logout_time else None
         })
-    return jsonify({'logs': output})
-
+    next_cursor = encode_cursor(logs[-1].login_time, logs[-1].id) if has_more else None
+    return jsonify({'logs': output, 'next_cursor': next_cursor})
 
+@auth_bp.route('/cache-stats', methods=['GET'])
+@token_required
+def get_auth_cache_stats(current_user):
+    if current_user.role != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
+    return jsonify(token_cache_stats())
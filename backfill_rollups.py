@@ -0,0 +1,22 @@
+import sys
+import time
+from app import create_app, db
+from config import BatchConfig
+from pagination import parse_datetime
+from rollups import rebuild
+from models import MovementRollup
+
+app = create_app(BatchConfig)
+
+# Rebuilds the hour/day movement rollups from the transaction ledger.
+#   python backfill_rollups.py              (everything)
+#   python backfill_rollups.py 2024-06-01   (only from that day on)
+with app.app_context():
+    since = parse_datetime(sys.argv[1]) if len(sys.argv) > 1 else None
+    if since is None:
+        # A full rebuild recreates the table, which also picks up key changes (e.g. location_id)
+        MovementRollup.__table__.drop(db.engine, checkfirst=True)
+    db.create_all()
+    started = time.perf_counter()
+    count = rebuild(since)
+    print(f"Rolled up {count} transactions in {time.perf_counter() - started:.1f}s")
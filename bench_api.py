@@ -0,0 +1,290 @@
+"""
+REST API benchmark harness.
+
+Seeds a synthetic catalog and transaction ledger into a throwaway SQLite
+database (or --database-url), then drives the app's endpoints in-process at a
+configurable concurrency and reports, per scenario: throughput, p50/p90/p99
+latency, status codes and SQL queries/time per request (counted with engine
+events, so N+1 patterns show up as a queries-per-request jump).
+
+Results are written as JSON; pass an earlier file to --compare to print the
+change per scenario.
+
+    python bench_api.py --products 10000 --transactions 200000 --concurrency 8
+    python bench_api.py --scenarios products_list transactions_list --requests 500 --output after.json --compare before.json
+
+Only use --database-url with a disposable database: it is dropped and re-seeded.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+
+SEARCH_WORDS = ['steel', 'cotton', 'organic', 'premium', 'classic', 'mini', 'pro', 'eco', 'smart', 'deluxe']
+CATEGORIES = ['Electronics', 'Grocery', 'Apparel', 'Home', 'Toys', 'Garden', 'Beauty', 'Sports']
+SUPPLIERS = [f'Supplier {i}' for i in range(40)]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--transactions', type=int, default=100000)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--history-days', type=int, default=90, help='ledger timestamps are spread over this many days')
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=DEFAULT_SCENARIOS)
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads per scenario')
+    parser.add_argument('--requests', type=int, default=300, help='requests per scenario')
+    parser.add_argument('--warmup', type=int, default=10, help='untimed requests per scenario')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--database-url', help='disposable database to seed (default: temp SQLite file)')
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', help='earlier results file to diff against')
+    return parser.parse_args()
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))]
+
+
+# ---------------------------------------------------------------- seeding
+
+def seed(db, args):
+    """Bulk-inserts users, products and a ledger through Core executemany, in chunks."""
+    import numpy as np
+    from sqlalchemy import insert
+    from werkzeug.security import generate_password_hash
+    from models import User, Product, Transaction
+    from inventory_stats import reconcile
+
+    rng = np.random.default_rng(args.seed)
+    password_hash = generate_password_hash('benchpass')
+    db.session.execute(insert(User), [
+        {'username': 'admin' if i == 0 else f'user{i}', 'password_hash': password_hash,
+         'role': 'admin' if i == 0 else 'employee', 'name': f'User {i}', 'email': f'user{i}@bench.local',
+         'status': 'approved'}
+        for i in range(max(args.users, 1))
+    ])
+
+    chunk = 10000
+    for start in range(0, args.products, chunk):
+        n = min(chunk, args.products - start)
+        words = rng.integers(0, len(SEARCH_WORDS), size=(n, 2))
+        db.session.execute(insert(Product), [
+            {'sku': f'SKU-{start + i:07d}',
+             'name': f'{SEARCH_WORDS[words[i, 0]].title()} {SEARCH_WORDS[words[i, 1]]} item {start + i}',
+             'category': CATEGORIES[(start + i) % len(CATEGORIES)],
+             'supplier': SUPPLIERS[(start + i) % len(SUPPLIERS)],
+             'price': float(round(rng.uniform(1, 500), 2)),
+             'stock_quantity': int(rng.integers(0, 500)),
+             'min_stock_threshold': int(rng.integers(5, 50))}
+            for i in range(n)
+        ])
+        db.session.commit()
+
+    now = datetime.datetime.utcnow()
+    span = args.history_days * 86400
+    for start in range(0, args.transactions, chunk * 5):
+        n = min(chunk * 5, args.transactions - start)
+        # Skewed popularity so a few SKUs dominate, like a real ledger
+        products = np.minimum(rng.zipf(1.3, n), args.products)
+        offsets = np.sort(rng.integers(0, span, n))
+        kinds = rng.random(n) < 0.75
+        qty = rng.integers(1, 20, n)
+        users = rng.integers(1, max(args.users, 1) + 1, n)
+        base = now - datetime.timedelta(seconds=span)
+        db.session.execute(insert(Transaction), [
+            {'product_id': int(products[i]), 'quantity': int(qty[i]),
+             'transaction_type': 'out' if kinds[i] else 'in',
+             'timestamp': base + datetime.timedelta(seconds=int(offsets[i])), 'user_id': int(users[i])}
+            for i in range(n)
+        ])
+        db.session.commit()
+    reconcile()
+
+
+# ---------------------------------------------------------------- scenarios
+
+def _product_id(ctx):
+    return random.randint(1, ctx['products'])
+
+SCENARIOS = {
+    'products_list': lambda ctx: ('GET', '/api/products?limit=50', None),
+    'products_search': lambda ctx: ('GET', f"/api/products?q={random.choice(SEARCH_WORDS)[:4]}&limit=50", None),
+    'products_filter': lambda ctx: ('GET', f"/api/products?category={random.choice(CATEGORIES)}&sort=stock_quantity&limit=50", None),
+    'transactions_list': lambda ctx: ('GET', '/api/transactions?limit=50', None),
+    'transactions_by_product': lambda ctx: ('GET', f'/api/transactions?product_id={_product_id(ctx)}&limit=50', None),
+    'transaction_create': lambda ctx: ('POST', '/api/transactions', {
+        'product_id': _product_id(ctx), 'quantity': 1, 'transaction_type': 'in'
+    }),
+    'reports_stats': lambda ctx: ('GET', '/api/reports/stats', None),
+    'reports_reorder': lambda ctx: ('GET', '/api/reports/reorder?limit=50', None),
+    'reports_export': lambda ctx: ('GET', '/api/reports/export/products?format=ndjson', None),
+    'auth_login': lambda ctx: ('POST', '/api/auth/login', {
+        'username': f'user{random.randint(1, max(ctx["users"] - 1, 1))}', 'password': 'benchpass'
+    }),
+    'login_logs': lambda ctx: ('GET', '/api/auth/logs?limit=50', None)
+}
+DEFAULT_SCENARIOS = ['products_list', 'products_search', 'products_filter', 'transactions_list',
+                     'transactions_by_product', 'transaction_create', 'reports_stats', 'reports_reorder', 'auth_login']
+
+
+class QueryCounter:
+    # Per-thread SQL statement count and time; the test client runs each request on the calling thread
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self._local = threading.local()
+        event.listen(engine, 'before_cursor_execute', self._before)
+        event.listen(engine, 'after_cursor_execute', self._after)
+
+    def reset(self):
+        self._local.count, self._local.seconds = 0, 0.0
+
+    def read(self):
+        return getattr(self._local, 'count', 0), getattr(self._local, 'seconds', 0.0)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        self._local.started = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        self._local.count = getattr(self._local, 'count', 0) + 1
+        self._local.seconds = getattr(self._local, 'seconds', 0.0) + time.perf_counter() - self._local.started
+
+
+def run_scenario(app, name, ctx, counter, args):
+    make_request = SCENARIOS[name]
+    latencies, queries, sql_seconds, statuses = [], [], [], {}
+    lock = threading.Lock()
+    remaining = [args.requests]
+
+    def client_loop():
+        client = app.test_client()
+        headers = {'Authorization': f"Bearer {ctx['token']}"}
+        for _ in range(args.warmup // args.concurrency + 1):
+            method, path, body = make_request(ctx)
+            client.open(path, method=method, json=body, headers=headers).close()
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            method, path, body = make_request(ctx)
+            counter.reset()
+            started = time.perf_counter()
+            resp = client.open(path, method=method, json=body, headers=headers)
+            resp.get_data()
+            elapsed = time.perf_counter() - started
+            count, seconds = counter.read()
+            with lock:
+                latencies.append(elapsed)
+                queries.append(count)
+                sql_seconds.append(seconds)
+                statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+
+    threads = [threading.Thread(target=client_loop) for _ in range(args.concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    ok = sum(n for code, n in statuses.items() if code < 400)
+    return {
+        'requests': len(latencies),
+        'errors': len(latencies) - ok,
+        'status_codes': {str(code): n for code, n in sorted(statuses.items())},
+        'seconds': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(1000 * statistics.median(latencies), 2),
+        'p90_ms': round(1000 * percentile(latencies, 90), 2),
+        'p99_ms': round(1000 * percentile(latencies, 99), 2),
+        'max_ms': round(1000 * max(latencies), 2),
+        'queries_per_request': round(statistics.mean(queries), 2),
+        'max_queries': max(queries),
+        'sql_ms_per_request': round(1000 * statistics.mean(sql_seconds), 3)
+    }
+
+
+def compare(results, previous_path):
+    with open(previous_path) as f:
+        previous = json.load(f)['scenarios']
+    print(f"\nvs {previous_path}")
+    print(f"{'scenario':<24} {'rps':>22} {'p99 ms':>22} {'queries/req':>18}")
+    for name, r in results.items():
+        old = previous.get(name)
+        if not old:
+            continue
+
+        def delta(key):
+            change = (r[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+            return f'{old[key]}->{r[key]} ({change:+.0f}%)'
+        print(f"{name:<24} {delta('throughput_rps'):>22} {delta('p99_ms'):>22} {delta('queries_per_request'):>18}")
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    args = parse_args()
+    random.seed(args.seed)
+    os.environ['DATABASE_URL'] = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    os.environ['AUTH_RATE_LIMIT'] = '0'
+    from app import app
+    from models import db
+
+    with app.app_context():
+        if args.database_url:
+            db.drop_all()
+        db.create_all()
+        started = time.perf_counter()
+        seed(db, args)
+        seed_seconds = time.perf_counter() - started
+        counter = QueryCounter(db.engine)
+    print(f"Seeded {args.products} products / {args.transactions} transactions in {seed_seconds:.1f}s")
+
+    token = app.test_client().post('/api/auth/login', json={'username': 'admin', 'password': 'benchpass'}).get_json()['token']
+    ctx = {'token': token, 'products': args.products, 'users': max(args.users, 1)}
+
+    results = {}
+    print(f"{'scenario':<24} {'rps':>8} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'queries':>8} {'sql ms':>8} {'errors':>7}")
+    for name in args.scenarios:
+        r = results[name] = run_scenario(app, name, ctx, counter, args)
+        print(f"{name:<24} {r['throughput_rps']:>8} {r['p50_ms']:>8} {r['p90_ms']:>8} {r['p99_ms']:>8} "
+              f"{r['queries_per_request']:>8} {r['sql_ms_per_request']:>8} {r['errors']:>7}")
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'meta': {
+                'timestamp': datetime.datetime.utcnow().isoformat() + 'Z',
+                'git_revision': git_revision(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpus': os.cpu_count(),
+                'database': app.config['SQLALCHEMY_DATABASE_URI'].split('://')[0],
+                'seed_seconds': round(seed_seconds, 2),
+                'args': {k: v for k, v in vars(args).items() if k not in ('database_url', 'output', 'compare')}
+            },
+            'scenarios': results
+        }, f, indent=2)
+    print(f"\nResults written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
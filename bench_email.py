@@ -0,0 +1,46 @@
+"""
+Throughput check for the queued SMTP dispatcher in utils/email_sender.py.
+
+Starts a minimal local SMTP sink (no TLS, no auth), points the dispatcher at it
+with email_sender.configure(), queues a burst of alerts and reports how many
+arrived, how many SMTP sessions were opened and the messages/second achieved.
+
+    python bench_email.py --messages 2000
+"""
+import argparse
+import time
+
+from smtp_sink import SMTPSink
+from utils import email_sender
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=1000)
+    args = parser.parse_args()
+
+    sink = SMTPSink()
+    host, port = sink.start()
+    email_sender.configure(server=host, port=port, username='alerts@localhost', password=None, use_tls=False)
+
+    start = time.perf_counter()
+    accepted = sum(
+        email_sender.send_email_async(f'Low stock #{i}', 'admin@localhost', 'Stock below threshold')
+        for i in range(args.messages)
+    )
+    drained = email_sender.flush(timeout=120)
+    elapsed = time.perf_counter() - start
+    stats = email_sender.get_stats()
+    email_sender.shutdown()
+
+    print(f"Queued        : {accepted} of {args.messages} (dropped {stats['dropped']})")
+    print(f"Delivered     : {sink.received} in {elapsed:.2f}s ({sink.received / elapsed:.0f} msg/s)")
+    print(f"SMTP sessions : {stats['sessions']} across {email_sender.MAIL_WORKERS} workers")
+    print(f"Avg send      : {stats['avg_send_ms']} ms, failed {stats['failed']}")
+    if not drained:
+        print('WARNING: queue did not drain before the timeout')
+    sink.stop()
+
+
+if __name__ == '__main__':
+    main()
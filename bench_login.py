@@ -0,0 +1,129 @@
+"""
+Login throughput benchmark.
+
+Seeds a throwaway SQLite database with approved users, then drives
+POST /api/auth/login from many threads while a probe thread keeps calling
+GET /api/products, and reports login throughput/latency plus the probe's
+latency (how badly hashing starves regular inventory requests).
+
+Each --hash-workers value runs in a fresh interpreter (config is read at import):
+
+    python bench_login.py --hash-workers 0 2 4 --threads 16 --logins 200
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))]
+
+
+def run_single(args):
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ['AUTH_RATE_LIMIT'] = '0'
+    from app import app
+    from models import db, User
+    from password_hashing import hash_password
+
+    with app.app_context():
+        db.create_all()
+        password_hash = hash_password('benchpass')
+        db.session.add_all([
+            User(username=f'user{i}', password_hash=password_hash, role='admin' if i == 0 else 'employee',
+                 name=f'User {i}', status='approved')
+            for i in range(args.users)
+        ])
+        db.session.commit()
+
+    client = app.test_client()
+    token = client.post('/api/auth/login', json={'username': 'user0', 'password': 'benchpass'}).get_json()['token']
+
+    login_times, probe_times, failures = [], [], []
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def login_worker(n, offset):
+        local_client = app.test_client()
+        for i in range(n):
+            started = time.perf_counter()
+            resp = local_client.post('/api/auth/login', json={
+                'username': f'user{(offset + i) % args.users}', 'password': 'benchpass'
+            })
+            elapsed = time.perf_counter() - started
+            with lock:
+                (login_times if resp.status_code == 200 else failures).append(elapsed)
+
+    def probe():
+        local_client = app.test_client()
+        headers = {'Authorization': f'Bearer {token}'}
+        while not done.is_set():
+            started = time.perf_counter()
+            local_client.get('/api/products', headers=headers)
+            probe_times.append(time.perf_counter() - started)
+            time.sleep(0.01)
+
+    per_thread = [args.logins // args.threads + (1 if i < args.logins % args.threads else 0) for i in range(args.threads)]
+    threads = [threading.Thread(target=login_worker, args=(n, i * 1000)) for i, n in enumerate(per_thread)]
+    probe_thread = threading.Thread(target=probe)
+    probe_thread.start()
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    done.set()
+    probe_thread.join()
+
+    print(json.dumps({
+        'hash_workers': int(os.environ.get('HASH_WORKERS', '2')),
+        'logins': len(login_times),
+        'failures': len(failures),
+        'seconds': round(elapsed, 3),
+        'logins_per_second': round(len(login_times) / elapsed, 1),
+        'login_p50_ms': round(1000 * statistics.median(login_times), 1) if login_times else None,
+        'login_p99_ms': round(1000 * percentile(login_times, 99), 1) if login_times else None,
+        'probe_p50_ms': round(1000 * statistics.median(probe_times), 1) if probe_times else None,
+        'probe_p99_ms': round(1000 * percentile(probe_times, 99), 1) if probe_times else None
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hash-workers', type=int, nargs='+', default=[0, 2])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--logins', type=int, default=100)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--single', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        run_single(args)
+        return
+
+    print(f"{'workers':>7} {'logins/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'probe p50':>10} {'probe p99':>10} {'failed':>7}")
+    for workers in args.hash_workers:
+        env = dict(os.environ, HASH_WORKERS=str(workers))
+        out = subprocess.run(
+            [sys.executable, __file__, '--single', '--threads', str(args.threads),
+             '--logins', str(args.logins), '--users', str(args.users)],
+            env=env, capture_output=True, text=True, check=True
+        ).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        print(f"{workers:>7} {r['logins_per_second']:>9} {r['login_p50_ms']:>8} {r['login_p99_ms']:>8} "
+              f"{r['probe_p50_ms']:>10} {r['probe_p99_ms']:>10} {r['failures']:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Startup benchmark: how long a fresh worker process takes to import the app and
+build it with create_app(), plus the slowest imports (python -X importtime).
+Every sample is a new interpreter, so nothing is served from an earlier import.
+
+    python bench_startup.py --runs 10
+    python bench_startup.py --output after.json --compare before.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+PROBE = r'''
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app()
+built = time.perf_counter()
+print(json.dumps({'import_ms': 1000 * (imported - started), 'create_app_ms': 1000 * (built - imported)}))
+'''
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--top', type=int, default=15, help='slowest modules to list')
+    parser.add_argument('--output', default='bench_results_startup.json')
+    parser.add_argument('--compare', help='earlier results file to diff against')
+    return parser.parse_args()
+
+
+def probe_env():
+    # Throwaway database: the probe must not touch (or create) the real one
+    env = dict(os.environ)
+    env['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'bench_startup.db')
+    return env
+
+
+def run_probe(env):
+    out = subprocess.run([sys.executable, '-c', PROBE], env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(env, top):
+    err = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app; app.create_app()'],
+                         env=env, capture_output=True, text=True, check=True).stderr
+    # "import time: self [us] | cumulative | imported package"; keep top-level and app modules only
+    modules = []
+    for line in err.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        # The app's own modules plus whatever they import directly
+        if depth > 1 and name.strip().split('.')[0] not in LOCAL_MODULES:
+            continue
+        modules.append((name.strip(), int(cumulative_us) / 1000))
+    modules.sort(key=lambda m: -m[1])
+    return [{'module': name, 'cumulative_ms': round(ms, 1)} for name, ms in modules[:top]]
+
+
+LOCAL_MODULES = {name[:-3] for name in os.listdir(os.path.dirname(os.path.abspath(__file__))) if name.endswith('.py')}
+
+
+def summarize(samples, key):
+    values = sorted(s[key] for s in samples)
+    return {'median_ms': round(statistics.median(values), 1), 'min_ms': round(values[0], 1), 'max_ms': round(values[-1], 1)}
+
+
+def main():
+    args = parse_args()
+    env = probe_env()
+    run_probe(env)  # warm the OS file cache and .pyc files
+    samples = [run_probe(env) for _ in range(args.runs)]
+    results = {
+        'python': sys.version.split()[0],
+        'runs': args.runs,
+        'import': summarize(samples, 'import_ms'),
+        'create_app': summarize(samples, 'create_app_ms'),
+        'slowest_imports': slowest_imports(env, args.top)
+    }
+
+    print(f"import app   : {results['import']['median_ms']} ms median ({results['import']['min_ms']}-{results['import']['max_ms']})")
+    print(f"create_app() : {results['create_app']['median_ms']} ms median")
+    print('slowest imports (cumulative):')
+    for item in results['slowest_imports']:
+        print(f"  {item['cumulative_ms']:8.1f} ms  {item['module']}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            before = json.load(f)
+        for key in ('import', 'create_app'):
+            old, new = before[key]['median_ms'], results[key]['median_ms']
+            print(f"{key}: {old} -> {new} ms ({(new - old) / old * 100 if old else 0:+.0f}%)")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'Results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
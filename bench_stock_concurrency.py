@@ -0,0 +1,161 @@
+"""
+Concurrency stress benchmark for stock-out transactions.
+
+Hammers POST /api/transactions with "out" movements of quantity 1 against a
+single product from many threads and then checks the books:
+    - stock never goes below zero
+    - initial stock - final stock == number of accepted requests == ledger rows
+
+In-process mode (default) seeds a throwaway SQLite database and drives the
+app through Flask test clients. Pass --url to target a running server instead
+(e.g. several gunicorn workers); the product is then created through the API
+and the invariants are checked through the API as well.
+
+    python bench_stock_concurrency.py --threads 32 --requests 2000 --stock 500
+    python bench_stock_concurrency.py --url http://localhost:5000 --user admin --password adminpass
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=1000, help='total stock-out requests')
+    parser.add_argument('--stock', type=int, default=300, help='initial stock (keep below --requests to force contention)')
+    parser.add_argument('--url', help='base URL of a running server; omit for in-process mode')
+    parser.add_argument('--user', default='admin')
+    parser.add_argument('--password', default='adminpass')
+    return parser.parse_args()
+
+
+class HttpClient:
+    def __init__(self, base_url, token=None):
+        self.base_url = base_url.rstrip('/')
+        self.token = token
+
+    def call(self, method, path, body=None):
+        headers = {'Content-Type': 'application/json'}
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(req) as resp:
+                return resp.status, json.loads(resp.read() or b'{}')
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read() or b'{}')
+
+
+class TestClient:
+    def __init__(self, app, token=None):
+        self.client = app.test_client()
+        self.token = token
+
+    def call(self, method, path, body=None):
+        headers = {'Authorization': f'Bearer {self.token}'} if self.token else {}
+        resp = self.client.open(path, method=method, json=body, headers=headers)
+        return resp.status_code, resp.get_json(silent=True) or {}
+
+
+def setup_in_process():
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    from app import app
+    from models import db, User
+    from werkzeug.security import generate_password_hash
+
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(
+            username='admin', password_hash=generate_password_hash('adminpass', method='scrypt'),
+            role='admin', email=None, name='Bench Admin', status='approved'
+        ))
+        db.session.commit()
+    return lambda token=None: TestClient(app, token)
+
+
+def main():
+    args = parse_args()
+    if args.url:
+        make_client = lambda token=None: HttpClient(args.url, token)
+        user, password = args.user, args.password
+    else:
+        make_client = setup_in_process()
+        user, password = 'admin', 'adminpass'
+
+    status, body = make_client().call('POST', '/api/auth/login', {'username': user, 'password': password})
+    if status != 200:
+        raise SystemExit(f'Login failed: {status} {body}')
+    admin = make_client(body['token'])
+
+    sku = f'BENCH-{int(time.time() * 1000)}'
+    admin.call('POST', '/api/products', {'sku': sku, 'name': 'Stress Test Item', 'price': 1.0, 'stock_quantity': args.stock})
+    _, body = admin.call('GET', '/api/products')
+    product_id = next(p['id'] for p in body['products'] if p['sku'] == sku)
+
+    counts = {'ok': 0, 'insufficient': 0, 'error': 0}
+    lock = threading.Lock()
+    per_thread = [args.requests // args.threads + (1 if i < args.requests % args.threads else 0) for i in range(args.threads)]
+
+    def worker(n):
+        client = make_client()
+        local = {'ok': 0, 'insufficient': 0, 'error': 0}
+        for _ in range(n):
+            status, body = client.call('POST', '/api/transactions', {
+                'product_id': product_id, 'transaction_type': 'out', 'quantity': 1
+            })
+            if status == 201:
+                local['ok'] += 1
+                if body.get('new_stock', 0) < 0:
+                    local['error'] += 1
+            elif body.get('message') == 'Insufficient stock':
+                local['insufficient'] += 1
+            else:
+                local['error'] += 1
+        with lock:
+            for key in counts:
+                counts[key] += local[key]
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in per_thread]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    _, body = admin.call('GET', '/api/products')
+    final_stock = next(p['stock_quantity'] for p in body['products'] if p['sku'] == sku)
+    ledger_rows = 0
+    cursor = None
+    while True:
+        path = f'/api/transactions?product_id={product_id}&type=out&limit=500'
+        _, body = admin.call('GET', path + (f'&cursor={cursor}' if cursor else ''))
+        ledger_rows += len(body['transactions'])
+        cursor = body.get('next_cursor')
+        if not cursor:
+            break
+
+    print(f"Requests      : {args.requests} over {args.threads} threads in {elapsed:.2f}s "
+          f"({args.requests / elapsed:.0f} req/s)")
+    print(f"Accepted      : {counts['ok']}")
+    print(f"Rejected      : {counts['insufficient']} (insufficient stock)")
+    print(f"Errors        : {counts['error']}")
+    print(f"Stock         : {args.stock} -> {final_stock}")
+    print(f"Ledger rows   : {ledger_rows}")
+
+    oversold = final_stock < 0 or args.stock - final_stock != counts['ok'] or ledger_rows != counts['ok']
+    if oversold:
+        raise SystemExit('FAIL: stock, accepted requests and ledger disagree')
+    print('PASS: no oversell')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+import datetime
+import numpy as np
+from sqlalchemy import delete, insert, func, select
+from config import Config
+from models import db, ProductClassification
+from forecasting import load_catalog, load_daily_demand
+
+def compute_classes(catalog_ids, prices, demand_ids, demand_days, demand_qty, history_days,
+                    bucket_days=7, abc_thresholds=(0.8, 0.95), xyz_thresholds=(0.5, 1.0)):
+    """
+    Vectorized ABC/XYZ over the whole catalog from the sparse (product, day)
+    demand series. ABC ranks products by outbound value (qty x price) and cuts
+    at cumulative value shares; XYZ cuts the coefficient of variation of demand
+    per bucket_days bucket (empty buckets count as zero). Buckets are aligned to
+    the end of the window and the partial bucket left over at its start is
+    dropped from XYZ, so every bucket spans the same number of days. Products
+    without demand are C/Z.
+    """
+    n = len(catalog_ids)
+    if n:
+        pos = np.minimum(np.searchsorted(catalog_ids, demand_ids), n - 1)
+        keep = (catalog_ids[pos] == demand_ids) & (demand_days >= 0) & (demand_days < history_days)
+    else:
+        pos, keep = np.zeros(len(demand_ids), np.int64), np.zeros(len(demand_ids), bool)
+    pos, days, qty = pos[keep], demand_days[keep], demand_qty[keep]
+
+    # ABC: descending value, class by the cumulative share reached *before* each product
+    value = np.bincount(pos, weights=qty * prices[pos] if n else qty, minlength=n)
+    total_value = value.sum()
+    order = np.argsort(-value, kind='stable')
+    share = value / total_value if total_value > 0 else np.zeros(n)
+    cumulative = np.empty(n)
+    cumulative[order] = np.cumsum(share[order])
+    before = cumulative - share
+    abc = np.where(before < abc_thresholds[0], 'A', np.where(before < abc_thresholds[1], 'B', 'C'))
+    abc[value <= 0] = 'C'
+
+    # XYZ: per-bucket sums, then mean/variance with the empty buckets as zeros (no dense matrix).
+    # Bucket 0 ends on the last day; a window shorter than one bucket is a single bucket.
+    buckets = max(history_days // bucket_days, 1)
+    bucket = (history_days - 1 - days) // bucket_days
+    full = bucket < buckets
+    pos, bucket, qty = pos[full], bucket[full], qty[full]
+    keys, inverse = np.unique(pos * buckets + bucket, return_inverse=True)
+    sums = np.bincount(inverse.ravel(), weights=qty, minlength=len(keys))
+    owner = keys // buckets
+    mean = np.bincount(owner, weights=sums, minlength=n) / buckets
+    var = np.maximum(np.bincount(owner, weights=sums * sums, minlength=n) / buckets - mean ** 2, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cv = np.where(mean > 0, np.sqrt(var) / mean, np.nan)
+    xyz = np.where(cv <= xyz_thresholds[0], 'X', np.where(cv <= xyz_thresholds[1], 'Y', 'Z'))
+    xyz[np.isnan(cv)] = 'Z'
+
+    return {
+        'abc': abc,
+        'xyz': xyz,
+        'value': value,
+        'share': share,
+        'cumulative_share': cumulative,
+        'mean_demand': mean,
+        'cv': cv
+    }
+
+def run_classification(history_days=None, bucket_days=None, abc_thresholds=None, xyz_thresholds=None,
+                       today=None, batch_size=10000):
+    """
+    Classifies the whole catalog and replaces the stored results in one
+    transaction. The ledger is aggregated per (product, day) in SQL and streamed
+    in batches, so memory is bounded by active product-days, not ledger rows.
+    Returns a summary with the count per class pair.
+    """
+    history_days = history_days or Config.CLASSIFY_HISTORY_DAYS
+    bucket_days = bucket_days or Config.CLASSIFY_BUCKET_DAYS
+    today = today or datetime.datetime.utcnow().date()
+    end_day = today + datetime.timedelta(days=1)
+    start_day = end_day - datetime.timedelta(days=history_days)
+
+    catalog = load_catalog()
+    demand = load_daily_demand(start_day, end_day)
+    result = compute_classes(
+        catalog['id'], catalog['price'], *demand, history_days, bucket_days=bucket_days,
+        abc_thresholds=abc_thresholds or Config.CLASSIFY_ABC_THRESHOLDS,
+        xyz_thresholds=xyz_thresholds or Config.CLASSIFY_XYZ_THRESHOLDS
+    )
+
+    computed_at = datetime.datetime.utcnow()
+    ids = catalog['id'].tolist()
+    columns = (result['abc'].tolist(), result['xyz'].tolist(), result['value'].tolist(), result['share'].tolist(),
+               result['cumulative_share'].tolist(), result['mean_demand'].tolist(), result['cv'].tolist())
+    db.session.execute(delete(ProductClassification))
+    for start in range(0, len(ids), batch_size):
+        db.session.execute(insert(ProductClassification), [
+            {'product_id': ids[i], 'abc_class': columns[0][i], 'xyz_class': columns[1][i],
+             'demand_value': columns[2][i], 'value_share': columns[3][i], 'cumulative_share': columns[4][i],
+             'mean_demand': columns[5][i], 'demand_cv': None if np.isnan(columns[6][i]) else columns[6][i],
+             'computed_at': computed_at}
+            for i in range(start, min(start + batch_size, len(ids)))
+        ])
+    db.session.commit()
+    return {
+        'computed_at': computed_at.isoformat(),
+        'history_days': history_days,
+        'bucket_days': bucket_days,
+        'products': len(ids),
+        'matrix': class_matrix()
+    }
+
+def class_matrix():
+    # Product count per ABC/XYZ pair of the stored run, e.g. {'AX': 12, 'CZ': 840}
+    rows = db.session.execute(
+        select(ProductClassification.abc_class, ProductClassification.xyz_class, func.count())
+        .group_by(ProductClassification.abc_class, ProductClassification.xyz_class)
+    ).all()
+    return {f'{abc}{xyz}': count for abc, xyz, count in rows}
@@ -0,0 +1,21 @@
+import argparse
+import time
+from app import create_app, db
+from config import BatchConfig
+from classification import run_classification
+
+app = create_app(BatchConfig)
+
+# Recomputes the ABC/XYZ classification of the whole catalog (run nightly from cron)
+parser = argparse.ArgumentParser(description='ABC/XYZ inventory classification')
+parser.add_argument('--history-days', type=int, help='defaults to CLASSIFY_HISTORY_DAYS')
+parser.add_argument('--bucket-days', type=int, help='defaults to CLASSIFY_BUCKET_DAYS')
+args = parser.parse_args()
+
+with app.app_context():
+    db.create_all()
+    started = time.perf_counter()
+    summary = run_classification(args.history_days, args.bucket_days)
+    print(f"Classified {summary['products']} products in {time.perf_counter() - started:.1f}s")
+    for pair, count in sorted(summary['matrix'].items()):
+        print(f"  {pair}: {count}")
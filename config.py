@@ -1,6 +1,134 @@
 import os
+from db_engine import normalize_database_url
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-prod'
-    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///inventory.db'
+    SQLALCHEMY_DATABASE_URI = normalize_database_url(os.environ.get('DATABASE_URL') or 'sqlite:///inventory.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Bulk POS sync: movements are applied and committed in chunks of this size
+    TRANSACTION_BULK_CHUNK_SIZE = int(os.environ.get('TRANSACTION_BULK_CHUNK_SIZE') or 500)
+    # Product feed import: rows upserted per transaction, row errors kept in the report
+    IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE') or 1000)
+    IMPORT_MAX_ERRORS = int(os.environ.get('IMPORT_MAX_ERRORS') or 1000)
+
+    # Verified JWTs are cached with their user for this long (seconds). Approve/reject and role
+    # changes made through the app reach every worker within AUTH_EPOCH_CHECK_SECONDS; the TTL
+    # only bounds edits made directly in the database
+    AUTH_CACHE_TTL = int(os.environ.get('AUTH_CACHE_TTL') or 60)
+    AUTH_CACHE_SIZE = int(os.environ.get('AUTH_CACHE_SIZE') or 10000)
+    AUTH_EPOCH_CHECK_SECONDS = float(os.environ.get('AUTH_EPOCH_CHECK_SECONDS') or 1)
+
+    # Low-stock alerts are collected into one digest per admin every N seconds (0 = send immediately)
+    ALERT_DIGEST_INTERVAL = float(os.environ.get('ALERT_DIGEST_INTERVAL') or 60)
+    ALERT_RECIPIENT_TTL = int(os.environ.get('ALERT_RECIPIENT_TTL') or 300)
+
+    # Rows fetched per server-side batch when streaming exports
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE') or 1000)
+
+    # Dashboard counters are recomputed from scratch at most this often (seconds)
+    STATS_RECONCILE_INTERVAL = int(os.environ.get('STATS_RECONCILE_INTERVAL') or 3600)
+    # Central-stock counters are spread over this many summary rows (by product id), so
+    # concurrent checkouts of different products rarely wait on the same row lock
+    STATS_CENTRAL_SHARDS = int(os.environ.get('STATS_CENTRAL_SHARDS') or 8)
+
+    # Demand forecasting / reorder points (/api/reports/reorder)
+    FORECAST_HISTORY_DAYS = int(os.environ.get('FORECAST_HISTORY_DAYS') or 90)
+    FORECAST_LEAD_TIME_DAYS = float(os.environ.get('FORECAST_LEAD_TIME_DAYS') or 7)
+    FORECAST_SERVICE_LEVEL = float(os.environ.get('FORECAST_SERVICE_LEVEL') or 0.95)
+    FORECAST_ALPHA = float(os.environ.get('FORECAST_ALPHA') or 0.3)
+    FORECAST_SMA_WINDOW = int(os.environ.get('FORECAST_SMA_WINDOW') or 28)
+
+    # Pre-serialized product/stats responses kept in memory, keyed by catalog version
+    RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE') or 256)
+    RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL') or 300)
+
+    # Server worker model, read by gunicorn.conf.py. 'gthread' gives every open stock stream one of
+    # the worker's SERVER_THREADS threads; 'gevent' or 'eventlet' hold streams on greenlets instead
+    SERVER_WORKER_CLASS = os.environ.get('GUNICORN_WORKER_CLASS') or 'gthread'
+    SERVER_THREADS = int(os.environ.get('GUNICORN_THREADS') or 4)
+
+    # Live stock stream (/api/products/stream): per-subscriber queue bound, subscriber cap, heartbeat seconds.
+    # The cap is per worker process: a thread-bound worker takes at most half its threads as streams,
+    # so the rest keep serving the API; greenlet workers take hundreds
+    STREAM_QUEUE_SIZE = int(os.environ.get('STREAM_QUEUE_SIZE') or 1000)
+    STREAM_MAX_SUBSCRIBERS = int(os.environ.get('STREAM_MAX_SUBSCRIBERS') or (
+        500 if SERVER_WORKER_CLASS in ('gevent', 'eventlet') else SERVER_THREADS // 2
+    ))
+    STREAM_HEARTBEAT = float(os.environ.get('STREAM_HEARTBEAT') or 15)
+
+    # Password hashing: werkzeug method string ('scrypt:n:r:p'); older hashes are upgraded on login
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'scrypt:32768:8:1'
+    # scrypt runs in a process pool of this size (0 = inline); at most HASH_MAX_PENDING hashes
+    # may be in flight per server worker, waiting up to HASH_QUEUE_TIMEOUT seconds for a slot
+    HASH_WORKERS = int(os.environ.get('HASH_WORKERS') or 2)
+    HASH_MAX_PENDING = int(os.environ.get('HASH_MAX_PENDING') or 16)
+    HASH_QUEUE_TIMEOUT = float(os.environ.get('HASH_QUEUE_TIMEOUT') or 2)
+    # Registrations allowed per client IP per window (0 disables throttling)
+    AUTH_RATE_LIMIT = int(os.environ.get('AUTH_RATE_LIMIT') or 20)
+    AUTH_RATE_WINDOW = int(os.environ.get('AUTH_RATE_WINDOW') or 60)
+    # Failed logins allowed per username + client IP per window; successful logins are not counted,
+    # so a shift signing in together from one store NAT is never throttled (0 disables)
+    LOGIN_FAILURE_LIMIT = int(os.environ.get('LOGIN_FAILURE_LIMIT') or 10)
+    LOGIN_FAILURE_WINDOW = int(os.environ.get('LOGIN_FAILURE_WINDOW') or 300)
+    # Reverse proxies in front of the app whose X-Forwarded-For/-Proto/-Host are trusted (0 = none,
+    # the client IP is the socket peer). Set it to the real hop count: more lets clients spoof their IP
+    PROXY_COUNT = int(os.environ.get('PROXY_COUNT') or 0)
+
+    # Login/logout audit rows are buffered and written in batches: at most every
+    # AUDIT_FLUSH_INTERVAL seconds (the window that can be lost on a crash), sooner once
+    # AUDIT_BATCH_SIZE rows are pending; past AUDIT_BUFFER_LIMIT requests write inline
+    AUDIT_FLUSH_INTERVAL = float(os.environ.get('AUDIT_FLUSH_INTERVAL') or 1)
+    AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE') or 500)
+    AUDIT_BUFFER_LIMIT = int(os.environ.get('AUDIT_BUFFER_LIMIT') or 10000)
+    # A row that keeps failing on its own (e.g. its user was deleted) is dropped after this many flushes
+    AUDIT_MAX_ATTEMPTS = int(os.environ.get('AUDIT_MAX_ATTEMPTS') or 3)
+
+    # Database engine (see db_engine.py). Connection pool per server worker; pre-ping only
+    # applies to server databases. Timeouts are in milliseconds (0 disables the statement timeout)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE') or 10)
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW') or 20)
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT') or 10)
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE') or 1800)
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', '1').lower() not in ('0', 'false', 'no')
+    DB_BUSY_TIMEOUT = int(os.environ.get('DB_BUSY_TIMEOUT') or 5000)
+    DB_STATEMENT_TIMEOUT = int(os.environ.get('DB_STATEMENT_TIMEOUT') or 30000)
+    # SQLite only: WAL lets reads proceed during writes; synchronous=NORMAL is durable
+    # against app crashes (not power loss) in WAL mode. Negative cache size is in KiB
+    DB_SQLITE_JOURNAL_MODE = os.environ.get('DB_SQLITE_JOURNAL_MODE') or 'WAL'
+    DB_SQLITE_SYNCHRONOUS = os.environ.get('DB_SQLITE_SYNCHRONOUS') or 'NORMAL'
+    DB_SQLITE_MMAP_SIZE = int(os.environ.get('DB_SQLITE_MMAP_SIZE') or 256 * 1024 * 1024)
+    DB_SQLITE_CACHE_SIZE = int(os.environ.get('DB_SQLITE_CACHE_SIZE') or -64000)
+
+    # Request instrumentation (off by default): SQL counts/time per request, Server-Timing
+    # headers and per-endpoint latency stats over the last METRICS_WINDOW requests at
+    # /api/admin/metrics. METRICS_PROFILE_SLOW_MS > 0 also samples request stacks every
+    # METRICS_PROFILE_INTERVAL seconds and writes folded stacks of slower requests to METRICS_PROFILE_DIR
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '0').lower() not in ('0', 'false', 'no')
+    METRICS_WINDOW = int(os.environ.get('METRICS_WINDOW') or 1000)
+    METRICS_PROFILE_SLOW_MS = float(os.environ.get('METRICS_PROFILE_SLOW_MS') or 0)
+    METRICS_PROFILE_INTERVAL = float(os.environ.get('METRICS_PROFILE_INTERVAL') or 0.005)
+    METRICS_PROFILE_DIR = os.environ.get('METRICS_PROFILE_DIR') or 'profiles'
+
+    # ABC/XYZ classification (classification.py): ABC splits products at these cumulative
+    # shares of outbound value, XYZ at these coefficients of variation of demand per bucket
+    CLASSIFY_HISTORY_DAYS = int(os.environ.get('CLASSIFY_HISTORY_DAYS') or 90)
+    CLASSIFY_BUCKET_DAYS = int(os.environ.get('CLASSIFY_BUCKET_DAYS') or 7)
+    CLASSIFY_ABC_THRESHOLDS = tuple(float(x) for x in (os.environ.get('CLASSIFY_ABC_THRESHOLDS') or '0.8,0.95').split(','))
+    CLASSIFY_XYZ_THRESHOLDS = tuple(float(x) for x in (os.environ.get('CLASSIFY_XYZ_THRESHOLDS') or '0.5,1.0').split(','))
+
+    # Daily stock snapshots for point-in-time queries; older ones are pruned (0 keeps all)
+    STOCK_SNAPSHOT_RETENTION_DAYS = int(os.environ.get('STOCK_SNAPSHOT_RETENTION_DAYS') or 400)
+
+    # Replenishment planner (replenishment.py): EOQ = sqrt(2 x annual demand x order cost / holding cost),
+    # holding cost = unit price x annual rate. Lines are at least REPLENISH_MIN_ORDER_QTY units and
+    # a supplier's draft PO is scaled up to REPLENISH_MIN_ORDER_VALUE (0 = no minimum)
+    REPLENISH_ORDER_COST = float(os.environ.get('REPLENISH_ORDER_COST') or 50)
+    REPLENISH_HOLDING_RATE = float(os.environ.get('REPLENISH_HOLDING_RATE') or 0.25)
+    REPLENISH_MIN_ORDER_QTY = int(os.environ.get('REPLENISH_MIN_ORDER_QTY') or 1)
+    REPLENISH_MIN_ORDER_VALUE = float(os.environ.get('REPLENISH_MIN_ORDER_VALUE') or 0)
+
+class BatchConfig(Config):
+    # CLI batch jobs (backfills, imports, snapshots, planning) legitimately run long statements:
+    # the per-statement limit protects web workers only (DB_BATCH_STATEMENT_TIMEOUT to set one)
+    DB_STATEMENT_TIMEOUT = int(os.environ.get('DB_BATCH_STATEMENT_TIMEOUT') or 0)
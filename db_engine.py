@@ -0,0 +1,116 @@
+import sqlite3
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+def normalize_database_url(url):
+    # Heroku-style 'postgres://' URLs are rejected by SQLAlchemy 1.4+
+    if url.startswith('postgres://'):
+        return 'postgresql://' + url[len('postgres://'):]
+    return url
+
+def engine_options(config):
+    """
+    SQLALCHEMY_ENGINE_OPTIONS for the configured database. Pool sizing only
+    applies to server databases and file-backed SQLite (in-memory SQLite is
+    left to Flask-SQLAlchemy's single shared connection).
+    """
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    options = {}
+
+    if url.get_backend_name() == 'sqlite':
+        if url.database in (None, '', ':memory:'):
+            return {}
+        # The driver's own busy handler; the PRAGMA below sets the same thing explicitly
+        options['connect_args'] = {'timeout': config['DB_BUSY_TIMEOUT'] / 1000.0}
+    else:
+        # Server connections can be dropped under us (restarts, idle timeouts, failover)
+        options['pool_pre_ping'] = config['DB_POOL_PRE_PING']
+    if url.get_backend_name() == 'postgresql':
+        timeout = config['DB_STATEMENT_TIMEOUT']
+        if timeout and url.get_driver_name() in ('psycopg2', 'psycopg', ''):
+            # Enforced by the server: runaway statements are cancelled, not just abandoned
+            options['connect_args'] = {
+                'options': f"-c statement_timeout={timeout} -c lock_timeout={config['DB_BUSY_TIMEOUT']}"
+            }
+
+    options.update({
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE']
+    })
+    return options
+
+def configure_engine(engine, config):
+    # Per-connection setup that can't be expressed as engine options
+    if engine.dialect.name != 'sqlite':
+        return
+
+    pragmas = [
+        f"PRAGMA busy_timeout = {int(config['DB_BUSY_TIMEOUT'])}",
+        f"PRAGMA synchronous = {config['DB_SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA mmap_size = {int(config['DB_SQLITE_MMAP_SIZE'])}",
+        f"PRAGMA cache_size = {int(config['DB_SQLITE_CACHE_SIZE'])}",
+        'PRAGMA temp_store = MEMORY'
+    ]
+    journal_mode = config['DB_SQLITE_JOURNAL_MODE']
+    in_memory = engine.url.database in (None, '', ':memory:')
+    timeout = config['DB_STATEMENT_TIMEOUT']
+
+    @event.listens_for(engine, 'connect')
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # WAL lets readers run alongside the single writer; the setting is persistent in the file
+        if journal_mode and not in_memory:
+            cursor.execute(f'PRAGMA journal_mode = {journal_mode}')
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+        if timeout:
+            # SQLite has no statement timeout: interrupt the VM from its progress
+            # handler once the current statement has run for too long
+            started = connection_record.info['statement_started'] = [None]
+            limit = timeout / 1000.0
+
+            def _check():
+                return 1 if started[0] is not None and time.monotonic() - started[0] > limit else 0
+            dbapi_connection.set_progress_handler(_check, 10000)
+
+    if timeout:
+        @event.listens_for(engine, 'before_cursor_execute')
+        def _start_clock(conn, cursor, statement, parameters, context, executemany):
+            started = conn.info.get('statement_started')
+            if started is not None:
+                started[0] = time.monotonic()
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def _stop_clock(conn, cursor, statement, parameters, context, executemany):
+            started = conn.info.get('statement_started')
+            if started is not None:
+                started[0] = None
+
+        @event.listens_for(engine, 'handle_error')
+        def _clear_clock(context):
+            started = context.connection.info.get('statement_started') if context.connection else None
+            if started is not None:
+                started[0] = None
+
+def upsert_insert(dialect_name):
+    # The dialect's insert() with on_conflict_do_update(), or None where there is no upsert
+    if dialect_name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect_name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+    return insert
+
+def is_statement_timeout(error):
+    # True for a statement cancelled by DB_STATEMENT_TIMEOUT on either backend
+    orig = getattr(error, 'orig', error)
+    if isinstance(orig, sqlite3.OperationalError):
+        return 'interrupted' in str(orig)
+    return getattr(orig, 'pgcode', None) == '57014'
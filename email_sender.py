@@ -1,44 +1,233 @@
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+import atexit
+import queue
 import threading
+import time
 import os
 from dotenv import load_dotenv
 
+# Dispatcher tuning (read once at import)
+MAIL_WORKERS = int(os.environ.get('MAIL_WORKERS') or 2)
+MAIL_QUEUE_SIZE = int(os.environ.get('MAIL_QUEUE_SIZE') or 1000)
+MAIL_BATCH_SIZE = int(os.environ.get('MAIL_BATCH_SIZE') or 20)          # messages per SMTP session
+MAIL_IDLE_TIMEOUT = float(os.environ.get('MAIL_IDLE_TIMEOUT') or 30)    # seconds an idle session stays open
+MAIL_QUEUE_POLICY = os.environ.get('MAIL_QUEUE_POLICY') or 'drop_new'   # 'drop_new', 'drop_oldest' or 'block'
+MAIL_QUEUE_TIMEOUT = float(os.environ.get('MAIL_QUEUE_TIMEOUT') or 2)   # max wait for 'block'
+MAIL_SHUTDOWN_TIMEOUT = float(os.environ.get('MAIL_SHUTDOWN_TIMEOUT') or 10)
+
+_STOP = object()
+_queue = queue.Queue(maxsize=MAIL_QUEUE_SIZE)
+_workers = []
+_workers_lock = threading.Lock()
+_pinned_settings = None
+
+_stats_lock = threading.Lock()
+_stats = {
+    'queued': 0,
+    'sent': 0,
+    'mocked': 0,
+    'failed': 0,
+    'dropped': 0,
+    'sessions': 0,
+    'send_seconds': 0.0
+}
+_started_at = time.time()
+
 def send_email_async(subject, recipient, body):
     """
-    Sends an email asynchronously handling execution in a separate thread.
+    Queues an email for the background dispatcher. Returns False if the
+    message was dropped because the queue is full.
     """
-    thread = threading.Thread(target=_send_email_thread, args=(subject, recipient, body))
-    thread.start()
+    _ensure_workers()
+    message = (subject, recipient, body)
+    try:
+        if MAIL_QUEUE_POLICY == 'block':
+            _queue.put(message, timeout=MAIL_QUEUE_TIMEOUT)
+        else:
+            _queue.put_nowait(message)
+    except queue.Full:
+        if MAIL_QUEUE_POLICY != 'drop_oldest' or not _replace_oldest(message):
+            _count('dropped')
+            print(f"Email queue full, dropping message to {recipient}")
+            return False
+    _count('queued')
+    return True
 
-def _send_email_thread(subject, recipient, body):
-    # Force reload env vars to pick up changes without restart
-    load_dotenv(override=True)
-    
-    sender_email = os.environ.get('MAIL_USERNAME')
-    sender_password = os.environ.get('MAIL_PASSWORD')
-    smtp_server = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
-    smtp_port = int(os.environ.get('MAIL_PORT', 587))
-    
-    # Mock Mode if credentials are not set
-    if not sender_email or not sender_password:
-        print(f"\n[MOCK EMAIL] To: {recipient}\nSubject: {subject}\nBody: {body}\n[Server not configured, skipping actual send]\n")
+def configure(**settings):
+    """
+    Pins SMTP settings (server, port, username, password, use_tls) instead of
+    reading them from the environment/.env. Handy for local SMTP stand-ins.
+    Call with no arguments to go back to the environment.
+    """
+    global _pinned_settings
+    _pinned_settings = dict(settings) if settings else None
+
+def flush(timeout=None):
+    """
+    Waits until every queued message has been handled. Returns False on timeout.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    with _queue.all_tasks_done:
+        while _queue.unfinished_tasks:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            _queue.all_tasks_done.wait(remaining)
+    return True
+
+def shutdown(timeout=MAIL_SHUTDOWN_TIMEOUT):
+    # Drain what is queued, then stop the workers and close their sessions
+    drained = flush(timeout)
+    with _workers_lock:
+        workers = list(_workers)
+        _workers.clear()
+    for _ in workers:
+        _queue.put(_STOP)
+    for worker in workers:
+        worker.join(timeout)
+    return drained
+
+atexit.register(shutdown)
+
+def get_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['queue_depth'] = _queue.qsize()
+    stats['workers'] = len(_workers)
+    stats['avg_send_ms'] = round(1000 * stats['send_seconds'] / stats['sent'], 2) if stats['sent'] else None
+    stats['sent_per_second'] = round(stats['sent'] / (time.time() - _started_at), 2)
+    stats['send_seconds'] = round(stats['send_seconds'], 3)
+    return stats
+
+def _count(key, amount=1):
+    with _stats_lock:
+        _stats[key] += amount
+
+def _replace_oldest(message):
+    # Swaps the oldest queued message for this one under the queue's own lock, so no other
+    # producer can take the freed slot. Stop markers are skipped: evicting one would leave a
+    # worker running and shutdown() waiting out its timeout.
+    with _queue.mutex:
+        for i, queued in enumerate(_queue.queue):
+            if queued is not _STOP:
+                del _queue.queue[i]
+                _queue.queue.append(message)
+                _queue.not_empty.notify()
+                break
+        else:
+            return False
+    _count('dropped')
+    return True
+
+def _ensure_workers():
+    # Also replaces workers that died, so alerts can't stop for the life of the process
+    if len(_workers) >= MAIL_WORKERS and all(worker.is_alive() for worker in _workers):
         return
+    with _workers_lock:
+        _workers[:] = [worker for worker in _workers if worker.is_alive()]
+        while len(_workers) < MAIL_WORKERS:
+            worker = threading.Thread(target=_worker_loop, name=f'mail-worker-{len(_workers)}', daemon=True)
+            worker.start()
+            _workers.append(worker)
 
-    try:
-        msg = MIMEMultipart()
-        msg['From'] = sender_email
-        msg['To'] = recipient
-        msg['Subject'] = subject
-        msg.attach(MIMEText(body, 'plain'))
+def _load_settings():
+    if _pinned_settings is not None:
+        return _pinned_settings
+    # Reload env vars once per SMTP session to pick up changes without restart
+    load_dotenv(override=True)
+    return {
+        'username': os.environ.get('MAIL_USERNAME'),
+        'password': os.environ.get('MAIL_PASSWORD'),
+        'server': os.environ.get('MAIL_SERVER', 'smtp.gmail.com'),
+        'port': int(os.environ.get('MAIL_PORT', 587)),
+        'use_tls': os.environ.get('MAIL_USE_TLS', '1').lower() not in ('0', 'false', 'no')
+    }
 
-        server = smtplib.SMTP(smtp_server, smtp_port)
+def _connect(settings):
+    server = smtplib.SMTP(settings['server'], settings['port'], timeout=30)
+    if settings.get('use_tls', True):
         server.starttls()
-        server.login(sender_email, sender_password)
-        text = msg.as_string()
-        server.sendmail(sender_email, recipient, text)
+    if settings.get('password'):
+        server.login(settings['username'], settings['password'])
+    _count('sessions')
+    return server
+
+def _close(server):
+    if server is None:
+        return
+    try:
         server.quit()
-        print(f"Email sent successfully to {recipient}")
-    except Exception as e:
-        print(f"Failed to send email: {e}")
+    except Exception:
+        server.close()
+
+def _worker_loop():
+    server = None
+    settings = None
+    session_count = 0
+    while True:
+        try:
+            message = _queue.get(timeout=MAIL_IDLE_TIMEOUT)
+        except queue.Empty:
+            # Idle: release the SMTP session and re-read settings next time
+            _close(server)
+            server, settings, session_count = None, None, 0
+            continue
+
+        if message is _STOP:
+            _close(server)
+            _queue.task_done()
+            return
+
+        try:
+            if settings is None:
+                settings = _load_settings()
+            server = _deliver(server, settings, *message)
+            session_count += 1
+            if server is not None and session_count >= MAIL_BATCH_SIZE:
+                _close(server)
+                server, settings, session_count = None, None, 0
+        except Exception as e:
+            # Bad settings (e.g. a non-numeric MAIL_PORT) fail this message, not the worker;
+            # they are re-read for the next one
+            _count('failed')
+            print(f"Failed to send email: {e}")
+            _close(server)
+            server, settings, session_count = None, None, 0
+        finally:
+            _queue.task_done()
+
+def _deliver(server, settings, subject, recipient, body):
+    sender_email = settings.get('username')
+
+    # Mock Mode if credentials are not set
+    if not sender_email or (not settings.get('password') and _pinned_settings is None):
+        print(f"\n[MOCK EMAIL] To: {recipient}\nSubject: {subject}\nBody: {body}\n[Server not configured, skipping actual send]\n")
+        _count('mocked')
+        return server
+
+    msg = MIMEMultipart()
+    msg['From'] = sender_email
+    msg['To'] = recipient
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'plain'))
+    text = msg.as_string()
+
+    # One retry on a fresh session covers connections the server dropped while idle
+    for attempt in range(2):
+        try:
+            if server is None:
+                server = _connect(settings)
+            started = time.perf_counter()
+            server.sendmail(sender_email, recipient, text)
+            _count('send_seconds', time.perf_counter() - started)
+            _count('sent')
+            return server
+        except Exception as e:
+            _close(server)
+            server = None
+            if attempt:
+                _count('failed')
+                print(f"Failed to send email: {e}")
+    return server
@@ -0,0 +1,166 @@
+import csv
+import datetime
+import io
+import json
+import zlib
+from models import db, Product, Transaction, User, LoginLog
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet')
+}
+
+# Flush output to the client roughly every this many bytes
+CHUNK_BYTES = 64 * 1024
+
+def _products():
+    columns = [
+        ('ID', 'int64'), ('SKU', 'string'), ('Name', 'string'), ('Category', 'string'), ('Supplier', 'string'),
+        ('Price', 'double'), ('Stock', 'int64'), ('Min Threshold', 'int64')
+    ]
+    stmt = db.select(
+        Product.id, Product.sku, Product.name, Product.category, Product.supplier,
+        Product.price, Product.stock_quantity, Product.min_stock_threshold
+    ).order_by(Product.id)
+    return columns, stmt
+
+def _transactions():
+    columns = [
+        ('ID', 'int64'), ('Timestamp', 'timestamp[us]'), ('SKU', 'string'), ('Product', 'string'),
+        ('Type', 'string'), ('Quantity', 'int64'), ('User', 'string')
+    ]
+    stmt = db.select(
+        Transaction.id, Transaction.timestamp, Product.sku, Product.name,
+        Transaction.transaction_type, Transaction.quantity, User.username
+    ).join(Product, Transaction.product_id == Product.id).join(
+        User, Transaction.user_id == User.id
+    ).order_by(Transaction.timestamp, Transaction.id)
+    return columns, stmt
+
+def _login_logs():
+    columns = [
+        ('ID', 'int64'), ('Username', 'string'), ('Name', 'string'), ('Role', 'string'),
+        ('Login Time', 'timestamp[us]'), ('Logout Time', 'timestamp[us]')
+    ]
+    stmt = db.select(
+        LoginLog.id, User.username, User.name, User.role, LoginLog.login_time, LoginLog.logout_time
+    ).join(User, LoginLog.user_id == User.id).order_by(LoginLog.login_time, LoginLog.id)
+    return columns, stmt
+
+# Each dataset returns ([(column title, arrow type alias)], select statement)
+DATASETS = {
+    'products': _products,
+    'transactions': _transactions,
+    'login-logs': _login_logs
+}
+
+def iter_rows(stmt, batch_size):
+    # Server-side batches: only batch_size rows are materialized at a time
+    result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+    for partition in result.partitions():
+        yield partition
+
+def export_chunks(dataset, fmt, batch_size=1000, compress=False):
+    """
+    Yields the encoded export of a dataset in bounded chunks, optionally gzipped.
+    """
+    columns, stmt = DATASETS[dataset]()
+    batches = iter_rows(stmt, batch_size)
+    if fmt == 'csv':
+        chunks = _csv_chunks(columns, batches)
+    elif fmt == 'ndjson':
+        chunks = _ndjson_chunks(columns, batches)
+    elif fmt == 'parquet':
+        chunks = _parquet_chunks(columns, batches)
+    else:
+        raise ValueError(f'Unknown format: {fmt}')
+    return _gzip_chunks(chunks) if compress else chunks
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def _csv_chunks(columns, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([title for title, arrow_type in columns])
+    for batch in batches:
+        writer.writerows(batch)
+        if buffer.tell() >= CHUNK_BYTES:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+def _ndjson_chunks(columns, batches):
+    keys = _keys(columns)
+    parts = []
+    size = 0
+    for batch in batches:
+        for row in batch:
+            line = json.dumps(dict(zip(keys, row)), default=_json_default) + '\n'
+            parts.append(line)
+            size += len(line)
+        if size >= CHUNK_BYTES:
+            yield ''.join(parts).encode('utf-8')
+            parts, size = [], 0
+    if parts:
+        yield ''.join(parts).encode('utf-8')
+
+def _parquet_chunks(columns, batches):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    keys = _keys(columns)
+    schema = pa.schema([(key, pa.type_for_alias(arrow_type)) for key, (title, arrow_type) in zip(keys, columns)])
+    sink = _ByteSink()
+    writer = pq.ParquetWriter(sink, schema)
+    for batch in batches:
+        # One row group per batch
+        data = {key: list(values) for key, values in zip(keys, zip(*batch))}
+        writer.write_table(pa.Table.from_pydict(data, schema=schema))
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+def _keys(columns):
+    return [title.lower().replace(' ', '_') for title, arrow_type in columns]
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def _json_default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f'Not JSON serializable: {type(value).__name__}')
+
+class _ByteSink(io.RawIOBase):
+    # Write-only file object that hands back whatever has been written since the last take()
+    def __init__(self):
+        self._parts = []
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def take(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
@@ -0,0 +1,133 @@
+import datetime
+from statistics import NormalDist
+import numpy as np
+from sqlalchemy import func
+from models import db, Product, Transaction
+
+def load_catalog():
+    """
+    Returns the catalog as column arrays (sorted by id) in a single query.
+    """
+    rows = db.session.execute(
+        db.select(
+            Product.id, Product.sku, Product.name, Product.supplier, Product.price,
+            Product.stock_quantity, Product.min_stock_threshold
+        ).order_by(Product.id)
+    ).all()
+    columns = list(zip(*rows)) if rows else [()] * 7
+    return {
+        'id': np.array(columns[0], dtype=np.int64),
+        'sku': list(columns[1]),
+        'name': list(columns[2]),
+        'supplier': list(columns[3]),
+        'price': np.array([p or 0.0 for p in columns[4]], dtype=np.float64),
+        'stock': np.array([s or 0 for s in columns[5]], dtype=np.float64),
+        'min_threshold': np.array([t or 0 for t in columns[6]], dtype=np.float64)
+    }
+
+def load_daily_demand(start_day, end_day, batch_size=50000):
+    """
+    Outbound quantity per (product, day) in [start_day, end_day), aggregated in SQL
+    and streamed into flat arrays: product ids, day offsets from start_day, quantities.
+    """
+    day = func.date(Transaction.timestamp)
+    stmt = db.select(Transaction.product_id, day, func.sum(Transaction.quantity)).where(
+        Transaction.transaction_type == 'out',
+        Transaction.timestamp >= datetime.datetime.combine(start_day, datetime.time.min),
+        Transaction.timestamp < datetime.datetime.combine(end_day, datetime.time.min)
+    ).group_by(Transaction.product_id, day)
+
+    ids, days, qty = [], [], []
+    origin = np.datetime64(start_day, 'D')
+    result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+    for partition in result.partitions():
+        p, d, q = zip(*partition)
+        ids.append(np.array(p, dtype=np.int64))
+        # SQLite hands back 'YYYY-MM-DD' strings, Postgres date objects; numpy parses both
+        days.append((np.array([str(x) for x in d], dtype='datetime64[D]') - origin).astype(np.int64))
+        qty.append(np.array(q, dtype=np.float64))
+    if not ids:
+        return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.float64)
+    return np.concatenate(ids), np.concatenate(days), np.concatenate(qty)
+
+def compute_reorder_points(catalog_ids, stock, demand_ids, demand_days, demand_qty, history_days,
+                           lead_time_days=7, service_level=0.95, alpha=0.3, sma_window=28, method='ses',
+                           min_threshold=None):
+    """
+    Vectorized forecast for the whole catalog at once. Days without sales count
+    as zero demand. Every statistic is a weighted bincount over the sparse
+    (product, day) series, so cost is O(rows) with no dense SKU x day matrix.
+    A product needs reordering at or below max(reorder point, min_threshold)
+    (see reorder_trigger), but only if it has demand or a positive
+    min_threshold: a dead SKU at zero stock does not.
+    """
+    n = len(catalog_ids)
+    # Map demand rows onto catalog positions; drop rows for products no longer in the catalog
+    if n:
+        pos = np.minimum(np.searchsorted(catalog_ids, demand_ids), n - 1)
+        keep = catalog_ids[pos] == demand_ids
+    else:
+        pos = np.zeros(len(demand_ids), np.int64)
+        keep = np.zeros(len(demand_ids), bool)
+    keep &= (demand_days >= 0) & (demand_days < history_days)
+    pos, days, qty = pos[keep], demand_days[keep], demand_qty[keep]
+
+    total = np.bincount(pos, weights=qty, minlength=n)
+    mean = total / history_days
+    var = np.bincount(pos, weights=qty * qty, minlength=n) / history_days - mean ** 2
+    sigma = np.sqrt(np.maximum(var, 0.0))
+
+    window = min(sma_window, history_days)
+    recent = days >= history_days - window
+    sma = np.bincount(pos[recent], weights=qty[recent], minlength=n) / window
+
+    # Simple exponential smoothing seeded with the mean: level_T = sum a(1-a)^(T-1-d) x_d + (1-a)^T * mean
+    decay = (1.0 - alpha) ** (history_days - 1 - days)
+    ses = np.bincount(pos, weights=alpha * decay * qty, minlength=n) + (1.0 - alpha) ** history_days * mean
+
+    forecast = ses if method == 'ses' else sma
+    if min_threshold is None:
+        min_threshold = np.zeros(n)
+    z = NormalDist().inv_cdf(service_level)
+    safety_stock = z * sigma * np.sqrt(lead_time_days)
+    reorder_point = forecast * lead_time_days + safety_stock
+    trigger, needs_reorder = reorder_trigger(stock, reorder_point, forecast, min_threshold)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days_of_cover = np.where(forecast > 0, stock / forecast, np.inf)
+
+    return {
+        'mean_daily_demand': mean,
+        'sigma_daily_demand': sigma,
+        'sma_forecast': sma,
+        'ses_forecast': ses,
+        'forecast': forecast,
+        'safety_stock': safety_stock,
+        'reorder_point': reorder_point,
+        'reorder_trigger': trigger,
+        'days_of_cover': days_of_cover,
+        'needs_reorder': needs_reorder
+    }
+
+def reorder_trigger(stock, reorder_point, forecast, min_threshold):
+    # The one reorder rule, shared with the replenishment planner: the stock level at which
+    # a product is due (min_threshold floors the reorder point) and whether it is due now
+    trigger = np.maximum(reorder_point, min_threshold)
+    return trigger, (stock <= trigger) & ((forecast > 0) | (min_threshold > 0))
+
+def build_reorder_plan(history_days=90, lead_time_days=7, service_level=0.95, alpha=0.3,
+                       sma_window=28, method='ses', today=None):
+    # Two queries (catalog + aggregated ledger), then pure NumPy. The window ends at the
+    # start of today: a partial day would get the most SES weight and drag the forecast down.
+    today = today or datetime.datetime.utcnow().date()
+    end_day = today
+    start_day = end_day - datetime.timedelta(days=history_days)
+
+    catalog = load_catalog()
+    demand_ids, demand_days, demand_qty = load_daily_demand(start_day, end_day)
+    plan = compute_reorder_points(
+        catalog['id'], catalog['stock'], demand_ids, demand_days, demand_qty, history_days,
+        lead_time_days=lead_time_days, service_level=service_level, alpha=alpha,
+        sma_window=sma_window, method=method, min_threshold=catalog['min_threshold']
+    )
+    plan.update(catalog)
+    return plan
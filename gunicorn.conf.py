@@ -0,0 +1,26 @@
+# gunicorn -c gunicorn.conf.py   (Linux/macOS; gunicorn is not needed for `python app.py`)
+import multiprocessing
+import os
+from config import Config
+
+wsgi_app = 'app:create_app()'
+bind = os.environ.get('GUNICORN_BIND') or '0.0.0.0:8000'
+workers = int(os.environ.get('GUNICORN_WORKERS') or multiprocessing.cpu_count() * 2 + 1)
+# The SSE stock stream holds a connection open, so use threads or greenlets rather than sync workers.
+# Under gthread each open stream takes a thread; STREAM_MAX_SUBSCRIBERS keeps some free for the API.
+worker_class = Config.SERVER_WORKER_CLASS
+threads = Config.SERVER_THREADS
+
+# Build the app and import the deferred subsystems once in the master; workers are
+# forked with everything already loaded (and shared copy-on-write), so they boot in milliseconds
+preload_app = True
+
+def when_ready(server):
+    from app import preload_deferred
+    preload_deferred()
+
+def post_fork(server, worker):
+    # Never share pooled database connections across processes: each worker opens its own
+    from models import db
+    with server.app.wsgi().app_context():
+        db.engine.dispose(close=False)
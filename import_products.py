@@ -0,0 +1,36 @@
+import argparse
+import csv
+import time
+from app import create_app
+from config import BatchConfig
+from product_import import import_products, iter_csv, iter_ndjson
+
+app = create_app(BatchConfig)
+
+# Loads a supplier/catalog feed: upserts products by SKU from a CSV or NDJSON file
+#   python import_products.py feed.csv --errors feed_errors.csv
+parser = argparse.ArgumentParser(description='Bulk product import/upsert by SKU')
+parser.add_argument('path')
+parser.add_argument('--format', choices=('csv', 'ndjson'), help='defaults to the file extension')
+parser.add_argument('--chunk-size', type=int, default=app.config['IMPORT_CHUNK_SIZE'])
+parser.add_argument('--dry-run', action='store_true', help='validate only, write nothing')
+parser.add_argument('--errors', help='write every row error to this CSV file')
+args = parser.parse_args()
+
+fmt = args.format or ('ndjson' if args.path.endswith(('.ndjson', '.jsonl')) else 'csv')
+with app.app_context(), open(args.path, 'rb') as f:
+    started = time.perf_counter()
+    rows = iter_ndjson(f) if fmt == 'ndjson' else iter_csv(f)
+    report = import_products(rows, chunk_size=args.chunk_size, dry_run=args.dry_run,
+                             max_errors=float('inf') if args.errors else 1000)
+    print(f"{report.rows} rows in {time.perf_counter() - started:.1f}s: {report.inserted} inserted, "
+          f"{report.updated} updated, {report.failed} failed{' (dry run)' if args.dry_run else ''}")
+    if args.errors:
+        with open(args.errors, 'w', newline='') as out:
+            writer = csv.DictWriter(out, fieldnames=['row', 'sku', 'message'])
+            writer.writeheader()
+            writer.writerows(report.errors)
+        print(f"Errors written to {args.errors}")
+    else:
+        for error in report.errors[:20]:
+            print(f"  row {error['row']} ({error['sku']}): {error['message']}")
@@ -0,0 +1,130 @@
+import datetime
+import random
+import time
+from sqlalchemy import update, func
+from config import Config
+from models import db, Product, Transaction, InventoryStats, Location
+
+STATS_ID = 1
+# Monotonic time of this process's next look at the summary row (see reconcile_if_due)
+_next_check = 0.0
+
+def stats_row_id(location_id=None, product_id=None):
+    """
+    Summary row a write lands on. Central-stock counters are sharded by product
+    id over rows 1, 0, -1, ... (STATS_CENTRAL_SHARDS of them; row 1 also carries
+    the reconcile time); location N writes only row 1 + N, so checkouts in
+    different stores never update the same summary row. Readers sum the rows.
+    """
+    if location_id is not None:
+        return STATS_ID + location_id
+    if product_id is None:
+        product_id = random.randrange(Config.STATS_CENTRAL_SHARDS)
+    return STATS_ID - product_id % Config.STATS_CENTRAL_SHARDS
+
+def central_row_ids():
+    return [STATS_ID - shard for shard in range(Config.STATS_CENTRAL_SHARDS)]
+
+def is_low(stock, threshold):
+    # Form posts send numbers as strings; SQLite coerces them on insert, so do the same here
+    try:
+        return int(stock) <= int(threshold)
+    except (TypeError, ValueError):
+        return False
+
+def record_changes(products=0, low_stock=0, transactions=0, location_id=None, product_id=None):
+    """
+    Applies counter deltas and bumps the catalog version inside the caller's
+    transaction; call it from every write that changes products or stock.
+    Location-scoped writes pass their location_id and only touch its shard row;
+    central writes pass the product_id they changed (any shard otherwise). Issue
+    it as the last statement before the commit: the row lock is held until then.
+    Caller owns the commit. A missing summary row is fine: the next read reconciles it.
+    """
+    db.session.execute(
+        update(InventoryStats).where(InventoryStats.id == stats_row_id(location_id, product_id)).values(
+            product_count=InventoryStats.product_count + products,
+            low_stock_count=InventoryStats.low_stock_count + low_stock,
+            transaction_count=InventoryStats.transaction_count + transactions,
+            catalog_version=InventoryStats.catalog_version + 1
+        ).execution_options(synchronize_session=False)
+    )
+
+def catalog_version():
+    # Sum over the shard rows: every write bumps one of them, so the sum only ever grows.
+    # None until the summary rows exist (first stats read creates them)
+    return db.session.query(func.sum(InventoryStats.catalog_version)).scalar()
+
+def low_stock_delta(old_stock, old_threshold, new_stock, new_threshold):
+    return int(is_low(new_stock, new_threshold)) - int(is_low(old_stock, old_threshold))
+
+def get_stats():
+    # Sums the few summary rows; falls back to a full recount when stale or a row is missing
+    row = db.session.get(InventoryStats, STATS_ID)
+    central = db.session.query(func.count()).filter(InventoryStats.id.in_(central_row_ids())).scalar()
+    if _reconcile_due(row) <= 0 or central < Config.STATS_CENTRAL_SHARDS:
+        reconcile()
+    # Location rows hold no product or low-stock counts, only their share of the ledger total
+    products, low_stock, transactions = db.session.query(
+        func.sum(InventoryStats.product_count), func.sum(InventoryStats.low_stock_count),
+        func.sum(InventoryStats.transaction_count)
+    ).one()
+    return {
+        'total_products': products,
+        'low_stock_count': low_stock,
+        'recent_tx_count': transactions
+    }
+
+def reconcile_if_due():
+    """
+    Runs the periodic recount for readers that never reach get_stats() (cached
+    responses and 304s). Between recounts this is free: each process remembers
+    when the next one is due and only then reads the summary row.
+    """
+    global _next_check
+    if time.monotonic() < _next_check:
+        return
+    row = db.session.get(InventoryStats, STATS_ID)
+    if _reconcile_due(row) <= 0:
+        row = reconcile()
+    _next_check = time.monotonic() + max(_reconcile_due(row), 1)
+
+def _reconcile_due(row):
+    # Seconds until the counters need a full recount (<= 0: now)
+    if row is None or row.reconciled_at is None:
+        return 0
+    age = datetime.datetime.utcnow() - row.reconciled_at
+    return Config.STATS_RECONCILE_INTERVAL - age.total_seconds()
+
+def reconcile():
+    """
+    Recomputes every counter from the base tables and commits. Corrects any
+    drift from manual SQL edits or concurrent manual stock corrections.
+    """
+    rows = {row.id: row for row in InventoryStats.query.all()}
+    per_location = dict(
+        db.session.query(Transaction.location_id, func.count()).group_by(Transaction.location_id).all()
+    )
+    # Totals go on row 1; the other central shards and rows no longer in use restart at zero
+    expected = {row_id: (0, 0, 0) for row_id in list(rows) + central_row_ids()}
+    expected[STATS_ID] = (
+        Product.query.count(),
+        Product.query.filter(Product.stock_quantity <= Product.min_stock_threshold).count(),
+        per_location.get(None, 0)
+    )
+    for (location_id,) in db.session.query(Location.id):
+        expected[stats_row_id(location_id)] = (0, 0, per_location.get(location_id, 0))
+
+    now = datetime.datetime.utcnow()
+    for row_id, counts in expected.items():
+        row = rows.get(row_id)
+        if row is None:
+            row = InventoryStats(id=row_id, catalog_version=0)
+            db.session.add(row)
+        if counts != (row.product_count, row.low_stock_count, row.transaction_count):
+            # Corrected counters must not be served from caches keyed on the old version
+            row.catalog_version = (row.catalog_version or 0) + 1
+        row.product_count, row.low_stock_count, row.transaction_count = counts
+        row.reconciled_at = now
+    db.session.commit()
+    return db.session.get(InventoryStats, STATS_ID)
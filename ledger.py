@@ -0,0 +1,93 @@
+from sqlalchemy import select, union_all, literal, func, case, tuple_
+from models import db, Product, Transaction, LocationStock, StockTransfer, User
+
+# Per-product ledger of one stock (central or a location): movements and transfer
+# legs, newest first, each with the stock level right after it. Balances are
+# derived backwards from the current stock, so a manual correction or import
+# shows up as the point where they stop matching older counts.
+
+ORDER = ('timestamp', 'source', 'id')
+
+
+def product_ledger(product_id, location_id=None, limit=50, cursor=None):
+    """
+    One page of the ledger. cursor is (timestamp, source, id, balance) of the
+    last row of the previous page, so later pages start from a known balance
+    instead of summing everything newer. Each branch is a range scan of one
+    (product, location, timestamp) index; the running balance is a window sum
+    over the page. Returns at most limit + 1 rows (has-more detection).
+    """
+    branches = [
+        _branch(
+            Transaction, 'transaction', Transaction.transaction_type,
+            case((Transaction.transaction_type == 'in', Transaction.quantity), else_=-Transaction.quantity),
+            Transaction.product_id == product_id, _at(Transaction.location_id, location_id),
+            limit=limit, cursor=cursor
+        ),
+        _branch(
+            StockTransfer, 'transfer', literal('transfer_out'), -StockTransfer.quantity,
+            StockTransfer.product_id == product_id, _at(StockTransfer.from_location_id, location_id),
+            limit=limit, cursor=cursor
+        ),
+        _branch(
+            StockTransfer, 'transfer', literal('transfer_in'), StockTransfer.quantity,
+            StockTransfer.product_id == product_id, _at(StockTransfer.to_location_id, location_id),
+            limit=limit, cursor=cursor
+        ),
+    ]
+    merged = union_all(*branches).subquery()
+    page = select(merged).order_by(*_newest_first(merged)).limit(limit + 1).subquery()
+
+    if cursor is None:
+        # Same statement as the page, so the starting balance can't race a concurrent checkout
+        if location_id is None:
+            start = select(Product.stock_quantity).where(Product.id == product_id).scalar_subquery()
+        else:
+            start = select(LocationStock.quantity).where(
+                LocationStock.product_id == product_id, LocationStock.location_id == location_id
+            ).scalar_subquery()
+        start = func.coalesce(start, 0)
+    else:
+        start = literal(int(cursor[3]))
+    # Everything newer than a row within this page, i.e. what happened after it
+    newer = func.sum(page.c.delta).over(order_by=_newest_first(page), rows=(None, -1))
+
+    rows = db.session.execute(
+        select(
+            page.c.id, page.c.source, page.c.timestamp, page.c.type, page.c.quantity, page.c.delta,
+            User.username, (start - func.coalesce(newer, 0)).label('balance')
+        ).outerjoin(User, User.id == page.c.user_id).order_by(*_newest_first(page))
+    ).all()
+    return [
+        {'id': r.id, 'source': r.source, 'type': r.type, 'quantity': r.quantity, 'delta': r.delta,
+         'timestamp': r.timestamp, 'user': r.username, 'balance': r.balance}
+        for r in rows
+    ]
+
+
+def _at(column, location_id):
+    # Central stock is the NULL location; `= NULL` would never match
+    return column.is_(None) if location_id is None else column == location_id
+
+
+def _newest_first(table):
+    return [table.c[name].desc() for name in ORDER]
+
+
+def _branch(model, source, type_expr, delta, *conditions, limit, cursor):
+    stmt = select(
+        model.id.label('id'), literal(source).label('source'), model.timestamp.label('timestamp'),
+        type_expr.label('type'), model.quantity.label('quantity'), delta.label('delta'),
+        model.user_id.label('user_id')
+    ).where(*conditions)
+    if cursor is not None:
+        ts, cursor_source, cursor_id = cursor[:3]
+        # The plain bound keeps the index range tight; the tuple breaks ties at equal timestamps
+        stmt = stmt.where(
+            model.timestamp <= ts,
+            tuple_(model.timestamp, literal(source), model.id) < tuple_(ts, cursor_source, cursor_id)
+        )
+    # Each branch only needs its own newest limit + 1 rows
+    return select(
+        stmt.order_by(model.timestamp.desc(), model.id.desc()).limit(limit + 1).subquery()
+    )
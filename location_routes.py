@@ -0,0 +1,201 @@
+from flask import Blueprint, request, jsonify
+from sqlalchemy import tuple_, or_
+from sqlalchemy.exc import IntegrityError
+from models import db, Product, Location, LocationStock, StockTransfer
+from routes.auth_routes import token_required
+from pagination import parse_limit, encode_cursor, decode_cursor, parse_datetime
+from stock_service import InsufficientStockError, StockConflictError
+from location_stock import set_location_stock, transfer_stock, create_location, location_totals, chain_stock
+from inventory_stats import record_changes, is_low
+from response_cache import cached_json
+from stock_events import publish_stock
+from alerts import record_stock_change
+
+location_bp = Blueprint('locations', __name__)
+
+@location_bp.route('', methods=['GET'])
+@token_required
+def get_locations(current_user):
+    # Every location with its aggregate stock figures, computed in one GROUP BY
+    return cached_json(lambda: {'locations': location_totals()})
+
+@location_bp.route('', methods=['POST'])
+@token_required
+def add_location(current_user):
+    if current_user.role != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
+    data = request.get_json(silent=True) or {}
+    code, name = str(data.get('code') or '').strip(), str(data.get('name') or '').strip()
+    if not code or not name or len(code) > 20 or len(name) > 100:
+        return jsonify({'message': 'code (max 20 characters) and name (max 100) are required'}), 400
+    if Location.query.filter_by(code=code).first():
+        return jsonify({'message': 'Location code already exists'}), 400
+
+    try:
+        location = create_location(code, name)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'message': 'Location code already exists'}), 400
+    return jsonify({'message': 'Location created', 'id': location.id}), 201
+
+@location_bp.route('/<int:location_id>/stock', methods=['GET'])
+@token_required
+def get_location_stock(current_user, location_id):
+    if db.session.get(Location, location_id) is None:
+        return jsonify({'message': 'Location not found'}), 404
+    try:
+        limit = parse_limit(request.args)
+        query = db.session.query(LocationStock, Product.sku, Product.name, Product.min_stock_threshold).join(
+            Product, Product.id == LocationStock.product_id
+        ).filter(LocationStock.location_id == location_id)
+        if request.args.get('low_stock') == '1':
+            query = query.filter(
+                LocationStock.quantity <= db.func.coalesce(LocationStock.min_stock_threshold, Product.min_stock_threshold)
+            )
+        if request.args.get('cursor'):
+            (after_id,) = decode_cursor(request.args['cursor'])
+            query = query.filter(LocationStock.product_id > int(after_id))
+    except (ValueError, TypeError):
+        return jsonify({'message': 'Invalid query parameters'}), 400
+
+    rows = query.order_by(LocationStock.product_id).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    items = []
+    for stock, sku, name, product_threshold in rows:
+        threshold = stock.min_stock_threshold if stock.min_stock_threshold is not None else product_threshold
+        items.append({
+            'product_id': stock.product_id,
+            'sku': sku,
+            'name': name,
+            'quantity': stock.quantity,
+            'min_stock_threshold': threshold,
+            # No threshold at either level: never low
+            'is_low': is_low(stock.quantity, threshold)
+        })
+    next_cursor = encode_cursor(rows[-1][0].product_id) if has_more else None
+    return jsonify({'location_id': location_id, 'items': items, 'next_cursor': next_cursor})
+
+@location_bp.route('/<int:location_id>/stock/<int:product_id>', methods=['PUT'])
+@token_required
+def put_location_stock(current_user, location_id, product_id):
+    # Stock count correction for one store; expected_quantity makes it a compare-and-set
+    if current_user.role != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
+    if db.session.get(Location, location_id) is None or db.session.get(Product, product_id) is None:
+        return jsonify({'message': 'Location or product not found'}), 404
+    data = request.get_json(silent=True) or {}
+    try:
+        expected = data.get('expected_quantity')
+        threshold = data.get('min_stock_threshold')
+        new_stock = set_location_stock(
+            location_id, product_id, int(data['quantity']),
+            int(expected) if expected is not None else None,
+            int(threshold) if threshold is not None else None
+        )
+        record_changes(location_id=location_id)
+        db.session.commit()
+    except (StockConflictError, IntegrityError):
+        db.session.rollback()
+        return jsonify({'message': 'Stock changed since it was read, please retry'}), 409
+    except (KeyError, ValueError, TypeError):
+        db.session.rollback()
+        return jsonify({'message': 'Invalid stock quantity'}), 400
+    publish_stock(product_id, new_stock, location_id)
+    return jsonify({'message': 'Location stock updated', 'quantity': new_stock})
+
+@location_bp.route('/transfers', methods=['POST'])
+@token_required
+def create_transfer(current_user):
+    # Moves stock between two stores, or between the central stock (null / "central") and a store
+    data = request.get_json(silent=True) or {}
+    try:
+        ends = [_location_arg(data.get(key)) for key in ('from_location_id', 'to_location_id')]
+        quantity = int(data['quantity'])
+        product = db.session.get(Product, int(data['product_id']))
+    except (KeyError, ValueError, TypeError):
+        return jsonify({'message': 'product_id, quantity and two locations are required'}), 400
+    if product is None:
+        return jsonify({'message': 'Product not found'}), 404
+    known = {row[0] for row in db.session.query(Location.id).filter(Location.id.in_([e for e in ends if e is not None]))}
+    if any(e is not None and e not in known for e in ends):
+        return jsonify({'message': 'Location not found'}), 404
+
+    alert_info = (product.id, product.name, product.sku, product.min_stock_threshold)
+    try:
+        levels = transfer_stock(product, ends[0], ends[1], quantity, current_user.id)
+        db.session.commit()
+    except InsufficientStockError:
+        db.session.rollback()
+        return jsonify({'message': 'Insufficient stock at the source location'}), 400
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 400
+
+    for location_id, new_stock, delta in ((ends[0], levels[0], -quantity), (ends[1], levels[1], quantity)):
+        publish_stock(product.id, new_stock, location_id)
+        if location_id is None:
+            record_stock_change(*alert_info[:3], new_stock - delta, new_stock, alert_info[3])
+    return jsonify({'message': 'Transfer recorded', 'from_stock': levels[0], 'to_stock': levels[1]}), 201
+
+@location_bp.route('/transfers', methods=['GET'])
+@token_required
+def get_transfers(current_user):
+    # Newest first, keyset on (timestamp, id); location_id matches either end of the transfer
+    try:
+        limit = parse_limit(request.args)
+        query = StockTransfer.query
+        if request.args.get('product_id'):
+            query = query.filter(StockTransfer.product_id == int(request.args['product_id']))
+        if request.args.get('location_id'):
+            location_id = _location_arg(request.args['location_id'])
+            query = query.filter(or_(
+                StockTransfer.from_location_id == location_id, StockTransfer.to_location_id == location_id
+            ))
+        if request.args.get('cursor'):
+            ts, transfer_id = decode_cursor(request.args['cursor'])
+            query = query.filter(
+                tuple_(StockTransfer.timestamp, StockTransfer.id) < tuple_(parse_datetime(ts), int(transfer_id))
+            )
+    except (ValueError, TypeError):
+        return jsonify({'message': 'Invalid query parameters'}), 400
+
+    transfers = query.order_by(StockTransfer.timestamp.desc(), StockTransfer.id.desc()).limit(limit + 1).all()
+    has_more = len(transfers) > limit
+    transfers = transfers[:limit]
+    output = [{
+        'id': t.id,
+        'product_id': t.product_id,
+        'from_location_id': t.from_location_id,
+        'to_location_id': t.to_location_id,
+        'quantity': t.quantity,
+        'user_id': t.user_id,
+        'timestamp': t.timestamp.isoformat()
+    } for t in transfers]
+    next_cursor = encode_cursor(transfers[-1].timestamp, transfers[-1].id) if has_more else None
+    return jsonify({'transfers': output, 'next_cursor': next_cursor})
+
+@location_bp.route('/chain-stock', methods=['GET'])
+@token_required
+def get_chain_stock(current_user):
+    # Per-product stock across the whole chain (central + every location), paged by product id
+    try:
+        limit = parse_limit(request.args)
+        after_id = int(decode_cursor(request.args['cursor'])[0]) if request.args.get('cursor') else None
+        product_ids = [int(p) for p in request.args['product_id'].split(',')] if request.args.get('product_id') else None
+    except (ValueError, TypeError):
+        return jsonify({'message': 'Invalid query parameters'}), 400
+
+    def build():
+        items = chain_stock(limit, after_id, product_ids)
+        has_more = len(items) > limit
+        items = items[:limit]
+        return {'items': items, 'next_cursor': encode_cursor(items[-1]['product_id']) if has_more else None}
+    return cached_json(build)
+
+def _location_arg(value):
+    # None / '' / 'central' is the central stock, anything else a location id
+    if value in (None, '', 'central'):
+        return None
+    return int(value)
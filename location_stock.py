@@ -0,0 +1,186 @@
+from sqlalchemy import select, update, insert, func, case
+from models import db, Product, Location, LocationStock, StockTransfer, InventoryStats
+from db_engine import upsert_insert
+from stock_service import adjust_stock, InsufficientStockError, StockConflictError
+from inventory_stats import record_changes, stats_row_id, low_stock_delta
+from replenishment import mark_stale
+
+# Per-location stock. Every write is a single conditional statement on one
+# (location, product) row, so different stores never contend with each other;
+# chain-wide views are aggregated in SQL.
+
+_stock = LocationStock.__table__
+
+
+def adjust_location_stock(location_id, product_id, delta):
+    """
+    Atomically adds delta to a product's stock at one location and returns the
+    new level. Receiving stock creates the row on first use; removing stock is
+    a guarded UPDATE that raises InsufficientStockError. Caller owns the commit.
+    """
+    if delta < 0:
+        stmt = update(_stock).where(
+            _stock.c.location_id == location_id, _stock.c.product_id == product_id,
+            _stock.c.quantity >= -delta
+        ).values(quantity=_stock.c.quantity + delta)
+        new_stock = _execute(stmt, location_id, product_id)
+        if new_stock is None:
+            raise InsufficientStockError(product_id)
+        return new_stock
+
+    dialect_insert = upsert_insert(db.session.get_bind().dialect.name)
+    if dialect_insert is not None:
+        stmt = dialect_insert(_stock).values(location_id=location_id, product_id=product_id, quantity=delta)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['location_id', 'product_id'],
+            set_={'quantity': _stock.c.quantity + stmt.excluded.quantity}
+        )
+        return _execute(stmt, location_id, product_id)
+
+    new_stock = _execute(
+        update(_stock).where(_stock.c.location_id == location_id, _stock.c.product_id == product_id)
+        .values(quantity=_stock.c.quantity + delta),
+        location_id, product_id
+    )
+    if new_stock is None:
+        db.session.execute(insert(_stock).values(location_id=location_id, product_id=product_id, quantity=delta))
+        new_stock = delta
+    return new_stock
+
+
+def set_location_stock(location_id, product_id, quantity, expected=None, min_stock_threshold=None):
+    """
+    Overwrites one location's stock (count correction). With expected it is a
+    compare-and-set against the current level (0 for a product the location
+    never stocked) and raises StockConflictError if stock moved meanwhile.
+    """
+    if quantity < 0:
+        raise ValueError('Stock cannot be negative')
+    values = {'quantity': quantity}
+    if min_stock_threshold is not None:
+        values['min_stock_threshold'] = min_stock_threshold
+    stmt = update(_stock).where(_stock.c.location_id == location_id, _stock.c.product_id == product_id)
+    if expected is not None:
+        stmt = stmt.where(_stock.c.quantity == expected)
+    new_stock = _execute(stmt.values(values), location_id, product_id)
+    if new_stock is not None:
+        return new_stock
+
+    exists = db.session.execute(
+        select(_stock.c.quantity).where(_stock.c.location_id == location_id, _stock.c.product_id == product_id)
+    ).first()
+    if exists is not None or expected not in (None, 0):
+        raise StockConflictError(product_id)
+    # A concurrent first insert of the same row fails on the primary key; the caller rolls back
+    db.session.execute(insert(_stock).values(location_id=location_id, product_id=product_id, **values))
+    return quantity
+
+
+def transfer_stock(product, from_location_id, to_location_id, quantity, user_id):
+    """
+    Moves stock between two locations (None = central stock) in the caller's
+    transaction and records a StockTransfer. The two rows are always written in
+    the same order (central first, then ascending location id), so opposite
+    transfers between the same pair can't deadlock. Returns (from_stock, to_stock).
+    """
+    if quantity <= 0:
+        raise ValueError('Quantity must be positive')
+    if from_location_id == to_location_id:
+        raise ValueError('Source and destination must differ')
+
+    legs = sorted(((from_location_id, -quantity), (to_location_id, quantity)),
+                  key=lambda leg: (leg[0] is not None, leg[0] or 0))
+    levels = {}
+    for location_id, delta in legs:
+        if location_id is None:
+            levels[location_id] = adjust_stock(product.id, delta)
+            mark_stale([product.id])
+        else:
+            levels[location_id] = adjust_location_stock(location_id, product.id, delta)
+
+    db.session.add(StockTransfer(
+        product_id=product.id, from_location_id=from_location_id, to_location_id=to_location_id,
+        quantity=quantity, user_id=user_id
+    ))
+    db.session.flush()
+    # Summary rows are locked last, in the same order as the stock rows
+    threshold = product.min_stock_threshold
+    for location_id, delta in legs:
+        if location_id is None:
+            record_changes(low_stock=low_stock_delta(levels[location_id] - delta, threshold, levels[location_id], threshold),
+                           product_id=product.id)
+        else:
+            record_changes(location_id=location_id)
+    return levels[from_location_id], levels[to_location_id]
+
+
+def create_location(code, name):
+    # The location's summary shard row is created with it, so its first writes are counted;
+    # bumping it moves cached location lists onto a new version
+    location = Location(code=code, name=name)
+    db.session.add(location)
+    db.session.flush()
+    db.session.add(InventoryStats(id=stats_row_id(location.id), catalog_version=0))
+    record_changes(location_id=location.id)
+    return location
+
+
+def _effective_threshold():
+    return func.coalesce(LocationStock.min_stock_threshold, Product.min_stock_threshold)
+
+
+def location_totals():
+    # One GROUP BY over the stock rows: SKUs carried, units, stock value and low-stock count per location
+    low = func.sum(case((LocationStock.quantity <= _effective_threshold(), 1), else_=0))
+    rows = db.session.execute(
+        select(
+            Location.id, Location.code, Location.name,
+            func.count(LocationStock.product_id), func.coalesce(func.sum(LocationStock.quantity), 0),
+            func.coalesce(func.sum(LocationStock.quantity * Product.price), 0.0), func.coalesce(low, 0)
+        ).select_from(Location)
+        .outerjoin(LocationStock, LocationStock.location_id == Location.id)
+        .outerjoin(Product, Product.id == LocationStock.product_id)
+        .group_by(Location.id, Location.code, Location.name).order_by(Location.id)
+    ).all()
+    return [
+        {'location_id': r[0], 'code': r[1], 'name': r[2], 'products': r[3], 'units': int(r[4]),
+         'stock_value': round(float(r[5]), 2), 'low_stock_count': int(r[6])}
+        for r in rows
+    ]
+
+
+def chain_stock(limit, after_id=None, product_ids=None):
+    """
+    Chain-wide stock per product: central stock plus the sum over all locations,
+    paged by product id. The per-product sums are correlated subqueries served
+    from the (product_id, location_id, quantity) index, so a page costs the same
+    however many products the chain carries. Returns at most limit + 1 rows so
+    the caller can tell whether there is another page.
+    """
+    at_locations = select(LocationStock).where(LocationStock.product_id == Product.id)
+    stmt = select(
+        Product.id, Product.sku, Product.name, Product.stock_quantity,
+        at_locations.with_only_columns(func.coalesce(func.sum(LocationStock.quantity), 0)).scalar_subquery(),
+        at_locations.with_only_columns(func.count()).scalar_subquery()
+    )
+    if after_id is not None:
+        stmt = stmt.where(Product.id > after_id)
+    if product_ids:
+        stmt = stmt.where(Product.id.in_(product_ids))
+    rows = db.session.execute(stmt.order_by(Product.id).limit(limit + 1)).all()
+    return [
+        {'product_id': r[0], 'sku': r[1], 'name': r[2], 'central_stock': r[3] or 0,
+         'location_stock': int(r[4]), 'locations': int(r[5]), 'total_stock': (r[3] or 0) + int(r[4])}
+        for r in rows
+    ]
+
+
+def _execute(stmt, location_id, product_id):
+    # Returns the post-write quantity, or None when the WHERE guard matched no row
+    if db.engine.dialect.update_returning:
+        return db.session.execute(stmt.returning(_stock.c.quantity)).scalar()
+    if db.session.execute(stmt).rowcount == 0:
+        return None
+    return db.session.execute(
+        select(_stock.c.quantity).where(_stock.c.location_id == location_id, _stock.c.product_id == product_id)
+    ).scalar()
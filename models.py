@@ -24,6 +24,13 @@ class Product(db.Model):
     stock_quantity = db.Column(db.Integer, default=0)
     min_stock_threshold = db.Column(db.Integer, default=10)
 
+    # Backing indexes for catalog filters and sorted/keyset listing
+    __table_args__ = (
+        db.Index('ix_product_name_id', 'name', 'id'),
+        db.Index('ix_product_category', 'category'),
+        db.Index('ix_product_supplier', 'supplier'),
+    )
+
 class Transaction(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
@@ -31,10 +38,56 @@ class Transaction(db.Model):
     transaction_type = db.Column(db.String(10), nullable=False) # 'in' or 'out'
     timestamp = db.Column(db.DateTime, default=dt.datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # Store the movement happened at; None is the central stock (Product.stock_quantity)
+    location_id = db.Column(db.Integer, db.ForeignKey('location.id'), nullable=True)
 
     product = db.relationship('Product', backref=db.backref('transactions', lazy=True))
     user = db.relationship('User', backref=db.backref('transactions', lazy=True))
 
+    # Composite indexes backing keyset pagination and the history filters
+    __table_args__ = (
+        db.Index('ix_transaction_timestamp_id', 'timestamp', 'id'),
+        db.Index('ix_transaction_product_timestamp', 'product_id', 'timestamp', 'id'),
+        db.Index('ix_transaction_user_timestamp', 'user_id', 'timestamp', 'id'),
+        db.Index('ix_transaction_type_timestamp', 'transaction_type', 'timestamp', 'id'),
+        db.Index('ix_transaction_location_timestamp', 'location_id', 'timestamp', 'id'),
+        # Per-product ledger of one stock (central = NULL location), newest first
+        db.Index('ix_transaction_product_location_timestamp', 'product_id', 'location_id', 'timestamp', 'id'),
+    )
+
+class Location(db.Model):
+    # A store or warehouse holding its own stock (see location_stock.py)
+    id = db.Column(db.Integer, primary_key=True)
+    code = db.Column(db.String(20), unique=True, nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+
+class LocationStock(db.Model):
+    # One row per (location, product): checkouts in different stores never write the same row
+    location_id = db.Column(db.Integer, db.ForeignKey('location.id'), primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    min_stock_threshold = db.Column(db.Integer, nullable=True) # None falls back to the product's
+
+    __table_args__ = (
+        # Chain-wide per-product totals
+        db.Index('ix_location_stock_product', 'product_id', 'location_id', 'quantity'),
+    )
+
+class StockTransfer(db.Model):
+    # Stock moved between locations; kept out of Transaction so it never counts as demand
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    from_location_id = db.Column(db.Integer, db.ForeignKey('location.id'), nullable=True) # None = central
+    to_location_id = db.Column(db.Integer, db.ForeignKey('location.id'), nullable=True)
+    quantity = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    timestamp = db.Column(db.DateTime, default=dt.datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_stock_transfer_timestamp_id', 'timestamp', 'id'),
+        db.Index('ix_stock_transfer_product_timestamp', 'product_id', 'timestamp'),
+    )
+
 class LoginLog(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -42,3 +95,88 @@ class LoginLog(db.Model):
     logout_time = db.Column(db.DateTime, nullable=True)
 
     user = db.relationship('User', backref=db.backref('login_logs', lazy=True))
+
+    __table_args__ = (
+        # Latest session per user (logout) and the newest-first admin log listing
+        db.Index('ix_login_log_user_login_time', 'user_id', 'login_time'),
+        db.Index('ix_login_log_login_time_id', 'login_time', 'id'),
+    )
+
+class InventoryStats(db.Model):
+    # Summary counters kept current by the product/transaction write paths (see inventory_stats.py).
+    # Row 1 covers the catalog and central stock; each location writes its own shard row.
+    id = db.Column(db.Integer, primary_key=True)
+    product_count = db.Column(db.Integer, nullable=False, default=0)
+    low_stock_count = db.Column(db.Integer, nullable=False, default=0)
+    transaction_count = db.Column(db.Integer, nullable=False, default=0)
+    # Bumped by every catalog/stock write; read-side caches and ETags key off it
+    catalog_version = db.Column(db.Integer, nullable=False, default=0)
+    reconciled_at = db.Column(db.DateTime, default=dt.datetime.utcnow)
+
+class AuthEpoch(db.Model):
+    # One row, bumped in the same transaction as any change to who a user is or what they may do;
+    # every worker polls it to drop token caches filled before the change (see auth_routes.py)
+    id = db.Column(db.Integer, primary_key=True)
+    epoch = db.Column(db.Integer, nullable=False, default=0)
+
+class MovementRollup(db.Model):
+    # Per-product movement totals per hour and per day (see rollups.py); bucket is the UTC period start
+    period = db.Column(db.String(4), primary_key=True) # 'hour' or 'day'
+    bucket = db.Column(db.DateTime, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), primary_key=True)
+    location_id = db.Column(db.Integer, primary_key=True, default=0) # 0 = central stock
+    quantity_in = db.Column(db.Integer, nullable=False, default=0)
+    quantity_out = db.Column(db.Integer, nullable=False, default=0)
+    # Outbound quantity x Product.price at the time it was recorded
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+    movements = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_movement_rollup_product_period_bucket', 'product_id', 'period', 'bucket'),
+    )
+
+class ProductClassification(db.Model):
+    # Latest ABC/XYZ classification run (see classification.py); replaced wholesale on every run
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), primary_key=True)
+    abc_class = db.Column(db.String(1), nullable=False) # A/B/C by share of outbound value
+    xyz_class = db.Column(db.String(1), nullable=False) # X/Y/Z by demand coefficient of variation
+    demand_value = db.Column(db.Float, nullable=False, default=0.0)
+    value_share = db.Column(db.Float, nullable=False, default=0.0)
+    cumulative_share = db.Column(db.Float, nullable=False, default=0.0)
+    mean_demand = db.Column(db.Float, nullable=False, default=0.0) # units per bucket
+    demand_cv = db.Column(db.Float, nullable=True) # None when there was no demand
+    computed_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_product_classification_classes', 'abc_class', 'xyz_class'),
+    )
+
+class StockSnapshot(db.Model):
+    # Stock at the start of a UTC day per product and location (0 = central), see stock_history.py.
+    # Zero quantities are not stored.
+    day = db.Column(db.Date, primary_key=True)
+    location_id = db.Column(db.Integer, primary_key=True, default=0)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False)
+
+class ReplenishmentLine(db.Model):
+    # Latest replenishment plan, one row per product (see replenishment.py). Forecast inputs come
+    # from the nightly run; stock, price and supplier are refreshed when a write marks the row stale.
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), primary_key=True)
+    supplier = db.Column(db.String(100))
+    forecast = db.Column(db.Float, nullable=False, default=0.0) # units per day
+    reorder_point = db.Column(db.Float, nullable=False, default=0.0) # forecast-based, before min_stock_threshold
+    stock = db.Column(db.Integer, nullable=False, default=0)
+    min_stock_threshold = db.Column(db.Integer, nullable=False, default=0)
+    unit_price = db.Column(db.Float, nullable=False, default=0.0)
+    eoq = db.Column(db.Float, nullable=False, default=0.0)
+    base_quantity = db.Column(db.Integer, nullable=False, default=0) # before the supplier minimum order value
+    order_quantity = db.Column(db.Integer, nullable=False, default=0) # 0 = nothing to order
+    computed_at = db.Column(db.DateTime, nullable=True) # last full run; None for products added since
+    stale = db.Column(db.Boolean, nullable=False, default=False)
+    changes = db.Column(db.Integer, nullable=False, default=0) # bumped with stale, so a refresh can't clear a newer mark
+
+    __table_args__ = (
+        db.Index('ix_replenishment_line_supplier', 'supplier', 'product_id'),
+        db.Index('ix_replenishment_line_stale', 'stale'),
+    )
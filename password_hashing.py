@@ -0,0 +1,110 @@
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import generate_password_hash, check_password_hash
+from cache import TTLCache
+from config import Config
+
+
+class HasherBusy(Exception):
+    # Too many hashes already queued; callers answer 503 instead of piling up
+    pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(max(Config.HASH_MAX_PENDING, 1))
+
+def hash_password(password):
+    return _run(generate_password_hash, password, method=hash_method())
+
+def verify_password(password_hash, password):
+    return _run(check_password_hash, password_hash, password)
+
+def hash_method():
+    # werkzeug's bare 'scrypt' means n=2**15, r=8, p=1; spell it out so it compares with stored hashes
+    method = Config.PASSWORD_HASH_METHOD
+    return 'scrypt:32768:8:1' if method == 'scrypt' else method
+
+def needs_rehash(password_hash):
+    # Stored hashes look like 'scrypt:32768:8:1$salt$hash'
+    return password_hash.split('$', 1)[0] != hash_method()
+
+def _run(fn, *args, **kwargs):
+    """
+    Runs a hashing call in the process pool so scrypt's CPU and memory cost stays
+    off the request workers. HASH_WORKERS=0 runs inline (dev/tests).
+    """
+    if Config.HASH_WORKERS <= 0:
+        return fn(*args, **kwargs)
+    if not _slots.acquire(timeout=Config.HASH_QUEUE_TIMEOUT):
+        raise HasherBusy()
+    try:
+        try:
+            return _get_pool().submit(fn, *args, **kwargs).result()
+        except BrokenProcessPool:
+            _reset_pool()
+            return _get_pool().submit(fn, *args, **kwargs).result()
+    finally:
+        _slots.release()
+
+def _get_pool():
+    global _pool
+    # Created lazily so each (forked) server worker gets its own pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=Config.HASH_WORKERS)
+    return _pool
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+class RateLimiter:
+    """
+    Fixed-window attempt counter per key (a client IP, or username + IP for
+    failed logins). Bounded memory: old windows simply age out of the
+    underlying TTL cache.
+    """
+
+    def __init__(self, limit, window, maxsize=100000):
+        self.limit = limit
+        self.window = window
+        self._counts = TTLCache(maxsize=maxsize, ttl=window)
+        self._lock = threading.Lock()
+
+    def allow(self, key):
+        # Counts this attempt; False once the key is over the limit
+        if self.limit <= 0:
+            return True
+        return self.record(key) <= self.limit
+
+    def blocked(self, key):
+        # Whether the key already used up this window, without counting an attempt
+        if self.limit <= 0:
+            return False
+        with self._lock:
+            return self._counts.get(self._bucket(key), 0) >= self.limit
+
+    def record(self, key):
+        bucket = self._bucket(key)
+        with self._lock:
+            count = self._counts.get(bucket, 0) + 1
+            self._counts.set(bucket, count)
+        return count
+
+    def _bucket(self, key):
+        return (key, int(time.time() // self.window))
+
+    def retry_after(self):
+        return int(self.window - time.time() % self.window) + 1
+
+
+auth_throttle = RateLimiter(Config.AUTH_RATE_LIMIT, Config.AUTH_RATE_WINDOW)
+login_failures = RateLimiter(Config.LOGIN_FAILURE_LIMIT, Config.LOGIN_FAILURE_WINDOW)
@@ -0,0 +1,21 @@
+import argparse
+import time
+from app import create_app, db
+from config import BatchConfig
+from replenishment import run_replenishment
+
+app = create_app(BatchConfig)
+
+# Rebuilds the replenishment plan (draft purchase orders per supplier) for the whole catalog (run nightly from cron)
+parser = argparse.ArgumentParser(description='Replenishment planning')
+parser.add_argument('--history-days', type=int, help='defaults to FORECAST_HISTORY_DAYS')
+parser.add_argument('--lead-time-days', type=float, help='defaults to FORECAST_LEAD_TIME_DAYS')
+args = parser.parse_args()
+
+with app.app_context():
+    db.create_all()
+    started = time.perf_counter()
+    summary = run_replenishment(args.history_days, args.lead_time_days)
+    print(f"Planned {summary['products']} products in {time.perf_counter() - started:.1f}s")
+    print(f"  {summary['lines']} lines to order from {summary['suppliers']} suppliers: "
+          f"{summary['units']} units, value {summary['value']:.2f}")
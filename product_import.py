@@ -0,0 +1,281 @@
+import csv
+import io
+import json
+from sqlalchemy import select, update, insert, bindparam
+from models import db, Product
+from db_engine import upsert_insert
+from inventory_stats import record_changes, low_stock_delta, is_low
+from alerts import record_stock_change
+from replenishment import mark_stale, REPLENISHMENT_FIELDS
+from stock_events import publish_stock
+
+# Columns a feed may carry; only sku is always required (name too for new products)
+IMPORT_FIELDS = ('sku', 'name', 'category', 'supplier', 'price', 'stock_quantity', 'min_stock_threshold')
+NEW_PRODUCT_DEFAULTS = {'category': None, 'supplier': None, 'price': 0.0, 'stock_quantity': 0, 'min_stock_threshold': 10}
+_MAX_LENGTH = {'sku': 50, 'name': 100, 'category': 50, 'supplier': 100}
+
+_products = Product.__table__
+
+
+class ImportReport:
+    def __init__(self, max_errors):
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors = []
+        self.max_errors = max_errors
+
+    def error(self, row, sku, message):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'row': row, 'sku': sku, 'message': message})
+
+    def to_dict(self):
+        return {
+            'rows': self.rows,
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors)
+        }
+
+
+def iter_csv(stream):
+    """
+    (line number, dict) pairs from a binary CSV stream. The header is checked
+    up front (ValueError); data rows are read lazily.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(text)
+    unknown = [f for f in reader.fieldnames or () if f not in IMPORT_FIELDS]
+    if not reader.fieldnames or 'sku' not in reader.fieldnames or unknown:
+        raise ValueError(f"CSV header must include sku and only use: {', '.join(IMPORT_FIELDS)}")
+
+    def rows():
+        for row in reader:
+            if None in row:
+                # More cells than header columns
+                yield reader.line_num, None
+                continue
+            # Empty cells mean "not provided", so an update keeps the current value
+            yield reader.line_num, {k: v.strip() for k, v in row.items() if v and v.strip()}
+    return rows()
+
+def iter_ndjson(stream):
+    for number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            item = None
+        yield number, item
+
+def clean_row(item):
+    """
+    Validates one feed row and coerces its types. Returns (fields, error);
+    fields only holds the columns the row actually provided.
+    """
+    if not isinstance(item, dict):
+        return None, 'Malformed row'
+    fields = {}
+    try:
+        for name, value in item.items():
+            if name not in IMPORT_FIELDS:
+                return None, f'Unknown field {name}'
+            if value is None or value == '':
+                continue
+            if name == 'price':
+                value = float(value)
+                if value < 0:
+                    return None, 'price must not be negative'
+            elif name in ('stock_quantity', 'min_stock_threshold'):
+                value = int(value)
+                if value < 0:
+                    return None, f'{name} must not be negative'
+            else:
+                value = str(value).strip()
+                if len(value) > _MAX_LENGTH[name]:
+                    return None, f'{name} is longer than {_MAX_LENGTH[name]} characters'
+            fields[name] = value
+    except (ValueError, TypeError):
+        return None, 'Invalid number'
+    if not fields.get('sku'):
+        return None, 'Missing sku'
+    return fields, None
+
+def import_products(rows, chunk_size=1000, dry_run=False, max_errors=1000):
+    """
+    Upserts (row number, row) pairs by SKU in chunks, one transaction per chunk.
+    A chunk costs one SELECT for the existing SKUs plus one INSERT ... ON CONFLICT
+    DO NOTHING for the new ones and one executemany UPDATE per distinct column set,
+    instead of a lookup and insert per row. Stock on known SKUs is re-read with
+    the rows locked and written in one more executemany UPDATE, so counters and
+    alerts see the level it replaced, not the one of the first SELECT. Bad rows are reported and skipped;
+    they never fail the rest of their chunk.
+    """
+    report = ImportReport(max_errors)
+    seen = set()
+    chunk = []
+    number = 0
+    try:
+        for number, item in rows:
+            report.rows += 1
+            fields, error = clean_row(item)
+            if not error and fields['sku'] in seen:
+                error = 'Duplicate sku in this import'
+            if error:
+                report.error(number, item.get('sku') if isinstance(item, dict) else None, error)
+                continue
+            seen.add(fields['sku'])
+            chunk.append((number, fields))
+            if len(chunk) >= chunk_size:
+                _apply_chunk(chunk, report, dry_run)
+                chunk = []
+    except UnicodeDecodeError as e:
+        # The text decoder can't resume after a bad byte; rows read so far are still imported
+        report.error(None, None, f'Feed is not valid UTF-8 ({e.reason}) after row {number}; the rest was not read')
+    if chunk:
+        _apply_chunk(chunk, report, dry_run)
+    return report
+
+def _apply_chunk(chunk, report, dry_run):
+    existing = _select_existing([fields['sku'] for number, fields in chunk])
+    accepted = []
+    for number, fields in chunk:
+        if fields['sku'] not in existing and not fields.get('name'):
+            report.error(number, fields['sku'], 'name is required for new products')
+            continue
+        accepted.append((number, fields))
+
+    if dry_run or not accepted:
+        new = sum(fields['sku'] not in existing for number, fields in accepted)
+        report.inserted += new
+        report.updated += len(accepted) - new
+        return
+
+    try:
+        new_rows = sorted(
+            (dict(NEW_PRODUCT_DEFAULTS, **fields) for number, fields in accepted if fields['sku'] not in existing),
+            key=lambda f: f['sku']
+        )
+        inserted = _insert_new(new_rows, upsert_insert(db.session.get_bind().dialect.name))
+        raced = [f['sku'] for f in new_rows if f['sku'] not in inserted]
+        if raced:
+            # Created concurrently since the SELECT above: update them like any known SKU
+            existing.update(_select_existing(raced))
+
+        low_stock = sum(is_low(f['stock_quantity'], f['min_stock_threshold']) for f in new_rows if f['sku'] in inserted)
+        replanned = list(inserted.values())
+        updates = []
+        groups = {}
+        for number, fields in accepted:
+            if fields['sku'] not in existing:
+                continue
+            updates.append(fields)
+            if any(name in fields for name in REPLENISHMENT_FIELDS):
+                replanned.append(existing[fields['sku']].id)
+            # Rows sharing a column set go in one statement; an update only overwrites provided columns.
+            # Stock is written separately, by _update_stock.
+            groups.setdefault(tuple(sorted(name for name in fields if name != 'stock_quantity')), []).append(fields)
+        for columns, group in groups.items():
+            _update_group(group, columns)
+        replaced = _update_stock(sorted((f for f in updates if 'stock_quantity' in f), key=lambda f: f['sku']))
+
+        stock_changes = []
+        for fields in updates:
+            current = existing[fields['sku']]
+            old_stock = new_stock = current.stock_quantity
+            if fields['sku'] in replaced:
+                old_stock, new_stock = replaced[fields['sku']], fields['stock_quantity']
+            new_threshold = fields.get('min_stock_threshold', current.min_stock_threshold)
+            low_stock += low_stock_delta(old_stock, current.min_stock_threshold, new_stock, new_threshold)
+            if new_stock != old_stock or new_threshold != current.min_stock_threshold:
+                stock_changes.append((current, old_stock, new_stock, new_threshold))
+        mark_stale(replanned)
+        record_changes(products=len(inserted), low_stock=low_stock)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        for number, fields in accepted:
+            report.error(number, fields['sku'], f'Chunk failed: {e}')
+        return
+
+    report.inserted += len(inserted)
+    report.updated += len(accepted) - len(inserted)
+    for f in new_rows:
+        if f['sku'] in inserted:
+            publish_stock(inserted[f['sku']], f['stock_quantity'])
+    # Same alerting as a manual edit: only fires for threshold crossings (stock or threshold moving)
+    for current, old_stock, new_stock, new_threshold in stock_changes:
+        record_stock_change(current.id, current.name, current.sku, old_stock, new_stock,
+                            new_threshold, current.min_stock_threshold)
+        if new_stock != old_stock:
+            publish_stock(current.id, new_stock)
+
+def _select_existing(skus):
+    return {
+        row.sku: row for row in db.session.execute(
+            select(Product.id, Product.sku, Product.name, Product.stock_quantity, Product.min_stock_threshold)
+            .where(Product.sku.in_(skus))
+        )
+    }
+
+def _insert_new(rows, dialect_insert):
+    """
+    Inserts full rows for new SKUs and returns {sku: id} for the rows actually
+    inserted. ON CONFLICT DO NOTHING skips a SKU created concurrently since the
+    chunk's SELECT instead of failing the chunk; RETURNING tells the caller which
+    ones were skipped, so they are counted and updated as existing products.
+    """
+    if not rows:
+        return {}
+    if dialect_insert is None:
+        db.session.execute(insert(_products), rows)
+        return dict(db.session.execute(
+            select(Product.sku, Product.id).where(Product.sku.in_([f['sku'] for f in rows]))
+        ).all())
+    stmt = dialect_insert(_products).on_conflict_do_nothing(index_elements=['sku'])
+    return dict(db.session.execute(stmt.returning(_products.c.sku, _products.c.id), rows).all())
+
+def _update_stock(rows):
+    """
+    Writes stock for known SKUs (sorted by sku) and returns {sku: the level it
+    replaced}. The current levels are read in one statement with the rows locked
+    until the chunk commits, so a concurrent sale can't land between the read and
+    the write: FOR UPDATE in sku order on Postgres (every chunk locks in the same
+    order, so imports can't deadlock), and on SQLite a no-op UPDATE of the same rows
+    first takes the database write lock. Then one executemany UPDATE.
+    """
+    if not rows:
+        return {}
+    skus = [f['sku'] for f in rows]
+    stmt = select(_products.c.sku, _products.c.stock_quantity).where(_products.c.sku.in_(skus)).order_by(_products.c.sku)
+    if db.session.get_bind().dialect.name == 'sqlite':
+        db.session.execute(
+            update(_products).where(_products.c.sku.in_(skus)).values(stock_quantity=_products.c.stock_quantity)
+        )
+    else:
+        stmt = stmt.with_for_update()
+    replaced = dict(db.session.execute(stmt).all())
+    db.session.execute(
+        update(_products).where(_products.c.sku == bindparam('b_sku')).values(stock_quantity=bindparam('b_stock_quantity')),
+        [{'b_sku': f['sku'], 'b_stock_quantity': f['stock_quantity']} for f in rows if f['sku'] in replaced]
+    )
+    return replaced
+
+def _update_group(group, columns):
+    """
+    Known SKUs get one executemany UPDATE of the provided columns (an upsert can't
+    carry partial rows: SQLite checks NOT NULL on the insert half first).
+    """
+    if len(columns) > 1:
+        group.sort(key=lambda f: f['sku'])
+        db.session.execute(
+            update(_products).where(_products.c.sku == bindparam('b_sku'))
+            .values({name: bindparam(f'b_{name}') for name in columns if name != 'sku'}),
+            [{f'b_{k}': v for k, v in f.items()} for f in group]
+        )
@@ -1,26 +1,95 @@
-from flask import Blueprint, request, jsonify
-from models import db, Product
-from routes.auth_routes import token_required
+from flask import Blueprint, request, jsonify, Response, stream_with_context, current_app
+from sqlalchemy import tuple_
+from models import (db, Product, Transaction, StockTransfer, LocationStock, ReplenishmentLine, MovementRollup,
+                    ProductClassification, StockSnapshot)
+from routes.auth_routes import token_required, resolve_token
+from stock_service import set_stock, StockConflictError
+from alerts import record_stock_change
+from inventory_stats import record_changes, is_low, low_stock_delta
+from pagination import parse_limit, encode_cursor, decode_cursor, parse_datetime
+from search_index import search_filter
+from response_cache import cached_json
+from stock_events import hub, sse_stream, publish_stock, publish_deleted
+from product_import import import_products, iter_csv, iter_ndjson
+from ledger import product_ledger
+from replenishment import mark_stale, REPLENISHMENT_FIELDS
 
 product_bp = Blueprint('products', __name__)
 
+PRODUCT_FIELDS = ('id', 'sku', 'name', 'category', 'supplier', 'price', 'stock_quantity', 'min_stock_threshold')
+SORTABLE_FIELDS = ('id', 'sku', 'name', 'price', 'stock_quantity')
+# Sort columns that may hold NULL sort (and page) as this value: a NULL never compares in a keyset
+SORT_NULLS_AS = {'stock_quantity': 0}
+# Per-product rows that are deleted with the product. Its ledger (transactions, transfers) never
+# is: a product with history can't be deleted
+PRODUCT_OWNED_TABLES = (LocationStock, ReplenishmentLine, MovementRollup, ProductClassification, StockSnapshot)
+
 @product_bp.route('', methods=['GET'])
 @token_required
 def get_products(current_user):
-    products = Product.query.all()
-    output = []
-    for product in products:
-        product_data = {}
-        product_data['id'] = product.id
-        product_data['sku'] = product.sku
-        product_data['name'] = product.name
-        product_data['category'] = product.category
-        product_data['supplier'] = product.supplier
-        product_data['price'] = product.price
-        product_data['stock_quantity'] = product.stock_quantity
-        product_data['min_stock_threshold'] = product.min_stock_threshold
-        output.append(product_data)
-    return jsonify({'products': output})
+    # Server-side search/filter/sort. Without ?limit= every match is returned (the
+    # dashboard dropdowns rely on that, with ?fields=); with it, results are keyset-paginated.
+    # The dashboard product table pages with ?q=&limit=&cursor=.
+    args = request.args
+    try:
+        fields = [f for f in args.get('fields', '').split(',') if f] or list(PRODUCT_FIELDS)
+        if any(f not in PRODUCT_FIELDS for f in fields):
+            raise ValueError(f"fields must be a subset of {', '.join(PRODUCT_FIELDS)}")
+        sort = args.get('sort', 'id')
+        if sort not in SORTABLE_FIELDS:
+            raise ValueError(f"sort must be one of {', '.join(SORTABLE_FIELDS)}")
+        descending = args.get('order', 'asc') == 'desc'
+        limit = parse_limit(args, default=None)
+        mode = args.get('match', 'prefix')
+        if mode not in ('prefix', 'contains', 'fuzzy'):
+            raise ValueError('match must be prefix, contains or fuzzy')
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    sort_col = getattr(Product, sort)
+    if sort in SORT_NULLS_AS:
+        sort_col = db.func.coalesce(sort_col, SORT_NULLS_AS[sort])
+    # Only the requested columns leave the database (plus the keyset columns)
+    selected = list(dict.fromkeys(fields + ['id', sort]))
+    query = db.select(*[getattr(Product, f) for f in selected])
+
+    condition = search_filter(args.get('q'), mode)
+    if condition is not None:
+        query = query.where(condition)
+    if args.get('category'):
+        query = query.where(Product.category == args['category'])
+    if args.get('supplier'):
+        query = query.where(Product.supplier == args['supplier'])
+    if args.get('low_stock') == '1':
+        query = query.where(Product.stock_quantity <= Product.min_stock_threshold)
+
+    if args.get('cursor'):
+        try:
+            last_value, last_id = decode_cursor(args['cursor'])
+        except ValueError:
+            return jsonify({'message': 'Invalid cursor'}), 400
+        key, last = tuple_(sort_col, Product.id), tuple_(last_value, last_id)
+        query = query.where(key < last if descending else key > last)
+
+    if descending:
+        query = query.order_by(sort_col.desc(), Product.id.desc())
+    else:
+        query = query.order_by(sort_col, Product.id)
+    if limit:
+        query = query.limit(limit + 1)
+
+    def build():
+        rows = db.session.execute(query).all()
+        next_cursor = None
+        if limit and len(rows) > limit:
+            rows = rows[:limit]
+            last_value = getattr(rows[-1], sort)
+            next_cursor = encode_cursor(SORT_NULLS_AS.get(sort) if last_value is None else last_value, rows[-1].id)
+        output = [{f: getattr(row, f) for f in fields} for row in rows]
+        return {'products': output, 'next_cursor': next_cursor}
+
+    # Unchanged catalog -> 304 or pre-serialized bytes, no query or serialization
+    return cached_json(build)
 
 @product_bp.route('', methods=['POST'])
 @token_required
@@ -48,10 +117,43 @@ def add_product(current_user):
     )
 
     db.session.add(new_product)
+    mark_stale([new_product.id])
+    record_changes(products=1, low_stock=int(is_low(new_product.stock_quantity, new_product.min_stock_threshold)),
+                   product_id=new_product.id)
     db.session.commit()
+    publish_stock(new_product.id, new_product.stock_quantity)
 
     return jsonify({'message': 'Product added successfully!'}), 201
 
+@product_bp.route('/import', methods=['POST'])
+@token_required
+def import_product_feed(current_user):
+    # Upsert by SKU from a CSV or NDJSON body (or a multipart 'file' upload), streamed in chunks
+    if current_user.role != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
+    try:
+        chunk_size = int(request.args.get('chunk_size') or current_app.config['IMPORT_CHUNK_SIZE'])
+        if chunk_size < 1:
+            raise ValueError('chunk_size must be positive')
+        stream, fmt = request.stream, request.args.get('format') or request.content_type or ''
+        if 'file' in request.files:
+            upload = request.files['file']
+            stream, fmt = upload.stream, request.args.get('format') or upload.filename or ''
+        if 'ndjson' in fmt:
+            rows = iter_ndjson(stream)
+        elif 'csv' in fmt:
+            rows = iter_csv(stream)
+        else:
+            raise ValueError('Send text/csv or application/x-ndjson (or pass ?format=csv|ndjson)')
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    report = import_products(
+        rows, chunk_size=chunk_size, dry_run=request.args.get('dry_run') == '1',
+        max_errors=current_app.config['IMPORT_MAX_ERRORS']
+    )
+    return jsonify(report.to_dict()), 207 if report.failed else 200
+
 @product_bp.route('/<int:id>', methods=['PUT'])
 @token_required
 def update_product(current_user, id):
@@ -60,17 +162,38 @@ def update_product(current_user, id):
 
     product = Product.query.get_or_404(id)
     data = request.get_json()
+    old_stock, old_threshold = product.stock_quantity, product.min_stock_threshold
 
     product.name = data.get('name', product.name)
     product.category = data.get('category', product.category)
     product.supplier = data.get('supplier', product.supplier)
     product.price = data.get('price', product.price)
     product.min_stock_threshold = data.get('min_stock_threshold', product.min_stock_threshold)
-    # Stock quantity is usually updated via transactions, but Admin might correct it manually
+    # Stock quantity is usually updated via transactions, but Admin might correct it manually.
+    # Passing expected_stock_quantity turns the correction into a compare-and-set.
+    new_stock = old_stock
     if 'stock_quantity' in data:
-         product.stock_quantity = data['stock_quantity']
+        try:
+            expected = data.get('expected_stock_quantity')
+            # The level the UPDATE actually replaced, not the one loaded above
+            old_stock, new_stock = set_stock(product.id, int(data['stock_quantity']), int(expected) if expected is not None else None)
+        except StockConflictError:
+            db.session.rollback()
+            return jsonify({'message': 'Stock changed since it was read, please retry'}), 409
+        except (ValueError, TypeError):
+            db.session.rollback()
+            return jsonify({'message': 'Invalid stock quantity'}), 400
 
+    if any(key in data for key in REPLENISHMENT_FIELDS):
+        mark_stale([id])
+    record_changes(low_stock=low_stock_delta(old_stock, old_threshold, new_stock, product.min_stock_threshold),
+                   product_id=id)
     db.session.commit()
+    # Raising the threshold above the current stock alerts just like a stock drop
+    if new_stock != old_stock or product.min_stock_threshold != old_threshold:
+        record_stock_change(id, product.name, product.sku, old_stock, new_stock, product.min_stock_threshold, old_threshold)
+    if 'stock_quantity' in data:
+        publish_stock(id, new_stock)
     return jsonify({'message': 'Product updated'})
 
 @product_bp.route('/<int:id>', methods=['DELETE'])
@@ -80,8 +203,75 @@ def delete_product(current_user, id):
         return jsonify({'message': 'Unauthorized'}), 403
         
     product = Product.query.get_or_404(id)
+    has_history = db.session.query(
+        db.exists().where(Transaction.product_id == id) | db.exists().where(StockTransfer.product_id == id)
+    ).scalar()
+    if has_history:
+        return jsonify({'message': 'Product has transaction history and cannot be deleted'}), 409
+    purge_product_rows(id)
     db.session.delete(product)
+    record_changes(products=-1, low_stock=-int(is_low(product.stock_quantity, product.min_stock_threshold)),
+                   product_id=id)
     db.session.commit()
+    publish_deleted(id)
     
     return jsonify({'message': 'Product deleted'})
 
+def purge_product_rows(product_id):
+    # Caller owns the commit
+    for model in PRODUCT_OWNED_TABLES:
+        model.query.filter_by(product_id=product_id).delete(synchronize_session=False)
+
+@product_bp.route('/<int:id>/transactions', methods=['GET'])
+@token_required
+def get_product_ledger(current_user, id):
+    # One product's movements and transfers for one stock (central unless location_id), newest
+    # first, with the stock level after each; keyset cursor pages cost one index range scan
+    if db.session.get(Product, id) is None:
+        return jsonify({'message': 'Product not found'}), 404
+    try:
+        limit = parse_limit(request.args)
+        location = request.args.get('location_id')
+        location_id = None if location in (None, '', 'central') else int(location)
+        cursor = None
+        if request.args.get('cursor'):
+            ts, source, row_id, balance = decode_cursor(request.args['cursor'])
+            cursor = (parse_datetime(ts), str(source), int(row_id), int(balance))
+    except (ValueError, TypeError):
+        return jsonify({'message': 'Invalid query parameters'}), 400
+
+    rows = product_ledger(id, location_id, limit, cursor)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    for row in rows:
+        row['timestamp'] = row['timestamp'].isoformat()
+
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        # The balance before the last row is where the next page starts
+        next_cursor = encode_cursor(last['timestamp'], last['source'], last['id'], last['balance'] - last['delta'])
+    return jsonify({'product_id': id, 'location_id': location_id, 'transactions': rows, 'next_cursor': next_cursor})
+
+@product_bp.route('/stream', methods=['GET'])
+def stream_stock_changes():
+    # Server-Sent Events: {product_id, new_stock} for every stock change. EventSource
+    # can't send headers, so the token may also be passed as ?token=.
+    token = None
+    if 'Authorization' in request.headers:
+        token = request.headers['Authorization'].split(" ")[1]
+    token = token or request.args.get('token')
+    if not token or not resolve_token(token):
+        return jsonify({'message': 'Token is invalid!'}), 401
+
+    q = hub.subscribe()
+    if q is None:
+        return jsonify({'message': 'Too many live subscribers, fall back to polling'}), 503
+    # Don't hold a DB transaction open for the lifetime of the stream
+    db.session.close()
+    return Response(
+        stream_with_context(sse_stream(q)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
@@ -0,0 +1,11 @@
+from app import create_app
+from config import BatchConfig
+from inventory_stats import reconcile, get_stats
+
+app = create_app(BatchConfig)
+
+# Recomputes the dashboard counters from scratch (run from cron or after manual DB edits)
+with app.app_context():
+    reconcile()
+    stats = get_stats()
+    print(f"Products: {stats['total_products']} | Low stock: {stats['low_stock_count']} | Transactions: {stats['recent_tx_count']}")
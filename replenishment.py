@@ -0,0 +1,345 @@
+import datetime
+from sqlalchemy import select, update, insert, delete, bindparam, func, false
+from config import Config
+from models import db, Product, ReplenishmentLine
+from db_engine import upsert_insert
+
+# Replenishment planner: every product below its reorder point gets an EOQ-sized
+# order line, grouped by Product.supplier into draft purchase orders. The plan is
+# stored in ReplenishmentLine. run_replenishment() rebuilds it from the demand
+# forecast (nightly). Writes that touch a SKU call mark_stale(), and the next
+# read re-plans just those lines from current stock and price with the stored
+# forecast. numpy is imported on use: mark_stale() sits on the checkout path.
+
+_lines = ReplenishmentLine.__table__
+DAYS_PER_YEAR = 365
+# Product columns a line is planned from; writing any of them marks the line stale
+REPLENISHMENT_FIELDS = ('supplier', 'price', 'stock_quantity', 'min_stock_threshold')
+# Postgres advisory lock key held while refresh_stale() runs
+REFRESH_LOCK_KEY = 0x5245504C
+
+
+def compute_order_quantities(forecast, reorder_point, stock, price, min_threshold,
+                             order_cost, holding_rate, min_order_qty):
+    """
+    Vectorized order lines for any number of products. A product is due when
+    stock is at or below max(reorder point, min_stock_threshold), the same
+    "<=" rule as the low-stock alerts. It orders the larger of the EOQ
+    sqrt(2 x annual demand x order cost / (price x holding rate)), the
+    shortfall that lifts stock above that trigger, and min_order_qty, rounded
+    up to whole units. Products without demand or threshold never order.
+    Returns (eoq, quantity) arrays.
+    """
+    import numpy as np
+    from forecasting import reorder_trigger
+    holding = price * holding_rate
+    with np.errstate(divide='ignore', invalid='ignore'):
+        eoq = np.where(holding > 0, np.sqrt(2.0 * forecast * DAYS_PER_YEAR * order_cost / holding), 0.0)
+    trigger, due = reorder_trigger(stock, reorder_point, forecast, min_threshold)
+    shortfall = np.floor(trigger - stock) + 1
+    quantity = np.ceil(np.maximum(np.maximum(eoq, shortfall), min_order_qty))
+    return eoq, np.where(due, quantity, 0).astype(np.int64)
+
+
+def apply_min_order_value(supplier_codes, quantity, price, min_order_value):
+    """
+    Scales every line of a supplier's draft PO up by the same factor until the
+    PO reaches min_order_value, one bincount for all suppliers. supplier_codes
+    is a dense code per line, -1 for products without a supplier (never scaled).
+    """
+    import numpy as np
+    quantity = np.asarray(quantity, dtype=np.int64)
+    assigned = supplier_codes >= 0
+    if min_order_value <= 0 or not assigned.any():
+        return quantity.copy()
+    value = np.bincount(supplier_codes[assigned], weights=(quantity * price)[assigned])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        factor = np.where((value > 0) & (value < min_order_value), min_order_value / value, 1.0)
+    scale = np.ones(len(quantity))
+    scale[assigned] = factor[supplier_codes[assigned]]
+    # Rounded first so 10 x 1.0000000001 doesn't become 11 units
+    return np.ceil(np.round(quantity * scale, 6)).astype(np.int64)
+
+
+def supplier_codes(suppliers):
+    # Dense codes for supplier names, -1 for none / blank
+    import numpy as np
+    names = np.array([(s or '').strip() for s in suppliers], dtype=str)
+    unique, codes = np.unique(names, return_inverse=True)
+    codes = codes.ravel().astype(np.int64)
+    if len(unique) and unique[0] == '':
+        codes -= 1
+    return codes
+
+
+def _settings():
+    return (Config.REPLENISH_ORDER_COST, Config.REPLENISH_HOLDING_RATE, Config.REPLENISH_MIN_ORDER_QTY)
+
+
+def run_replenishment(history_days=None, lead_time_days=None, service_level=None, today=None, batch_size=10000):
+    """
+    Re-plans the whole catalog: forecast and reorder points for every product
+    (forecasting.build_reorder_plan, central stock), then order quantities and
+    supplier minimums in one vectorized pass. Lines are rewritten in place,
+    guarded by their change counter: a SKU written to while the run was
+    computing keeps its stale mark and is re-planned on the next read. Commits.
+    """
+    import numpy as np
+    from forecasting import build_reorder_plan
+    seen = dict(db.session.execute(select(_lines.c.product_id, _lines.c.changes)).all())
+    db.session.commit()
+
+    plan = build_reorder_plan(
+        history_days=history_days or Config.FORECAST_HISTORY_DAYS,
+        lead_time_days=Config.FORECAST_LEAD_TIME_DAYS if lead_time_days is None else lead_time_days,
+        service_level=service_level or Config.FORECAST_SERVICE_LEVEL,
+        alpha=Config.FORECAST_ALPHA, sma_window=Config.FORECAST_SMA_WINDOW, today=today
+    )
+    eoq, base = compute_order_quantities(
+        plan['forecast'], plan['reorder_point'], plan['stock'], plan['price'], plan['min_threshold'], *_settings()
+    )
+    quantity = apply_min_order_value(supplier_codes(plan['supplier']), base, plan['price'],
+                                     Config.REPLENISH_MIN_ORDER_VALUE)
+
+    computed_at = datetime.datetime.utcnow()
+    ids = plan['id'].tolist()
+    columns = {
+        'supplier': [(s or '').strip() or None for s in plan['supplier']],
+        'forecast': plan['forecast'].tolist(),
+        'reorder_point': plan['reorder_point'].tolist(),
+        'stock': plan['stock'].astype(np.int64).tolist(),
+        'min_stock_threshold': plan['min_threshold'].astype(np.int64).tolist(),
+        'unit_price': plan['price'].tolist(),
+        'eoq': eoq.tolist(),
+        'base_quantity': base.tolist(),
+        'order_quantity': quantity.tolist(),
+    }
+    existing = [i for i, pid in enumerate(ids) if pid in seen]
+    new = [i for i, pid in enumerate(ids) if pid not in seen]
+
+    # Lines of deleted products go; the rest are updated or inserted
+    db.session.execute(delete(_lines).where(_lines.c.product_id.not_in(select(Product.id))))
+    stmt = update(_lines).where(_lines.c.product_id == bindparam('b_product_id')).values(
+        {name: bindparam(f'b_{name}') for name in columns},
+    ).values(computed_at=computed_at, stale=_lines.c.changes != bindparam('b_changes'))
+    for start in range(0, len(existing), batch_size):
+        db.session.execute(stmt, [
+            dict({f'b_{name}': values[i] for name, values in columns.items()},
+                 b_product_id=ids[i], b_changes=seen[ids[i]])
+            for i in existing[start:start + batch_size]
+        ])
+    # Products created during the run may already have a stale line from mark_stale(); keep it
+    dialect_insert = upsert_insert(db.session.get_bind().dialect.name)
+    stmt = insert(_lines) if dialect_insert is None else dialect_insert(_lines).on_conflict_do_nothing(
+        index_elements=['product_id']
+    )
+    for start in range(0, len(new), batch_size):
+        db.session.execute(stmt, [
+            dict({name: values[i] for name, values in columns.items()},
+                 product_id=ids[i], computed_at=computed_at, stale=False, changes=0)
+            for i in new[start:start + batch_size]
+        ])
+    db.session.commit()
+    return dict(plan_summary(), products=len(ids))
+
+
+def mark_stale(product_ids):
+    """
+    Invalidates the plan lines of products whose stock, price, threshold or
+    supplier just changed. One indexed UPDATE in the caller's transaction, so
+    the mark commits or rolls back with the write itself. Products without a
+    line yet (created since the last full run) get a stale one, so the next
+    read plans them too.
+    """
+    product_ids = sorted(set(product_ids))
+    if not product_ids:
+        return
+    marked = db.session.execute(
+        update(_lines).where(_lines.c.product_id.in_(product_ids))
+        .values(stale=True, changes=_lines.c.changes + 1)
+    ).rowcount
+    if marked < len(product_ids):
+        planned = set(db.session.execute(
+            select(_lines.c.product_id).where(_lines.c.product_id.in_(product_ids))
+        ).scalars())
+        _add_lines([pid for pid in product_ids if pid not in planned])
+
+
+def _add_lines(product_ids):
+    # No forecast yet (zero demand): the threshold alone decides until the next full run
+    if not product_ids:
+        return
+    rows = [{'product_id': pid, 'stale': True, 'changes': 1} for pid in product_ids]
+    dialect_insert = upsert_insert(db.session.get_bind().dialect.name)
+    if dialect_insert is None:
+        db.session.execute(insert(_lines), rows)
+    else:
+        # A concurrent write may have added the same line; its stale mark is just as good
+        db.session.execute(dialect_insert(_lines).on_conflict_do_nothing(index_elements=['product_id']), rows)
+
+
+def refresh_stale():
+    """
+    Re-plans the lines marked stale from current product data and their stored
+    forecast, then re-applies the minimum order value to just the suppliers
+    those lines belong to (before and after a supplier change). Cheap when
+    nothing is stale: one lookup on the stale index. Refreshes are serialized,
+    so concurrent readers don't race on the same UPDATEs: the next one waits
+    for this commit and then finds nothing left to do. Commits. Returns the
+    lines refreshed.
+    """
+    stale = select(_lines.c.product_id).join(Product, Product.id == _lines.c.product_id).where(_lines.c.stale.is_(True))
+    if db.session.execute(stale.limit(1)).first() is None:
+        return 0
+    # The lock must open a fresh transaction: SQLite can't upgrade an older read to a write
+    db.session.commit()
+    _lock_refresh()
+
+    rows = db.session.execute(
+        select(
+            _lines.c.product_id, _lines.c.changes, _lines.c.supplier, _lines.c.forecast, _lines.c.reorder_point,
+            Product.supplier, Product.stock_quantity, Product.price, Product.min_stock_threshold
+        ).join(Product, Product.id == _lines.c.product_id).where(_lines.c.stale.is_(True))
+    ).all()
+    if not rows:
+        db.session.commit()
+        return 0
+
+    import numpy as np
+    ids, changes, old_suppliers, forecast, reorder_point, suppliers, stock, price, threshold = zip(*rows)
+    suppliers = [(s or '').strip() or None for s in suppliers]
+    stock = np.array([s or 0 for s in stock], dtype=np.int64)
+    price = np.array([p or 0.0 for p in price], dtype=np.float64)
+    threshold = np.array([t or 0 for t in threshold], dtype=np.int64)
+    eoq, base = compute_order_quantities(
+        np.array(forecast), np.array(reorder_point), stock, price, threshold, *_settings()
+    )
+    db.session.execute(
+        update(_lines).where(_lines.c.product_id == bindparam('b_product_id')).values(
+            supplier=bindparam('b_supplier'), stock=bindparam('b_stock'),
+            min_stock_threshold=bindparam('b_threshold'), unit_price=bindparam('b_price'),
+            eoq=bindparam('b_eoq'), base_quantity=bindparam('b_base'), order_quantity=bindparam('b_base'),
+            stale=_lines.c.changes != bindparam('b_changes')
+        ),
+        [
+            {'b_product_id': pid, 'b_supplier': supplier, 'b_stock': s, 'b_threshold': t, 'b_price': p,
+             'b_eoq': e, 'b_base': b, 'b_changes': c}
+            for pid, supplier, s, t, p, e, b, c in zip(
+                ids, suppliers, stock.tolist(), threshold.tolist(), price.tolist(), eoq.tolist(), base.tolist(), changes
+            )
+        ]
+    )
+    _rebalance({s for s in old_suppliers + tuple(suppliers) if s})
+    db.session.commit()
+    return len(rows)
+
+
+def _lock_refresh():
+    # Held until the caller commits
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        db.session.execute(select(func.pg_advisory_xact_lock(REFRESH_LOCK_KEY)))
+    elif dialect == 'sqlite':
+        # Any write statement takes the database's single write lock, even one that matches no rows
+        db.session.execute(update(_lines).where(false()).values(stale=_lines.c.stale))
+
+
+def _rebalance(suppliers):
+    # Minimum order value for a few suppliers' POs, read through the (supplier, product_id) index
+    if not suppliers or Config.REPLENISH_MIN_ORDER_VALUE <= 0:
+        return
+    import numpy as np
+    rows = db.session.execute(
+        select(_lines.c.product_id, _lines.c.supplier, _lines.c.base_quantity, _lines.c.unit_price,
+               _lines.c.order_quantity)
+        .where(_lines.c.supplier.in_(sorted(suppliers)), _lines.c.base_quantity > 0)
+    ).all()
+    if not rows:
+        return
+    ids, names, base, price, current = zip(*rows)
+    quantity = apply_min_order_value(supplier_codes(names), np.array(base), np.array(price),
+                                     Config.REPLENISH_MIN_ORDER_VALUE)
+    changed = [(pid, q) for pid, q, old in zip(ids, quantity.tolist(), current) if q != old]
+    if changed:
+        db.session.execute(
+            update(_lines).where(_lines.c.product_id == bindparam('b_product_id'))
+            .values(order_quantity=bindparam('b_quantity')),
+            [{'b_product_id': pid, 'b_quantity': q} for pid, q in changed]
+        )
+
+
+def plan_summary():
+    # Totals of the stored plan: lines to order, units, value and supplier count
+    row = db.session.execute(
+        select(
+            func.count(), func.coalesce(func.sum(_lines.c.order_quantity), 0),
+            func.coalesce(func.sum(_lines.c.order_quantity * _lines.c.unit_price), 0.0),
+            func.count(func.distinct(_lines.c.supplier))
+        ).where(_lines.c.order_quantity > 0)
+    ).one()
+    computed_at = db.session.query(func.max(_lines.c.computed_at)).scalar()
+    return {
+        'computed_at': computed_at.isoformat() if computed_at else None,
+        'lines': row[0],
+        'units': int(row[1]),
+        'value': round(float(row[2]), 2),
+        'suppliers': row[3]
+    }
+
+
+def draft_purchase_orders(limit=50, after_supplier=None, supplier=None):
+    """
+    The stored plan as one draft purchase order per supplier, alphabetical and
+    paged by supplier name; lines without a supplier are returned separately.
+    Call refresh_stale() first. Returns (orders, up to limit + 1, unassigned lines).
+    """
+    stmt = select(
+        _lines.c.product_id, _lines.c.supplier, Product.sku, Product.name, _lines.c.stock,
+        _lines.c.min_stock_threshold, _lines.c.forecast, _lines.c.reorder_point, _lines.c.eoq,
+        _lines.c.base_quantity, _lines.c.order_quantity, _lines.c.unit_price
+    ).join(Product, Product.id == _lines.c.product_id).where(_lines.c.order_quantity > 0)
+
+    names = select(_lines.c.supplier).where(_lines.c.order_quantity > 0, _lines.c.supplier.is_not(None))
+    if supplier:
+        names = names.where(_lines.c.supplier == supplier)
+    if after_supplier is not None:
+        names = names.where(_lines.c.supplier > after_supplier)
+    names = db.session.execute(names.distinct().order_by(_lines.c.supplier).limit(limit + 1)).scalars().all()
+
+    orders = {name: [] for name in names}
+    if names:
+        for row in db.session.execute(stmt.where(_lines.c.supplier.in_(names)).order_by(_lines.c.product_id)):
+            orders[row.supplier].append(_line(row))
+    unassigned = []
+    if not supplier and after_supplier is None:
+        unassigned = [_line(row) for row in db.session.execute(
+            stmt.where(_lines.c.supplier.is_(None)).order_by(_lines.c.product_id)
+        )]
+    return [_order(name, lines) for name, lines in orders.items()], unassigned
+
+
+def _line(row):
+    return {
+        'product_id': row.product_id,
+        'sku': row.sku,
+        'name': row.name,
+        'stock_quantity': row.stock,
+        'min_stock_threshold': row.min_stock_threshold,
+        'forecast_daily_demand': round(row.forecast, 3),
+        'reorder_point': round(row.reorder_point, 2),
+        'eoq': round(row.eoq, 1),
+        'order_quantity': row.order_quantity,
+        'topped_up': row.order_quantity - row.base_quantity,
+        'unit_price': row.unit_price,
+        'line_value': round(row.order_quantity * row.unit_price, 2)
+    }
+
+
+def _order(supplier, lines):
+    return {
+        'supplier': supplier,
+        'status': 'draft',
+        'lines': lines,
+        'units': sum(line['order_quantity'] for line in lines),
+        'value': round(sum(line['line_value'] for line in lines), 2)
+    }
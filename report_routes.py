@@ -3,23 +3,25 @@ from routes.auth_routes import token_required
 
 report_bp = Blueprint('reports', __name__)
 
+# Analytics, exports and history pull in numpy and friends: they are imported by
+# the views that use them, so workers boot without them (see DEFERRED_MODULES in app.py)
+
 from models import db, Product, Transaction
-from flask import send_file
-import csv
-import io
+from flask import request, current_app, Response, stream_with_context
+from inventory_stats import get_stats
+from response_cache import cached_json
+from pagination import parse_limit, parse_datetime, encode_cursor, decode_cursor
+import audit_log
+import datetime
+from rollups import PERIODS, METRICS, CENTRAL, bucket_start, top_movers, category_totals, movement_series
+from models import ProductClassification
+from sqlalchemy import tuple_
 
 @report_bp.route('/stats', methods=['GET'])
 @token_required
 def get_dashboard_stats(current_user):
-    total_products = Product.query.count()
-    low_stock_count = Product.query.filter(Product.stock_quantity <= Product.min_stock_threshold).count()
-    recent_transactions = Transaction.query.count() # Just a count for the card, or detailed list handled elsewhere
-    
-    return jsonify({
-        'total_products': total_products,
-        'low_stock_count': low_stock_count,
-        'recent_tx_count': recent_transactions
-    })
+    # Served from the incrementally maintained summary row, not COUNT scans
+    return cached_json(get_stats)
 
 @report_bp.route('/export/csv', methods=['GET'])
 @token_required
@@ -27,22 +29,310 @@ def export_csv(current_user):
     # Only Admin? Or everyone? Let's say Admin
     if current_user.role != 'admin':
         return jsonify({'message': 'Unauthorized'}), 403
+    return _stream_export('products', 'csv', request.args.get('gzip') == '1')
+
+@report_bp.route('/export/<dataset>', methods=['GET'])
+@token_required
+def export_dataset(current_user, dataset):
+    from exporter import DATASETS, FORMATS, parquet_available
+    if current_user.role != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
+    if dataset not in DATASETS:
+        return jsonify({'message': f"Unknown dataset, expected one of: {', '.join(DATASETS)}"}), 404
 
-    products = Product.query.all()
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    writer.writerow(['ID', 'SKU', 'Name', 'Category', 'Supplier', 'Price', 'Stock', 'Min Threshold'])
-    
-    for p in products:
-        writer.writerow([p.id, p.sku, p.name, p.category, p.supplier, p.price, p.stock_quantity, p.min_stock_threshold])
-        
-    output.seek(0)
-    
-    return send_file(
-        io.BytesIO(output.getvalue().encode('utf-8')),
-        mimetype='text/csv',
-        as_attachment=True,
-        download_name='inventory_report.csv'
+    fmt = request.args.get('format', 'csv')
+    if fmt not in FORMATS:
+        return jsonify({'message': f"Unknown format, expected one of: {', '.join(FORMATS)}"}), 400
+    if fmt == 'parquet' and not parquet_available():
+        return jsonify({'message': 'Parquet export requires pyarrow to be installed'}), 501
+    if dataset == 'login-logs':
+        # Include logins still sitting in this worker's write-behind buffer
+        audit_log.flush()
+    return _stream_export(dataset, fmt, request.args.get('gzip') == '1')
+
+def _stream_export(dataset, fmt, compress):
+    # Rows are pulled in server-side batches and written straight into a chunked response
+    from exporter import FORMATS, export_chunks
+    mimetype, extension = FORMATS[fmt]
+    filename = f"{'inventory_report' if dataset == 'products' else dataset.replace('-', '_')}.{extension}"
+    if compress:
+        mimetype, filename = 'application/gzip', filename + '.gz'
+
+    chunks = export_chunks(dataset, fmt, current_app.config['EXPORT_BATCH_SIZE'], compress)
+    return Response(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
     )
 
+@report_bp.route('/reorder', methods=['GET'])
+@token_required
+def get_reorder_points(current_user):
+    # Forecast demand and reorder points for the whole catalog in one vectorized pass
+    import numpy as np
+    from forecasting import build_reorder_plan
+    cfg = current_app.config
+    try:
+        params = {
+            'history_days': int(request.args.get('history_days', cfg['FORECAST_HISTORY_DAYS'])),
+            'lead_time_days': float(request.args.get('lead_time_days', cfg['FORECAST_LEAD_TIME_DAYS'])),
+            'service_level': float(request.args.get('service_level', cfg['FORECAST_SERVICE_LEVEL'])),
+            'alpha': float(request.args.get('alpha', cfg['FORECAST_ALPHA'])),
+            'sma_window': int(request.args.get('sma_window', cfg['FORECAST_SMA_WINDOW'])),
+            'method': request.args.get('method', 'ses')
+        }
+        limit = parse_limit(request.args, default=100, maximum=10000)
+        if params['history_days'] < 1 or params['sma_window'] < 1 or params['lead_time_days'] < 0:
+            raise ValueError('history_days and sma_window must be positive')
+        if not 0 < params['service_level'] < 1 or not 0 < params['alpha'] <= 1:
+            raise ValueError('service_level must be in (0, 1) and alpha in (0, 1]')
+        if params['method'] not in ('ses', 'sma'):
+            raise ValueError('method must be ses or sma')
+    except ValueError as e:
+        return jsonify({'message': f'Invalid query parameters: {e}'}), 400
+
+    plan = build_reorder_plan(**params)
+
+    # Most urgent first: furthest below the reorder trigger (reorder point floored by min threshold)
+    gap = plan['stock'] - plan['reorder_trigger']
+    order = np.argsort(gap, kind='stable')
+    if request.args.get('below_only', '1') == '1':
+        order = order[plan['needs_reorder'][order]]
+    total = len(order)
+    order = order[:limit]
+
+    items = []
+    for i in order.tolist():
+        items.append({
+            'product_id': int(plan['id'][i]),
+            'sku': plan['sku'][i],
+            'name': plan['name'][i],
+            'stock_quantity': int(plan['stock'][i]),
+            'min_stock_threshold': int(plan['min_threshold'][i]),
+            'forecast_daily_demand': round(float(plan['forecast'][i]), 3),
+            'safety_stock': round(float(plan['safety_stock'][i]), 2),
+            'reorder_point': round(float(plan['reorder_point'][i]), 2),
+            'reorder_trigger': round(float(plan['reorder_trigger'][i]), 2),
+            'days_of_cover': None if np.isinf(plan['days_of_cover'][i]) else round(float(plan['days_of_cover'][i]), 1),
+            'needs_reorder': bool(plan['needs_reorder'][i])
+        })
+    return jsonify({'parameters': params, 'total': total, 'items': items})
+
+# Movement analytics, served from the hour/day rollups (see rollups.py) instead of the ledger
+def _rollup_range(default_days):
+    # start/end are ISO dates or timestamps (UTC); start is rounded down to the period
+    period = request.args.get('period', 'day')
+    if period not in PERIODS:
+        raise ValueError('period must be hour or day')
+    if request.args.get('end'):
+        end = parse_datetime(request.args['end'])
+    else:
+        # The end of the current period, not now: the body only changes when a bucket does,
+        # and the callers add `end` to the cache key for when the period rolls over
+        end = bucket_start(datetime.datetime.utcnow(), period) + datetime.timedelta(hours=1 if period == 'hour' else 24)
+    start = parse_datetime(request.args['start']) if request.args.get('start') else end - datetime.timedelta(days=default_days)
+    if start >= end:
+        raise ValueError('start must be before end')
+    # None = whole chain, 'central' = central stock only, otherwise one location
+    location_id = request.args.get('location_id') or None
+    if location_id not in (None, 'central'):
+        location_id = int(location_id)
+        if location_id < 1:
+            raise ValueError('location_id must be a location id or central')
+    return start, end, period, location_id
+
+@report_bp.route('/top-movers', methods=['GET'])
+@token_required
+def get_top_movers(current_user):
+    try:
+        start, end, period, location_id = _rollup_range(7)
+        metric = request.args.get('by', 'quantity_out')
+        if metric not in METRICS:
+            raise ValueError(f"by must be one of {', '.join(METRICS)}")
+        limit = parse_limit(request.args, default=10, maximum=1000)
+    except (ValueError, TypeError) as e:
+        return jsonify({'message': f'Invalid query parameters: {e}'}), 400
+    return cached_json(lambda: {
+        'start': start.isoformat(), 'end': end.isoformat(), 'period': period, 'by': metric,
+        'location_id': location_id, 'items': top_movers(start, end, period, metric, limit, location_id)
+    }, vary=end.isoformat())
+
+@report_bp.route('/category-revenue', methods=['GET'])
+@token_required
+def get_category_revenue(current_user):
+    try:
+        start, end, period, location_id = _rollup_range(90)
+    except (ValueError, TypeError) as e:
+        return jsonify({'message': f'Invalid query parameters: {e}'}), 400
+    return cached_json(lambda: {
+        'start': start.isoformat(), 'end': end.isoformat(), 'period': period,
+        'location_id': location_id, 'categories': category_totals(start, end, period, location_id)
+    }, vary=end.isoformat())
+
+@report_bp.route('/movements', methods=['GET'])
+@token_required
+def get_movement_series(current_user):
+    try:
+        start, end, period, location_id = _rollup_range(30)
+        product_id = int(request.args['product_id']) if request.args.get('product_id') else None
+    except (ValueError, TypeError) as e:
+        return jsonify({'message': f'Invalid query parameters: {e}'}), 400
+    return cached_json(lambda: {
+        'start': start.isoformat(), 'end': end.isoformat(), 'period': period, 'product_id': product_id,
+        'location_id': location_id, 'series': movement_series(start, end, period, product_id, location_id)
+    }, vary=end.isoformat())
+
+# ABC/XYZ classification: computed by classify_inventory.py (cron) or POST, read from the stored run
+@report_bp.route('/classification', methods=['GET'])
+@token_required
+def get_classification(current_user):
+    from classification import class_matrix
+    try:
+        limit = parse_limit(request.args, default=100, maximum=1000)
+        query = db.session.query(ProductClassification, Product.sku, Product.name).join(
+            Product, Product.id == ProductClassification.product_id
+        )
+        for column, arg in ((ProductClassification.abc_class, 'abc'), (ProductClassification.xyz_class, 'xyz')):
+            if request.args.get(arg):
+                query = query.filter(column.in_(request.args[arg].upper().split(',')))
+        # Highest value first, i.e. ascending cumulative share
+        key = (ProductClassification.cumulative_share, ProductClassification.product_id)
+        if request.args.get('cursor'):
+            share, product_id = decode_cursor(request.args['cursor'])
+            query = query.filter(tuple_(*key) > tuple_(float(share), int(product_id)))
+    except (ValueError, TypeError) as e:
+        return jsonify({'message': f'Invalid query parameters: {e}'}), 400
+
+    rows = query.order_by(*key).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    items = []
+    for c, sku, name in rows:
+        items.append({
+            'product_id': c.product_id,
+            'sku': sku,
+            'name': name,
+            'abc_class': c.abc_class,
+            'xyz_class': c.xyz_class,
+            'demand_value': round(c.demand_value, 2),
+            'value_share': round(c.value_share, 6),
+            'cumulative_share': round(c.cumulative_share, 6),
+            'mean_demand': round(c.mean_demand, 3),
+            'demand_cv': None if c.demand_cv is None else round(c.demand_cv, 3)
+        })
+    computed_at = db.session.query(db.func.max(ProductClassification.computed_at)).scalar()
+    next_cursor = encode_cursor(rows[-1][0].cumulative_share, rows[-1][0].product_id) if has_more else None
+    return jsonify({
+        'computed_at': computed_at.isoformat() if computed_at else None,
+        'matrix': class_matrix(),
+        'items': items,
+        'next_cursor': next_cursor
+    })
+
+@report_bp.route('/classification', methods=['POST'])
+@token_required
+def rerun_classification(current_user):
+    from classification import run_classification
+    if current_user.role != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
+    try:
+        history_days = int(request.args.get('history_days', current_app.config['CLASSIFY_HISTORY_DAYS']))
+        bucket_days = int(request.args.get('bucket_days', current_app.config['CLASSIFY_BUCKET_DAYS']))
+        if history_days < 1 or not 1 <= bucket_days <= history_days:
+            raise ValueError('history_days must be positive and bucket_days within it')
+    except ValueError as e:
+        return jsonify({'message': f'Invalid query parameters: {e}'}), 400
+    return jsonify(run_classification(history_days, bucket_days))
+
+# Point-in-time stock: nearest daily snapshot plus the ledger tail (see stock_history.py)
+@report_bp.route('/stock-at', methods=['GET'])
+@token_required
+def get_stock_at(current_user):
+    from stock_history import stock_at
+    try:
+        ts = parse_datetime(request.args['ts'])
+        location = request.args.get('location_id')
+        location_id = CENTRAL if location in (None, '', 'central') else int(location)
+        limit = parse_limit(request.args)
+        after_id = int(decode_cursor(request.args['cursor'])[0]) if request.args.get('cursor') else None
+        product_ids = [int(p) for p in request.args['product_id'].split(',')] if request.args.get('product_id') else None
+    except (KeyError, ValueError, TypeError):
+        return jsonify({'message': 'Invalid query parameters: ts (ISO timestamp) is required'}), 400
+
+    def build():
+        day, items = stock_at(ts, location_id, limit, after_id, product_ids)
+        has_more = len(items) > limit
+        items = items[:limit]
+        return {
+            'ts': ts.isoformat(),
+            'location_id': None if location_id == CENTRAL else location_id,
+            'snapshot_day': day.isoformat() if day else None,
+            'items': items,
+            'next_cursor': encode_cursor(items[-1]['product_id']) if has_more else None
+        }
+    return cached_json(build)
+
+@report_bp.route('/stock-consistency', methods=['GET'])
+@token_required
+def get_stock_consistency(current_user):
+    # Live stock vs latest snapshot + ledger, biggest differences first
+    from stock_history import check_consistency
+    if current_user.role != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
+    try:
+        limit = parse_limit(request.args)
+    except (ValueError, TypeError):
+        return jsonify({'message': 'Invalid query parameters'}), 400
+    return jsonify(check_consistency(limit))
+
+@report_bp.route('/snapshots', methods=['POST'])
+@token_required
+def create_snapshot(current_user):
+    # Normally run daily by snapshot_stock.py; ?day= backfills a past day
+    from stock_history import take_snapshot
+    if current_user.role != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
+    try:
+        day = parse_datetime(request.args['day']).date() if request.args.get('day') else None
+    except (ValueError, TypeError):
+        return jsonify({'message': 'Invalid day'}), 400
+    return jsonify(take_snapshot(day)), 201
+
+# Replenishment: draft purchase orders per supplier from the stored plan (see replenishment.py).
+# Rebuilt nightly by plan_replenishment.py or POST; lines invalidated by writes are re-planned here.
+@report_bp.route('/replenishment', methods=['GET'])
+@token_required
+def get_replenishment(current_user):
+    from replenishment import refresh_stale, draft_purchase_orders, plan_summary
+    try:
+        limit = parse_limit(request.args, default=50, maximum=500)
+        after_supplier = decode_cursor(request.args['cursor'])[0] if request.args.get('cursor') else None
+    except (ValueError, TypeError):
+        return jsonify({'message': 'Invalid query parameters'}), 400
+
+    refreshed = refresh_stale()
+    orders, unassigned = draft_purchase_orders(limit, after_supplier, request.args.get('supplier'))
+    has_more = len(orders) > limit
+    orders = orders[:limit]
+    return jsonify({
+        'summary': plan_summary(),
+        'refreshed': refreshed,
+        'purchase_orders': orders,
+        'unassigned': unassigned,
+        'next_cursor': encode_cursor(orders[-1]['supplier']) if has_more else None
+    })
+
+@report_bp.route('/replenishment', methods=['POST'])
+@token_required
+def rerun_replenishment(current_user):
+    from replenishment import run_replenishment
+    if current_user.role != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
+    try:
+        history_days = int(request.args.get('history_days', current_app.config['FORECAST_HISTORY_DAYS']))
+        lead_time_days = float(request.args.get('lead_time_days', current_app.config['FORECAST_LEAD_TIME_DAYS']))
+        if history_days < 1 or lead_time_days < 0:
+            raise ValueError('history_days must be positive and lead_time_days not negative')
+    except ValueError as e:
+        return jsonify({'message': f'Invalid query parameters: {e}'}), 400
+    return jsonify(run_replenishment(history_days, lead_time_days))
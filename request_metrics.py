@@ -0,0 +1,204 @@
+import collections
+import datetime
+import os
+import sys
+import threading
+import time
+from flask import g, request, has_request_context
+from sqlalchemy import event
+
+# Latency histogram bucket upper bounds in ms (the last bucket is open-ended)
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class EndpointStats:
+    """
+    Per-endpoint request counters: a cumulative latency histogram plus the
+    last `window` samples for percentiles, so memory stays bounded.
+    """
+
+    def __init__(self, window):
+        self.count = 0
+        self.errors = 0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.queries = 0
+        self.max_queries = 0
+        self.recent = collections.deque(maxlen=window)
+
+    def add(self, total_ms, sql_ms, queries, status):
+        self.count += 1
+        self.errors += status >= 500
+        self.queries += queries
+        self.max_queries = max(self.max_queries, queries)
+        i = 0
+        while i < len(BUCKETS_MS) and total_ms > BUCKETS_MS[i]:
+            i += 1
+        self.buckets[i] += 1
+        self.recent.append((total_ms, sql_ms, queries))
+
+    def snapshot(self):
+        recent = sorted(self.recent)
+        pct = lambda p: round(recent[min(len(recent) - 1, int(round(p / 100.0 * (len(recent) - 1))))][0], 2) if recent else None
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'p50_ms': pct(50),
+            'p95_ms': pct(95),
+            'p99_ms': pct(99),
+            'max_ms': round(recent[-1][0], 2) if recent else None,
+            'avg_sql_ms': round(sum(r[1] for r in recent) / len(recent), 2) if recent else None,
+            'avg_queries': round(self.queries / self.count, 2) if self.count else None,
+            'max_queries': self.max_queries,
+            'histogram_ms': {
+                (f'<={bound}' if i < len(BUCKETS_MS) else f'>{BUCKETS_MS[-1]}'): n
+                for i, (bound, n) in enumerate(zip(BUCKETS_MS + (None,), self.buckets))
+            }
+        }
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of threads currently serving requests every `interval`
+    seconds from one background thread. Only stacks of requests slower than the
+    threshold are written out, in collapsed ("folded") format for flamegraph tools.
+    """
+
+    def __init__(self, interval, output_dir):
+        self.interval = interval
+        self.output_dir = output_dir
+        self._active = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        counter = collections.Counter()
+        with self._lock:
+            self._active[threading.get_ident()] = counter
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+                self._thread.start()
+        return counter
+
+    def stop(self):
+        with self._lock:
+            return self._active.pop(threading.get_ident(), None)
+
+    def dump(self, counter, endpoint, total_ms):
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = datetime.datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
+        path = os.path.join(self.output_dir, f'{stamp}_{endpoint}_{int(total_ms)}ms.folded')
+        with open(path, 'w') as f:
+            for stack, samples in counter.most_common():
+                f.write(f'{stack} {samples}\n')
+        return path
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                active = list(self._active.items())
+            if not active:
+                continue
+            frames = sys._current_frames()
+            for ident, counter in active:
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}')
+                    frame = frame.f_back
+                if stack:
+                    counter[';'.join(reversed(stack))] += 1
+
+
+class RequestMetrics:
+    """
+    Opt-in request instrumentation (METRICS_ENABLED): SQL statements and their
+    time are counted per request through engine events, each response gets a
+    Server-Timing header, and per-endpoint stats are kept for /api/admin/metrics.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.profiler = None
+        self._endpoints = {}
+        self._window = 1000
+        self._slow_ms = 0
+        self._lock = threading.Lock()
+        self._started_at = time.time()
+
+    def init_app(self, app, engine):
+        self.enabled = True
+        self._window = app.config['METRICS_WINDOW']
+        self._slow_ms = app.config['METRICS_PROFILE_SLOW_MS']
+        if self._slow_ms:
+            self.profiler = SamplingProfiler(app.config['METRICS_PROFILE_INTERVAL'], app.config['METRICS_PROFILE_DIR'])
+        event.listen(engine, 'before_cursor_execute', self._before_cursor)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+    def snapshot(self):
+        with self._lock:
+            endpoints = {name: stats.snapshot() for name, stats in self._endpoints.items()}
+        return {
+            'enabled': self.enabled,
+            'since': datetime.datetime.utcfromtimestamp(self._started_at).isoformat(),
+            'endpoints': dict(sorted(endpoints.items(), key=lambda item: -item[1]['count']))
+        }
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+            self._started_at = time.time()
+
+    # Engine events fire on whatever thread runs the statement; only request threads are counted
+    def _before_cursor(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and 'metrics_started' in g:
+            g.metrics_sql_started = time.perf_counter()
+
+    def _after_cursor(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and 'metrics_sql_started' in g:
+            g.metrics_queries += 1
+            g.metrics_sql_seconds += time.perf_counter() - g.pop('metrics_sql_started')
+
+    def _before_request(self):
+        g.metrics_queries = 0
+        g.metrics_sql_seconds = 0.0
+        g.metrics_profile = self.profiler.start() if self.profiler else None
+        g.metrics_started = time.perf_counter()
+
+    def _after_request(self, response):
+        if 'metrics_started' not in g:
+            return response
+        total_ms = 1000 * (time.perf_counter() - g.metrics_started)
+        sql_ms = 1000 * g.metrics_sql_seconds
+        queries = g.metrics_queries
+        endpoint = request.endpoint or 'unmatched'
+
+        # Streamed bodies (exports, SSE) are only timed until the handler returns
+        response.headers.add('Server-Timing', f'db;dur={sql_ms:.2f};desc="{queries} queries"')
+        response.headers.add('Server-Timing', f'app;dur={total_ms - sql_ms:.2f}')
+        response.headers.add('Server-Timing', f'total;dur={total_ms:.2f}')
+
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = EndpointStats(self._window)
+            stats.add(total_ms, sql_ms, queries, response.status_code)
+
+        if g.metrics_profile is not None:
+            counter = self.profiler.stop()
+            g.metrics_profile = None
+            if counter and total_ms >= self._slow_ms:
+                self.profiler.dump(counter, endpoint, total_ms)
+        return response
+
+    def _teardown_request(self, exc):
+        # A request that died before after_request must not stay registered with the sampler
+        if g.get('metrics_profile') is not None:
+            self.profiler.stop()
+
+
+metrics = RequestMetrics()
@@ -0,0 +1,51 @@
+import hashlib
+from flask import request, current_app, Response
+from cache import TTLCache
+from config import Config
+from inventory_stats import catalog_version, reconcile_if_due
+
+# etag -> serialized JSON bytes; an entry can only go stale by aging out,
+# because any catalog write moves reads onto a new version (and a new etag)
+_responses = TTLCache(maxsize=Config.RESPONSE_CACHE_SIZE, ttl=Config.RESPONSE_CACHE_TTL)
+
+def cached_json(build, vary=None):
+    """
+    Serves build() as JSON with a strong ETag derived from the catalog version
+    and the request URL. Matching If-None-Match gets a 304; otherwise the body is
+    served from pre-serialized bytes when this version was already rendered.
+    `vary` is any other input the body depends on (e.g. a default taken from the clock).
+    """
+    # A recount moves the version, so it must run before the version is read, not inside build();
+    # it also has to run on cache hits and 304s, which never call build()
+    reconcile_if_due()
+    # Read the version before the data so a concurrent write can only make the body newer, never older
+    version = catalog_version()
+    if version is None:
+        return _json_response(build())
+
+    key = request.full_path if vary is None else f'{request.full_path}\n{vary}'
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).hexdigest()
+    etag = f'v{version}-{digest}'
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        body = _responses.get(etag)
+        if body is None:
+            body = _serialize(build())
+            # A write committed during build() may or may not be in the body: serve it, don't cache it
+            if catalog_version() == version:
+                _responses.set(etag, body)
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    # Let browsers keep the body but always revalidate it
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def stats():
+    return _responses.stats()
+
+def _serialize(data):
+    return current_app.json.dumps(data).encode('utf-8') + b'\n'
+
+def _json_response(data):
+    return Response(_serialize(data), mimetype='application/json')
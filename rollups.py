@@ -0,0 +1,190 @@
+from sqlalchemy import select, delete, update, insert, func, text
+from models import db, Product, Transaction, MovementRollup
+from db_engine import upsert_insert
+
+# Per-product, per-location movement totals per UTC hour and day. Written in the
+# same database transaction as the ledger rows, so range analytics never need to
+# scan Transaction. Central stock is location 0; stores never share a rollup row.
+PERIODS = ('hour', 'day')
+METRICS = ('quantity_out', 'quantity_in', 'revenue', 'movements')
+CENTRAL = 0
+KEY = ('period', 'bucket', 'product_id', 'location_id')
+
+_rollup = MovementRollup.__table__
+
+def bucket_start(ts, period):
+    if period == 'hour':
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def record_movements(movements):
+    """
+    Adds movements [(product_id, timestamp, type, quantity, price, location_id)]
+    to the hour and day rollups (location_id None = central stock). Runs in the
+    caller's transaction: commit it together with the Transaction rows.
+    """
+    totals = {}
+    for product_id, ts, kind, qty, price, location_id in movements:
+        out = kind == 'out'
+        for period in PERIODS:
+            key = (period, bucket_start(ts, period), product_id, CENTRAL if location_id is None else location_id)
+            t = totals.setdefault(key, [0, 0, 0.0, 0])
+            t[0] += 0 if out else qty
+            t[1] += qty if out else 0
+            t[2] += qty * (price or 0.0) if out else 0.0
+            t[3] += 1
+    _upsert([
+        {'period': key[0], 'bucket': key[1], 'product_id': key[2], 'location_id': key[3],
+         'quantity_in': t[0], 'quantity_out': t[1], 'revenue': t[2], 'movements': t[3]}
+        for key, t in totals.items()
+    ])
+
+def _upsert(rows):
+    if not rows:
+        return
+    # Same key order in every writer, so concurrent upserts can't deadlock on Postgres
+    rows.sort(key=lambda r: tuple(r[name] for name in KEY))
+    dialect_insert = upsert_insert(db.session.get_bind().dialect.name)
+    if dialect_insert is not None:
+        stmt = dialect_insert(_rollup)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(KEY),
+            set_={name: _rollup.c[name] + stmt.excluded[name] for name in METRICS}
+        )
+        db.session.execute(stmt, rows)
+        return
+
+    # Portable fallback: increment, insert where nothing was there yet
+    for row in rows:
+        result = db.session.execute(
+            update(_rollup).where(*(_rollup.c[name] == row[name] for name in KEY)).values({name: _rollup.c[name] + row[name] for name in METRICS})
+        )
+        if result.rowcount == 0:
+            db.session.execute(insert(_rollup), [row])
+
+def rebuild(since=None, batch_size=50000):
+    """
+    Recomputes the rollups from the ledger (all of it, or from the start of the
+    day containing `since`). The purge commits first; the ledger is then read
+    in id order and every batch is aggregated with numpy and committed on its
+    own, so memory stays flat and the SQLite write lock is only held per batch:
+    checkouts keep going during a backfill (range reports are incomplete until
+    it finishes). Movements recorded meanwhile reach the rollups as usual; the
+    backfill stops at the last ledger id committed before the purge.
+    Revenue uses current prices: the ledger does not record historical ones.
+    Returns the number of transactions read.
+    """
+    # Only the batch rebuild needs numpy; keep it off the per-checkout import path
+    import numpy as np
+    start = bucket_start(since, 'day') if since else None
+    purge = delete(_rollup)
+    stmt = select(
+        Transaction.id, Transaction.product_id, Transaction.timestamp, Transaction.transaction_type,
+        Transaction.quantity, func.coalesce(Transaction.location_id, CENTRAL)
+    ).order_by(Transaction.id).limit(batch_size)
+    if start is not None:
+        purge = purge.where(_rollup.c.bucket >= start)
+        stmt = stmt.where(Transaction.timestamp >= start)
+    if db.session.get_bind().dialect.name == 'postgresql':
+        # Let in-flight ledger writes commit first, so no id up to last_id shows up later
+        db.session.execute(text(f'LOCK TABLE "{Transaction.__table__.name}" IN SHARE MODE'))
+    # After the purge (SQLite now holds the write lock), so no movement is both purged and missed
+    db.session.execute(purge)
+    last_id = db.session.execute(select(func.max(Transaction.id))).scalar() or 0
+    db.session.commit()
+
+    price_rows = db.session.execute(select(Product.id, Product.price).order_by(Product.id)).all()
+    catalog_ids = np.array([r[0] for r in price_rows], dtype=np.int64)
+    prices = np.array([r[1] or 0.0 for r in price_rows], dtype=np.float64)
+
+    read = after = 0
+    while after < last_id:
+        partition = db.session.execute(stmt.where(Transaction.id > after, Transaction.id <= last_id)).all()
+        if not partition:
+            break
+        tx_ids, product_ids, timestamps, kinds, quantities, location_ids = zip(*partition)
+        after = tx_ids[-1]
+        read += len(partition)
+        ids = np.array(product_ids, dtype=np.int64)
+        ts = np.array(timestamps, dtype='datetime64[s]')
+        out = np.array(kinds) == 'out'
+        qty = np.array(quantities, dtype=np.int64)
+        locations = np.array(location_ids, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(catalog_ids, ids), max(len(catalog_ids) - 1, 0))
+        price = np.where(catalog_ids[pos] == ids, prices[pos], 0.0) if len(catalog_ids) else np.zeros(len(ids))
+        columns = (np.where(out, 0, qty), np.where(out, qty, 0), np.where(out, qty * price, 0.0), np.ones(len(ids)))
+
+        for period, unit in (('hour', 'h'), ('day', 'D')):
+            buckets = ts.astype(f'datetime64[{unit}]')
+            keys, inverse = np.unique(np.stack([buckets.astype(np.int64), ids, locations]), axis=1, return_inverse=True)
+            inverse = inverse.ravel()
+            sums = [np.bincount(inverse, weights=c, minlength=keys.shape[1]) for c in columns]
+            starts = keys[0].astype(f'datetime64[{unit}]').astype('datetime64[s]').tolist()
+            _upsert([
+                {'period': period, 'bucket': starts[i], 'product_id': int(keys[1, i]), 'location_id': int(keys[2, i]),
+                 'quantity_in': int(sums[0][i]), 'quantity_out': int(sums[1][i]),
+                 'revenue': float(sums[2][i]), 'movements': int(sums[3][i])}
+                for i in range(keys.shape[1])
+            ])
+        db.session.commit()
+    return read
+
+def _range(start, end, period, location_id=None):
+    # location_id None sums the whole chain; 'central' or a location id narrows it to one stock
+    conditions = [
+        MovementRollup.period == period,
+        MovementRollup.bucket >= bucket_start(start, period),
+        MovementRollup.bucket < end
+    ]
+    if location_id is not None:
+        conditions.append(MovementRollup.location_id == (CENTRAL if location_id == 'central' else location_id))
+    return conditions
+
+def top_movers(start, end, period='day', metric='quantity_out', limit=10, location_id=None):
+    # Products ranked by a metric summed over [start, end); start is rounded down to the period
+    total = func.sum(getattr(MovementRollup, metric)).label('total')
+    rows = db.session.execute(
+        select(
+            MovementRollup.product_id, Product.sku, Product.name, Product.category,
+            func.sum(MovementRollup.quantity_in), func.sum(MovementRollup.quantity_out),
+            func.sum(MovementRollup.revenue), func.sum(MovementRollup.movements), total
+        ).join(Product, Product.id == MovementRollup.product_id)
+        .where(*_range(start, end, period, location_id))
+        .group_by(MovementRollup.product_id, Product.sku, Product.name, Product.category)
+        .order_by(total.desc(), MovementRollup.product_id).limit(limit)
+    ).all()
+    return [
+        {'product_id': r[0], 'sku': r[1], 'name': r[2], 'category': r[3], 'quantity_in': int(r[4]),
+         'quantity_out': int(r[5]), 'revenue': round(float(r[6]), 2), 'movements': int(r[7])}
+        for r in rows
+    ]
+
+def category_totals(start, end, period='day', location_id=None):
+    rows = db.session.execute(
+        select(
+            Product.category, func.sum(MovementRollup.quantity_in), func.sum(MovementRollup.quantity_out),
+            func.sum(MovementRollup.revenue), func.sum(MovementRollup.movements)
+        ).join(Product, Product.id == MovementRollup.product_id)
+        .where(*_range(start, end, period, location_id))
+        .group_by(Product.category).order_by(func.sum(MovementRollup.revenue).desc())
+    ).all()
+    return [
+        {'category': r[0], 'quantity_in': int(r[1]), 'quantity_out': int(r[2]),
+         'revenue': round(float(r[3]), 2), 'movements': int(r[4])}
+        for r in rows
+    ]
+
+def movement_series(start, end, period='day', product_id=None, location_id=None):
+    # One point per bucket with activity; the whole catalog unless product_id is given
+    stmt = select(
+        MovementRollup.bucket, func.sum(MovementRollup.quantity_in), func.sum(MovementRollup.quantity_out),
+        func.sum(MovementRollup.revenue), func.sum(MovementRollup.movements)
+    ).where(*_range(start, end, period, location_id))
+    if product_id is not None:
+        stmt = stmt.where(MovementRollup.product_id == product_id)
+    rows = db.session.execute(stmt.group_by(MovementRollup.bucket).order_by(MovementRollup.bucket)).all()
+    return [
+        {'bucket': r[0].isoformat(), 'quantity_in': int(r[1]), 'quantity_out': int(r[2]),
+         'revenue': round(float(r[3]), 2), 'movements': int(r[4])}
+        for r in rows
+    ]
@@ -0,0 +1,198 @@
+import re
+import sqlite3
+from sqlalchemy import event, select, table, column, literal_column, or_, and_, func
+from sqlalchemy.pool import Pool
+from models import db, Product
+
+# SQLite FTS5 index over the searchable product columns. It is an external-content
+# table kept in sync by triggers, so every worker (and any other writer) sees the
+# same index. Stock updates don't touch it: the update trigger only fires for text columns.
+FTS_TABLE = 'product_fts'
+SEARCH_COLUMNS = ('sku', 'name', 'category', 'supplier')
+
+_DDL = [
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        sku, name, category, supplier,
+        content='product', content_rowid='id',
+        tokenize="unicode61 tokenchars '-_'", prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS product_fts_ai AFTER INSERT ON product BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, sku, name, category, supplier)
+        VALUES (new.id, new.sku, new.name, new.category, new.supplier);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS product_fts_ad AFTER DELETE ON product BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, sku, name, category, supplier)
+        VALUES ('delete', old.id, old.sku, old.name, old.category, old.supplier);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS product_fts_au AFTER UPDATE OF sku, name, category, supplier ON product BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, sku, name, category, supplier)
+        VALUES ('delete', old.id, old.sku, old.name, old.category, old.supplier);
+        INSERT INTO {FTS_TABLE}(rowid, sku, name, category, supplier)
+        VALUES (new.id, new.sku, new.name, new.category, new.supplier);
+    END""",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+]
+
+# Trigram index for match=fuzzy: finds candidates sharing any trigram with a query
+# token; word_similarity() then keeps the close ones. Needs SQLite 3.34+.
+TRIGRAM_TABLE = 'product_trigram'
+FUZZY_THRESHOLD = 0.3
+_TRIGRAM_DDL = [
+    f"DROP TABLE IF EXISTS {TRIGRAM_TABLE}",
+    f"""CREATE VIRTUAL TABLE {TRIGRAM_TABLE} USING fts5(
+        sku, name, category, supplier,
+        content='product', content_rowid='id', tokenize='trigram'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS product_trigram_ai AFTER INSERT ON product BEGIN
+        INSERT INTO {TRIGRAM_TABLE}(rowid, sku, name, category, supplier)
+        VALUES (new.id, new.sku, new.name, new.category, new.supplier);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS product_trigram_ad AFTER DELETE ON product BEGIN
+        INSERT INTO {TRIGRAM_TABLE}({TRIGRAM_TABLE}, rowid, sku, name, category, supplier)
+        VALUES ('delete', old.id, old.sku, old.name, old.category, old.supplier);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS product_trigram_au AFTER UPDATE OF sku, name, category, supplier ON product BEGIN
+        INSERT INTO {TRIGRAM_TABLE}({TRIGRAM_TABLE}, rowid, sku, name, category, supplier)
+        VALUES ('delete', old.id, old.sku, old.name, old.category, old.supplier);
+        INSERT INTO {TRIGRAM_TABLE}(rowid, sku, name, category, supplier)
+        VALUES (new.id, new.sku, new.name, new.category, new.supplier);
+    END""",
+    f"INSERT INTO {TRIGRAM_TABLE}({TRIGRAM_TABLE}) VALUES ('rebuild')"
+]
+
+_fts = table(FTS_TABLE, column('rowid'))
+_trigram = table(TRIGRAM_TABLE, column('rowid'))
+_ready = {}
+
+def create_search_index(connection):
+    # (Re)builds the FTS table and triggers; returns False if FTS5 is unavailable
+    create_trigram_index(connection)
+    return _run_ddl(connection, _DDL)
+
+def create_trigram_index(connection):
+    # Same for the fuzzy-match index; False without FTS5 or its trigram tokenizer
+    return _run_ddl(connection, _TRIGRAM_DDL)
+
+def _run_ddl(connection, statements):
+    if connection.dialect.name != 'sqlite':
+        return False
+    try:
+        for statement in statements:
+            connection.exec_driver_sql(statement)
+    except Exception:
+        return False
+    return True
+
+@event.listens_for(Product.__table__, 'after_create')
+def _create_with_table(target, connection, **kw):
+    create_search_index(connection)
+
+def fts_available():
+    """
+    True when the FTS index exists for the current database, creating it on
+    first use for databases that predate it. Checked once per process.
+    """
+    return _index_available(FTS_TABLE, create_search_index)
+
+def trigram_available():
+    return _index_available(TRIGRAM_TABLE, create_trigram_index)
+
+def _index_available(name, create):
+    engine = db.engine
+    key = (str(engine.url), name)
+    if key not in _ready:
+        if engine.dialect.name != 'sqlite':
+            _ready[key] = False
+        else:
+            with engine.begin() as connection:
+                exists = connection.exec_driver_sql(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+                ).first()
+                _ready[key] = bool(exists) or create(connection)
+    return _ready[key]
+
+def _trigrams(word):
+    # Padded like pg_trgm, so word starts weigh more than word ends
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def word_similarity(query, text):
+    """
+    Best trigram similarity (0..1) between `query` and any word of `text`:
+    SQLite's stand-in for pg_trgm's word_similarity(), registered on every
+    SQLite connection. Catches typos, e.g. 'widgt' scores 0.44 against 'Widget'.
+    """
+    if not query or not text:
+        return 0.0
+    wanted = _trigrams(query.lower())
+    best = 0.0
+    for word in tokenize(text):
+        found = _trigrams(word)
+        best = max(best, len(wanted & found) / len(wanted | found))
+    return best
+
+@event.listens_for(Pool, 'checkout')
+def _register_functions(dbapi_connection, connection_record, connection_proxy):
+    # On checkout rather than connect, so connections opened before this import get it too
+    if 'word_similarity' not in connection_record.info and isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.create_function('word_similarity', 2, word_similarity, deterministic=True)
+        connection_record.info['word_similarity'] = True
+
+def tokenize(query):
+    return [t.lower() for t in re.findall(r'[\w\-]+', query or '')]
+
+def search_filter(query, mode='prefix'):
+    """
+    SQL filter matching products against a free-text query. Every token must
+    match the start of a word in sku/name/category/supplier ('prefix'), appear
+    anywhere in them ('contains', slower: not index-backed), or be close to one
+    of their words ('fuzzy': trigram similarity of at least FUZZY_THRESHOLD;
+    pg_trgm on Postgres). Fuzzy tokens shorter than three characters match as prefixes.
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return None
+    if mode == 'fuzzy':
+        short = [t for t in tokens if len(t) < 3]
+        clauses = [_fuzzy_clause(t) for t in tokens if len(t) >= 3]
+        if short:
+            clauses.append(search_filter(' '.join(short), 'prefix'))
+        return and_(*clauses)
+    if mode == 'prefix' and fts_available():
+        match = ' AND '.join(f'"{t}"*' for t in tokens)
+        return Product.id.in_(select(_fts.c.rowid).where(literal_column(FTS_TABLE).op('MATCH')(match)))
+
+    # Portable fallback (non-SQLite databases, or substring matching)
+    pattern = '{}%' if mode == 'prefix' else '%{}%'
+    clauses = []
+    for t in tokens:
+        escaped = t.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        clauses.append(or_(*[
+            func.lower(getattr(Product, name)).like(pattern.format(escaped), escape='\\')
+            for name in SEARCH_COLUMNS
+        ]))
+    return and_(*clauses)
+
+def _fuzzy_clause(token):
+    searchable = func.coalesce(Product.sku, '')
+    for name in SEARCH_COLUMNS[1:]:
+        searchable = searchable + ' ' + func.coalesce(getattr(Product, name), '')
+    close = func.word_similarity(token, searchable) >= FUZZY_THRESHOLD
+    if not trigram_available():
+        return close
+    # Only rows sharing a trigram with the token are scored
+    match = ' OR '.join(f'"{token[i:i + 3]}"' for i in range(len(token) - 2))
+    candidates = select(_trigram.c.rowid).where(literal_column(TRIGRAM_TABLE).op('MATCH')(match))
+    return and_(Product.id.in_(candidates), close)
+
+def ensure_search_index():
+    # Used by update_db.py to (re)build the indexes on an existing database
+    url = str(db.engine.url)
+    with db.engine.begin() as connection:
+        _ready[url, FTS_TABLE] = create_search_index(connection)
+        _ready[url, TRIGRAM_TABLE] = create_trigram_index(connection)
+        if connection.dialect.name == 'postgresql':
+            # match=fuzzy uses pg_trgm's word_similarity()
+            connection.exec_driver_sql('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    return _ready[url, FTS_TABLE]
@@ -0,0 +1,63 @@
+"""
+Minimal local SMTP sink (no TLS, no auth) for the email dispatcher's tests and
+bench_email.py. Records the recipient of every message it accepts.
+"""
+import socketserver
+import threading
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=('127.0.0.1', 0)):
+        super().__init__(address, SMTPHandler)
+        self.recipients = []
+        self.lock = threading.Lock()
+
+    @property
+    def received(self):
+        with self.lock:
+            return len(self.recipients)
+
+    def start(self):
+        # Serves from a daemon thread; returns (host, port)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self.server_address
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    # Just enough of RFC 5321 for smtplib.sendmail
+    def reply(self, line):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        self.reply('220 sink ready')
+        recipient = None
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('ascii', 'replace').strip()
+            verb = command.upper()
+            if verb.startswith(('EHLO', 'HELO')):
+                self.reply('250 sink')
+            elif verb.startswith('RCPT TO:'):
+                recipient = command[8:].strip(' <>')
+                self.reply('250 ok')
+            elif verb == 'DATA':
+                self.reply('354 end with <CRLF>.<CRLF>')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                with self.server.lock:
+                    self.server.recipients.append(recipient)
+                self.reply('250 queued')
+            elif verb == 'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('250 ok')
@@ -0,0 +1,32 @@
+import argparse
+import time
+from app import create_app, db
+from config import BatchConfig
+from pagination import parse_datetime
+from stock_history import take_snapshot, check_consistency
+
+app = create_app(BatchConfig)
+
+# Stores today's stock snapshot (run daily from cron, shortly after midnight UTC).
+#   python snapshot_stock.py                  (today)
+#   python snapshot_stock.py --day 2024-06-01 (backfill a past day)
+#   python snapshot_stock.py --check          (only report stock that disagrees with snapshot + ledger)
+parser = argparse.ArgumentParser(description='Daily stock snapshots')
+parser.add_argument('--day', help='UTC day to snapshot, defaults to today')
+parser.add_argument('--check', action='store_true', help='run the consistency check instead')
+args = parser.parse_args()
+
+with app.app_context():
+    db.create_all()
+    started = time.perf_counter()
+    if args.check:
+        report = check_consistency()
+        print(f"Checked {report['checked']} stock rows against snapshot {report['snapshot_day']}: "
+              f"{report['mismatches']} mismatches ({time.perf_counter() - started:.1f}s)")
+        for item in report['items']:
+            print(f"  product {item['product_id']} @ {item['location_id'] or 'central'}: "
+                  f"expected {item['expected']}, actual {item['actual']}")
+    else:
+        summary = take_snapshot(parse_datetime(args.day).date() if args.day else None)
+        print(f"Snapshot {summary['day']}: {summary['rows']} rows, pruned {summary['pruned']} "
+              f"({time.perf_counter() - started:.1f}s)")
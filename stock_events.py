@@ -0,0 +1,120 @@
+import json
+import queue
+import threading
+from sqlalchemy import select, func
+from config import Config
+from models import db, InventoryStats
+
+# Sent to a subscriber whose queue overflowed: its deltas are incomplete, refetch /api/products
+RESYNC = {'resync': True}
+
+
+class StockHub:
+    """
+    In-process pub/sub for stock deltas. Each subscriber gets a bounded queue;
+    a slow consumer never blocks writers, it just gets told to resync.
+    """
+
+    def __init__(self, queue_size=1000, max_subscribers=500):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.published = 0
+        self.overflows = 0
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            q = queue.Queue(maxsize=self.queue_size)
+            self._subscribers.add(q)
+            return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self.published += 1
+        for q in subscribers:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                with self._lock:
+                    self.overflows += 1
+                # Concurrent publishers can refill the queue between the drain and the put;
+                # the RESYNC must still land or the subscriber never learns it lost deltas
+                while True:
+                    _drain(q)
+                    try:
+                        q.put_nowait(RESYNC)
+                        break
+                    except queue.Full:
+                        continue
+
+    def stats(self):
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'published': self.published,
+                'overflows': self.overflows
+            }
+
+
+hub = StockHub(Config.STREAM_QUEUE_SIZE, Config.STREAM_MAX_SUBSCRIBERS)
+
+def publish_stock(product_id, new_stock, location_id=None):
+    # Call after the write has committed; location deltas carry their location_id
+    event = {'product_id': product_id, 'new_stock': new_stock}
+    if location_id is not None:
+        event['location_id'] = location_id
+    hub.publish(event)
+
+def publish_deleted(product_id):
+    hub.publish({'product_id': product_id, 'deleted': True})
+
+def sse_stream(q, heartbeat=Config.STREAM_HEARTBEAT):
+    """
+    Yields Server-Sent Events for one subscriber until the client disconnects.
+    Bursts are coalesced to the latest stock per product and location. Deltas only cover
+    writes handled by this process, so every heartbeat also carries the shared
+    catalog version; clients refetch (cheaply, via ETag) when it moves without
+    a matching delta.
+    """
+    try:
+        yield f'retry: 3000\nevent: version\ndata: {json.dumps({"catalog_version": _catalog_version()})}\n\n'
+        while True:
+            try:
+                events = [q.get(timeout=heartbeat)]
+            except queue.Empty:
+                yield f'event: version\ndata: {json.dumps({"catalog_version": _catalog_version()})}\n\n'
+                continue
+            events.extend(_drain(q))
+
+            if RESYNC in events:
+                yield f'event: resync\ndata: {json.dumps(RESYNC)}\n\n'
+                continue
+            latest = {}
+            for event in events:
+                latest[event['product_id'], event.get('location_id')] = event
+            yield ''.join(f'event: stock\ndata: {json.dumps(event)}\n\n' for event in latest.values())
+    finally:
+        hub.unsubscribe(q)
+
+def _catalog_version():
+    # Short-lived connection: a long-lived stream must not pin a session/transaction open
+    with db.engine.connect() as connection:
+        return connection.execute(
+            select(func.sum(InventoryStats.catalog_version))
+        ).scalar()
+
+def _drain(q):
+    items = []
+    while True:
+        try:
+            items.append(q.get_nowait())
+        except queue.Empty:
+            return items
@@ -0,0 +1,220 @@
+import contextlib
+import datetime
+import numpy as np
+from sqlalchemy import select, delete, insert, func, case
+from config import Config
+from models import db, Product, Transaction, LocationStock, StockTransfer, StockSnapshot
+from rollups import CENTRAL
+from inventory_stats import record_changes
+
+# Point-in-time stock = the latest daily snapshot at or before the time plus the
+# ledger tail since that snapshot (movements and transfers). Stock rows are keyed
+# as location_id << 32 | product_id so whole-catalog passes are numpy array ops.
+
+_snapshots = StockSnapshot.__table__
+
+
+def _key(location_ids, product_ids):
+    return (np.asarray(location_ids, dtype=np.int64) << 32) | np.asarray(product_ids, dtype=np.int64)
+
+def _split(keys):
+    return keys >> 32, keys & 0xFFFFFFFF
+
+def _combine(*parts):
+    # Sums (keys, values) pairs per key: returns sorted unique keys and their totals
+    keys = np.concatenate([k for k, v in parts] or [np.empty(0, np.int64)])
+    values = np.concatenate([v for k, v in parts] or [np.empty(0, np.int64)])
+    if not len(keys):
+        return keys, np.empty(0, np.int64)
+    unique, inverse = np.unique(keys, return_inverse=True)
+    return unique, np.round(np.bincount(inverse.ravel(), weights=values, minlength=len(unique))).astype(np.int64)
+
+def _arrays(rows):
+    # (product_id, location_id, quantity) rows -> (keys, quantities)
+    if not rows:
+        return np.empty(0, np.int64), np.empty(0, np.int64)
+    product_ids, location_ids, quantities = zip(*rows)
+    return _key(location_ids, product_ids), np.array(quantities, dtype=np.int64)
+
+@contextlib.contextmanager
+def _consistent_read():
+    """
+    A dedicated connection whose reads all see the same committed state, so stock
+    and ledger can't disagree because a checkout committed between two SELECTs.
+    Close it before writing: on SQLite without WAL an open reader blocks commits.
+    """
+    options = {'isolation_level': 'REPEATABLE READ'} if db.engine.dialect.name == 'postgresql' else {}
+    with db.engine.connect().execution_options(**options) as connection:
+        if connection.dialect.name == 'sqlite':
+            # pysqlite only opens a transaction before writes; pin the read snapshot explicitly
+            connection.exec_driver_sql('BEGIN')
+        yield connection
+
+def _day_start(day):
+    return datetime.datetime.combine(day, datetime.time.min)
+
+def current_stock(connection, product_ids=None, location_id=None):
+    # Central stock from Product, store stock from LocationStock; location_id narrows to one of them
+    parts = []
+    if location_id in (None, CENTRAL):
+        stmt = select(Product.id, Product.stock_quantity)
+        if product_ids is not None:
+            stmt = stmt.where(Product.id.in_(product_ids))
+        parts.append(_arrays([(pid, CENTRAL, qty or 0) for pid, qty in connection.execute(stmt)]))
+    if location_id != CENTRAL:
+        stmt = select(LocationStock.product_id, LocationStock.location_id, LocationStock.quantity)
+        if product_ids is not None:
+            stmt = stmt.where(LocationStock.product_id.in_(product_ids))
+        if location_id is not None:
+            stmt = stmt.where(LocationStock.location_id == location_id)
+        parts.append(_arrays(connection.execute(stmt).all()))
+    return _combine(*parts)
+
+def net_movements(connection, start=None, end=None, product_ids=None, location_id=None):
+    """
+    Net stock change per (location, product) from ledger movements and transfers
+    with timestamps in [start, end), aggregated in SQL. Either bound may be None.
+    """
+    signed = case((Transaction.transaction_type == 'in', Transaction.quantity), else_=-Transaction.quantity)
+    legs = (
+        (Transaction, Transaction.location_id, func.sum(signed)),
+        (StockTransfer, StockTransfer.from_location_id, -func.sum(StockTransfer.quantity)),
+        (StockTransfer, StockTransfer.to_location_id, func.sum(StockTransfer.quantity)),
+    )
+    parts = []
+    for model, location_column, total in legs:
+        location = func.coalesce(location_column, CENTRAL)
+        stmt = select(model.product_id, location, total)
+        if start is not None:
+            stmt = stmt.where(model.timestamp >= start)
+        if end is not None:
+            stmt = stmt.where(model.timestamp < end)
+        if product_ids is not None:
+            stmt = stmt.where(model.product_id.in_(product_ids))
+        if location_id is not None:
+            stmt = stmt.where(location == location_id)
+        parts.append(_arrays(connection.execute(stmt.group_by(model.product_id, location)).all()))
+    return _combine(*parts)
+
+def take_snapshot(day=None, retention_days=None, batch_size=10000):
+    """
+    Stores every non-zero stock level as of the start of `day` (default today,
+    UTC), replacing an earlier run for that day, and prunes snapshots older
+    than the retention window. The level is derived from current stock minus
+    the ledger since that moment, so past days can be backfilled too. Commits.
+    """
+    day = day or datetime.datetime.utcnow().date()
+    retention_days = Config.STOCK_SNAPSHOT_RETENTION_DAYS if retention_days is None else retention_days
+    with _consistent_read() as connection:
+        stock = current_stock(connection)
+        since = net_movements(connection, start=_day_start(day))
+    keys, quantities = _combine(stock, (since[0], -since[1]))
+    keep = quantities != 0
+    location_ids, product_ids = (a.tolist() for a in _split(keys[keep]))
+    quantities = quantities[keep].tolist()
+
+    db.session.execute(delete(_snapshots).where(_snapshots.c.day == day))
+    for start in range(0, len(quantities), batch_size):
+        db.session.execute(insert(_snapshots), [
+            {'day': day, 'location_id': location_ids[i], 'product_id': product_ids[i], 'quantity': quantities[i]}
+            for i in range(start, min(start + batch_size, len(quantities)))
+        ])
+    pruned = 0
+    if retention_days:
+        cutoff = datetime.datetime.utcnow().date() - datetime.timedelta(days=retention_days)
+        pruned = db.session.execute(delete(_snapshots).where(_snapshots.c.day < cutoff)).rowcount
+    # /stock-at responses are cached per catalog version; they may now start from this snapshot
+    record_changes()
+    db.session.commit()
+    return {'day': day.isoformat(), 'rows': len(quantities), 'pruned': pruned}
+
+def latest_snapshot_day(connection, at=None):
+    stmt = select(func.max(StockSnapshot.day))
+    if at is not None:
+        stmt = stmt.where(StockSnapshot.day <= at.date())
+    day = connection.execute(stmt).scalar()
+    # SQLite returns the aggregate as a string
+    return datetime.date.fromisoformat(day) if isinstance(day, str) else day
+
+def stock_at(ts, location_id=CENTRAL, limit=100, after_id=None, product_ids=None):
+    """
+    Stock per product at `ts` for one location (central by default), paged by
+    product id: the nearest snapshot at or before ts plus the ledger tail up to
+    ts, read through the (product_id, timestamp) ledger index for just this page.
+    Without an earlier snapshot it works backwards instead: current stock minus
+    the movements since ts. Opening stock, imports and count corrections are not
+    in the ledger, so replaying it from zero would be wrong.
+    Returns (snapshot day or None, up to limit + 1 item dicts).
+    """
+    with _consistent_read() as connection:
+        stmt = select(Product.id, Product.sku, Product.name)
+        if after_id is not None:
+            stmt = stmt.where(Product.id > after_id)
+        if product_ids:
+            stmt = stmt.where(Product.id.in_(product_ids))
+        page = connection.execute(stmt.order_by(Product.id).limit(limit + 1)).all()
+        ids = [row[0] for row in page]
+
+        day = latest_snapshot_day(connection, ts)
+        parts = []
+        if day is None and ids:
+            since = net_movements(connection, start=ts, product_ids=ids, location_id=location_id)
+            parts += [current_stock(connection, ids, location_id), (since[0], -since[1])]
+        elif ids:
+            parts.append(_arrays(connection.execute(
+                select(StockSnapshot.product_id, StockSnapshot.location_id, StockSnapshot.quantity).where(
+                    StockSnapshot.day == day, StockSnapshot.location_id == location_id,
+                    StockSnapshot.product_id.in_(ids)
+                )
+            ).all()))
+            parts.append(net_movements(
+                connection, start=_day_start(day), end=ts, product_ids=ids, location_id=location_id
+            ))
+    keys, quantities = _combine(*parts)
+    levels = dict(zip(_split(keys)[1].tolist(), quantities.tolist()))
+    items = [{'product_id': pid, 'sku': sku, 'name': name, 'quantity': levels.get(pid, 0)} for pid, sku, name in page]
+    return day, items
+
+def check_consistency(limit=100):
+    """
+    Compares live stock (central and every location) against latest snapshot
+    plus ledger since, for the whole catalog in one vectorized pass. A mismatch
+    means stock changed outside the ledger: a manual correction, an import, a
+    backdated movement or a direct SQL edit since the snapshot. Without any
+    snapshot there is no baseline to check against (opening stock is not in
+    the ledger), so nothing is checked.
+    """
+    with _consistent_read() as connection:
+        day = latest_snapshot_day(connection)
+        if day is None:
+            return {'snapshot_day': None, 'checked': 0, 'mismatches': 0, 'items': []}
+        base = _arrays(connection.execute(
+            select(StockSnapshot.product_id, StockSnapshot.location_id, StockSnapshot.quantity)
+            .where(StockSnapshot.day == day)
+        ).all())
+        expected = _combine(base, net_movements(connection, start=_day_start(day)))
+        actual = current_stock(connection)
+
+    # Align both on the union of keys: difference = actual - expected
+    keys, difference = _combine(actual, (expected[0], -expected[1]))
+    expected_at = dict(zip(expected[0].tolist(), expected[1].tolist()))
+    bad = np.flatnonzero(difference != 0)
+    worst = bad[np.argsort(-np.abs(difference[bad]), kind='stable')][:limit]
+    location_ids, product_ids = _split(keys[worst])
+    items = []
+    for key, location, product, diff in zip(keys[worst].tolist(), location_ids.tolist(), product_ids.tolist(),
+                                            difference[worst].tolist()):
+        expected_qty = expected_at.get(key, 0)
+        items.append({
+            'product_id': product,
+            'location_id': None if location == CENTRAL else location,
+            'expected': expected_qty,
+            'actual': expected_qty + diff,
+            'difference': diff
+        })
+    return {
+        'snapshot_day': day.isoformat() if day else None,
+        'checked': len(keys),
+        'mismatches': len(bad),
+        'items': items
+    }
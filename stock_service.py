@@ -0,0 +1,62 @@
+from sqlalchemy import select, update
+from models import db, Product
+
+
+class InsufficientStockError(Exception):
+    pass
+
+
+class StockConflictError(Exception):
+    pass
+
+
+def adjust_stock(product_id, delta):
+    """
+    Atomically adds delta to a product's stock and returns the new level.
+    The check and the write happen in one conditional UPDATE, so concurrent
+    workers can never push stock below zero. Caller owns the commit.
+    """
+    stmt = update(Product).where(Product.id == product_id)
+    if delta < 0:
+        stmt = stmt.where(Product.stock_quantity >= -delta)
+    stmt = stmt.values(stock_quantity=Product.stock_quantity + delta)
+    new_stock = _execute(stmt, product_id)
+    if new_stock is None:
+        raise InsufficientStockError(product_id)
+    return new_stock
+
+
+def set_stock(product_id, quantity, expected=None):
+    """
+    Overwrites stock (manual correction) and returns (old, new) levels. When
+    expected is given the write is a compare-and-set and raises
+    StockConflictError if stock moved in the meantime. Without it the current
+    level is read and written back as a compare-and-set, retried until it holds,
+    so `old` is exactly the level this write replaced (alerts depend on it).
+    """
+    if quantity < 0:
+        raise ValueError('Stock cannot be negative')
+    while True:
+        current = expected
+        if current is None:
+            row = db.session.execute(select(Product.stock_quantity).where(Product.id == product_id)).first()
+            if row is None:
+                raise StockConflictError(product_id)
+            current = row[0]
+        stmt = update(Product).where(Product.id == product_id, Product.stock_quantity == current)
+        new_stock = _execute(stmt.values(stock_quantity=quantity), product_id)
+        if new_stock is not None:
+            return current, new_stock
+        if expected is not None:
+            raise StockConflictError(product_id)
+
+
+def _execute(stmt, product_id):
+    # Returns the post-update stock, or None when the WHERE guard matched no row
+    if db.engine.dialect.update_returning:
+        return db.session.execute(
+            stmt.returning(Product.stock_quantity).execution_options(synchronize_session=False)
+        ).scalar()
+    if db.session.execute(stmt.execution_options(synchronize_session=False)).rowcount == 0:
+        return None
+    return db.session.query(Product.stock_quantity).filter(Product.id == product_id).scalar()
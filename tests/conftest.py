@@ -0,0 +1,91 @@
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+
+# The application modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Config is read at import time: point it at a throwaway database first
+_tmpdir = tempfile.mkdtemp(prefix='inventory-tests-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_tmpdir, 'test.db')
+os.environ['HASH_WORKERS'] = '0'
+os.environ['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+
+import pytest
+from werkzeug.security import generate_password_hash
+import alerts
+import audit_log
+from app import create_app
+from models import db, User, Product
+from utils import email_sender
+
+
+@pytest.fixture(autouse=True, scope='session')
+def mock_email():
+    # Never reach the SMTP server from .env: a pinned sender-less config only logs the message
+    email_sender.configure(username=None)
+    yield
+    email_sender.shutdown()
+
+
+@pytest.fixture(scope='session')
+def app():
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='admin', email='admin@localhost', role='admin', status='approved',
+                            password_hash=generate_password_hash('adminpass', method='pbkdf2:sha256:1000')))
+        db.session.commit()
+    yield app
+    with app.app_context():
+        # Write the login audit rows and alert digests now, while the database still exists
+        audit_log.flush()
+        alerts.flush_digest()
+        db.engine.dispose()
+    shutil.rmtree(_tmpdir, ignore_errors=True)
+
+
+@pytest.fixture(scope='session')
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture(scope='session')
+def admin_headers(client):
+    response = client.post('/api/auth/login', json={'username': 'admin', 'password': 'adminpass'})
+    return {'Authorization': 'Bearer ' + response.json['token']}
+
+
+@pytest.fixture
+def app_context(app):
+    with app.app_context():
+        yield
+
+
+_skus = itertools.count(1)
+
+@pytest.fixture
+def make_product(client, admin_headers):
+    # The session shares one database, so every product gets a fresh SKU
+    def make(**fields):
+        data = {'name': 'Widget', 'sku': f'T-{next(_skus):05d}', 'price': 2.5,
+                'stock_quantity': 100, 'min_stock_threshold': 10, **fields}
+        response = client.post('/api/products', json=data, headers=admin_headers)
+        assert response.status_code == 201, response.json
+        with client.application.app_context():
+            return db.session.execute(db.select(Product.id).filter_by(sku=data['sku'])).scalar_one()
+    return make
+
+
+_codes = itertools.count(1)
+
+@pytest.fixture
+def make_location(client, admin_headers):
+    def make():
+        code = f'LOC{next(_codes)}'
+        response = client.post('/api/locations', json={'code': code, 'name': f'Store {code}'}, headers=admin_headers)
+        assert response.status_code == 201, response.json
+        return response.json['id']
+    return make
@@ -0,0 +1,43 @@
+import audit_log
+from sqlalchemy import select, func
+from models import db, User, LoginLog
+
+
+def _logins(user_id):
+    return db.session.execute(select(func.count()).select_from(LoginLog).filter_by(user_id=user_id)).scalar()
+
+
+def test_bad_row_is_isolated_and_dropped_after_max_attempts(app_context, monkeypatch):
+    monkeypatch.setattr(audit_log.Config, 'AUDIT_MAX_ATTEMPTS', 2)
+    audit_log.flush()
+    admin_id = db.session.execute(select(User.id).filter_by(username='admin')).scalar_one()
+    before = _logins(admin_id)
+
+    # user_id is NOT NULL: this row can never be written
+    audit_log.record_login(None)
+    audit_log.record_login(admin_id)
+    assert audit_log.flush() == 1
+    assert _logins(admin_id) == before + 1
+    assert audit_log.pending() == 1
+
+    # Alone, it is still rejected (the database is fine) and dropped on the second attempt
+    assert audit_log.flush() == 0
+    assert audit_log.pending() == 0
+
+
+def test_rows_are_kept_while_the_database_is_down(app_context, monkeypatch):
+    monkeypatch.setattr(audit_log.Config, 'AUDIT_MAX_ATTEMPTS', 1)
+    audit_log.flush()
+    admin_id = db.session.execute(select(User.id).filter_by(username='admin')).scalar_one()
+    audit_log.record_login(admin_id)
+
+    def down(*args, **kwargs):
+        raise RuntimeError('database is down')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(audit_log, '_write', down)
+        patch.setattr(audit_log, '_database_reachable', lambda: False)
+        assert audit_log.flush() == 0
+        assert audit_log.pending() == 1
+    assert audit_log.flush() == 1
+    assert audit_log.pending() == 0
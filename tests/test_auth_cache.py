@@ -0,0 +1,48 @@
+import datetime
+
+import jwt
+from sqlalchemy import update
+
+from config import Config
+from models import db, User
+from routes import auth_routes
+from routes.auth_routes import resolve_token
+
+
+def _pending_user_token(client, username):
+    client.post('/api/auth/register', json={'username': username, 'password': 'secret'})
+    with client.application.app_context():
+        user_id = User.query.filter_by(username=username).one().id
+    token = jwt.encode({'id': user_id, 'role': 'employee',
+                        'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=1)},
+                       Config.SECRET_KEY, algorithm='HS256')
+    return user_id, token
+
+
+def test_approve_and_reject_evict_the_cached_user(client, admin_headers):
+    user_id, token = _pending_user_token(client, 'cache-evict')
+    with client.application.app_context():
+        assert resolve_token(token).status == 'pending'
+
+    assert client.put(f'/api/auth/approve/{user_id}', headers=admin_headers).status_code == 200
+    with client.application.app_context():
+        assert resolve_token(token).status == 'approved'
+
+    assert client.delete(f'/api/auth/reject/{user_id}', headers=admin_headers).status_code == 200
+    with client.application.app_context():
+        assert resolve_token(token) is None
+
+
+def test_changes_made_by_another_worker_arrive_with_the_epoch(client, monkeypatch):
+    user_id, token = _pending_user_token(client, 'cache-epoch')
+    with client.application.app_context():
+        assert resolve_token(token).role == 'employee'
+        # Another worker's change: no ORM events fire here, only the shared epoch moves
+        with db.engine.begin() as connection:
+            connection.execute(update(User.__table__).where(User.__table__.c.id == user_id).values(role='admin'))
+            auth_routes._bump_auth_epoch(connection)
+        # Until this worker's next check it still serves the cached user, then drops it
+        monkeypatch.setattr(auth_routes, '_next_epoch_check', float('inf'))
+        assert resolve_token(token).role == 'employee'
+        monkeypatch.setattr(auth_routes, '_next_epoch_check', 0.0)
+        assert resolve_token(token).role == 'admin'
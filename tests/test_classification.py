@@ -0,0 +1,93 @@
+import numpy as np
+
+from classification import compute_classes
+
+
+def dense_classes(catalog_ids, prices, demand_ids, demand_days, demand_qty, history_days, bucket_days,
+                  abc_thresholds=(0.8, 0.95), xyz_thresholds=(0.5, 1.0)):
+    # Reference: a full product x day matrix, buckets counted back from the last day
+    index = {pid: i for i, pid in enumerate(catalog_ids.tolist())}
+    daily = np.zeros((len(catalog_ids), history_days))
+    for pid, day, qty in zip(demand_ids.tolist(), demand_days.tolist(), demand_qty.tolist()):
+        if pid in index and 0 <= day < history_days:
+            daily[index[pid], day] += qty
+
+    value = daily.sum(axis=1) * prices
+    share = value / value.sum() if value.sum() > 0 else np.zeros(len(value))
+    reached = 0.0
+    ranked = sorted(range(len(value)), key=lambda i: -value[i])
+    classes = {}
+    for i in ranked:
+        classes[i] = 'C' if value[i] <= 0 else 'A' if reached < abc_thresholds[0] else 'B' if reached < abc_thresholds[1] else 'C'
+        reached += share[i]
+    abc = [classes[i] for i in range(len(value))]
+
+    buckets = max(history_days // bucket_days, 1)
+    width = min(bucket_days, history_days)
+    sums = np.stack([daily[:, history_days - (b + 1) * width:history_days - b * width].sum(axis=1)
+                     for b in range(buckets)], axis=1)
+    mean = sums.mean(axis=1)
+    std = sums.std(axis=1)
+    xyz = []
+    for m, s in zip(mean, std):
+        cv = s / m if m > 0 else None
+        xyz.append('Z' if cv is None else 'X' if cv <= xyz_thresholds[0] else 'Y' if cv <= xyz_thresholds[1] else 'Z')
+    return abc, xyz, mean
+
+
+def test_matches_dense_reference():
+    rng = np.random.default_rng(7)
+    ids = np.arange(1, 41, dtype=np.int64)
+    prices = rng.uniform(1, 50, len(ids))
+    rows = 600
+    demand_ids = rng.integers(1, 45, rows)  # some ids are no longer in the catalog
+    demand_days = rng.integers(-3, 93, rows)  # and some fall outside the window
+    demand_qty = rng.integers(1, 20, rows).astype(np.float64)
+
+    result = compute_classes(ids, prices, demand_ids, demand_days, demand_qty, 90, bucket_days=7)
+    abc, xyz, mean = dense_classes(ids, prices, demand_ids, demand_days, demand_qty, 90, 7)
+    assert result['abc'].tolist() == abc
+    assert result['xyz'].tolist() == xyz
+    assert np.allclose(result['mean_demand'], mean)
+
+
+def test_buckets_end_on_the_last_day_and_drop_the_partial_one():
+    ids = np.array([1, 2], dtype=np.int64)
+    prices = np.array([1.0, 1.0])
+    # 90 days in 7-day buckets: 12 full buckets over days 6..89, days 0..5 are left over.
+    # Product 1 sells 7 units in every full bucket; product 2 too, plus a burst on day 0.
+    days = np.arange(6, 90, dtype=np.int64)
+    demand_ids = np.concatenate([np.full(len(days), 1), np.full(len(days), 2), [2]]).astype(np.int64)
+    demand_days = np.concatenate([days, days, [0]]).astype(np.int64)
+    demand_qty = np.concatenate([np.ones(len(days)), np.ones(len(days)), [500.0]])
+
+    result = compute_classes(ids, prices, demand_ids, demand_days, demand_qty, 90, bucket_days=7)
+    assert result['mean_demand'].tolist() == [7.0, 7.0]
+    assert result['cv'].tolist() == [0.0, 0.0]
+    assert result['xyz'].tolist() == ['X', 'X']
+    # ABC still values the whole window
+    assert result['value'].tolist() == [84.0, 584.0]
+
+
+def test_empty_buckets_count_as_zero_demand():
+    ids = np.array([1], dtype=np.int64)
+    # 28 units in the last of four weekly buckets only: mean 7, std 7 * sqrt(3)
+    result = compute_classes(ids, np.array([1.0]), np.array([1], dtype=np.int64), np.array([27], dtype=np.int64),
+                             np.array([28.0]), 28, bucket_days=7)
+    assert result['mean_demand'].tolist() == [7.0]
+    assert np.isclose(result['cv'][0], np.sqrt(3))
+    assert result['xyz'].tolist() == ['Z']
+
+
+def test_abc_cut_offs_use_the_share_reached_before_each_product():
+    ids = np.arange(1, 6, dtype=np.int64)
+    prices = np.ones(5)
+    # Value shares 0.7, 0.2, 0.06, 0.04 and nothing for product 5
+    demand_ids = np.array([1, 2, 3, 4], dtype=np.int64)
+    demand_days = np.zeros(4, dtype=np.int64)
+    demand_qty = np.array([70.0, 20.0, 6.0, 4.0])
+
+    result = compute_classes(ids, prices, demand_ids, demand_days, demand_qty, 7, bucket_days=7)
+    # Product 2 starts at 0.7 < 0.8 (A), product 3 at 0.9 (B), product 4 at 0.96 (C)
+    assert result['abc'].tolist() == ['A', 'A', 'B', 'C', 'C']
+    assert result['xyz'][4] == 'Z'
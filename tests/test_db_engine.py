@@ -0,0 +1,53 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from config import Config, BatchConfig
+from db_engine import engine_options, configure_engine, is_statement_timeout
+
+# Counts to ten million: far longer than the 50 ms limit below
+SLOW_QUERY = text('WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 10000000) SELECT count(*) FROM n')
+
+
+def settings(config, url, **overrides):
+    values = {name: getattr(config, name) for name in dir(config) if name.isupper()}
+    values.update(SQLALCHEMY_DATABASE_URI=url, **overrides)
+    return values
+
+
+def test_postgres_gets_server_side_statement_and_lock_timeouts():
+    options = engine_options(settings(Config, 'postgresql://app@db/inventory',
+                                      DB_STATEMENT_TIMEOUT=30000, DB_BUSY_TIMEOUT=5000))
+    assert options['connect_args'] == {'options': '-c statement_timeout=30000 -c lock_timeout=5000'}
+    assert options['pool_pre_ping'] is Config.DB_POOL_PRE_PING
+
+
+def test_postgres_timeout_is_off_for_batch_jobs_and_other_drivers():
+    assert 'connect_args' not in engine_options(settings(Config, 'postgresql://app@db/inventory', DB_STATEMENT_TIMEOUT=0))
+    assert 'connect_args' not in engine_options(settings(Config, 'postgresql+asyncpg://app@db/inventory'))
+    if not BatchConfig.DB_STATEMENT_TIMEOUT:
+        assert 'connect_args' not in engine_options(settings(BatchConfig, 'postgresql://app@db/inventory'))
+
+
+def _sqlite_engine(tmp_path, timeout):
+    config = settings(Config, f'sqlite:///{tmp_path}/timeout.db', DB_STATEMENT_TIMEOUT=timeout)
+    engine = create_engine(config['SQLALCHEMY_DATABASE_URI'], **engine_options(config))
+    configure_engine(engine, config)
+    return engine
+
+
+def test_sqlite_statement_timeout_interrupts_long_statements(tmp_path):
+    engine = _sqlite_engine(tmp_path, 50)
+    with engine.connect() as connection:
+        with pytest.raises(OperationalError) as error:
+            connection.execute(SLOW_QUERY)
+        assert is_statement_timeout(error.value)
+        # The clock is reset: short statements on the same connection still run
+        assert connection.execute(text('SELECT 1')).scalar() == 1
+    engine.dispose()
+
+
+def test_sqlite_without_timeout_runs_to_completion(tmp_path):
+    engine = _sqlite_engine(tmp_path, 0)
+    with engine.connect() as connection:
+        assert connection.execute(SLOW_QUERY).scalar() == 10000000
+    engine.dispose()
@@ -0,0 +1,83 @@
+import queue
+
+import pytest
+from smtp_sink import SMTPSink
+from utils import email_sender
+
+
+@pytest.fixture
+def smtp_sink():
+    sink = SMTPSink()
+    host, port = sink.start()
+    email_sender.configure(server=host, port=port, username='alerts@localhost', password=None, use_tls=False)
+    yield sink
+    # Workers keep their settings for the session; stop them so the next test starts clean
+    email_sender.shutdown()
+    email_sender.configure(username=None)
+    sink.stop()
+
+
+def test_queued_messages_are_delivered(smtp_sink):
+    for i in range(5):
+        assert email_sender.send_email_async(f'Low stock #{i}', f'admin{i}@localhost', 'Stock below threshold')
+    assert email_sender.flush(timeout=10)
+    assert sorted(smtp_sink.recipients) == [f'admin{i}@localhost' for i in range(5)]
+
+
+def test_settings_error_fails_the_message_not_the_worker(smtp_sink, monkeypatch):
+    load_settings = email_sender._load_settings
+    calls = []
+
+    def broken_once():
+        calls.append(1)
+        if len(calls) == 1:
+            raise ValueError("invalid literal for int() with base 10: 'abc'")
+        return load_settings()
+
+    monkeypatch.setattr(email_sender, '_load_settings', broken_once)
+    failed = email_sender.get_stats()['failed']
+    email_sender.send_email_async('Low stock', 'first@localhost', 'body')
+    assert email_sender.flush(timeout=10)
+    assert email_sender.get_stats()['failed'] == failed + 1
+
+    email_sender.send_email_async('Low stock', 'second@localhost', 'body')
+    assert email_sender.flush(timeout=10)
+    assert smtp_sink.recipients == ['second@localhost']
+    assert all(worker.is_alive() for worker in email_sender._workers)
+
+
+def test_dead_workers_are_replaced(smtp_sink):
+    email_sender._ensure_workers()
+    # A stop marker ends one worker while it stays registered, like a thread killed by an error
+    email_sender._queue.put(email_sender._STOP)
+    assert email_sender.flush(timeout=10)
+    for worker in list(email_sender._workers):
+        worker.join(0.5)
+    assert not all(worker.is_alive() for worker in email_sender._workers)
+
+    email_sender.send_email_async('Low stock', 'after@localhost', 'body')
+    assert email_sender.flush(timeout=10)
+    assert smtp_sink.recipients == ['after@localhost']
+    assert len(email_sender._workers) == email_sender.MAIL_WORKERS
+    assert all(worker.is_alive() for worker in email_sender._workers)
+
+
+def test_drop_oldest_never_evicts_a_stop_marker(monkeypatch):
+    # A full queue holding a stop marker from shutdown(); no workers are draining it
+    monkeypatch.setattr(email_sender, '_queue', queue.Queue(maxsize=2))
+    monkeypatch.setattr(email_sender, 'MAIL_QUEUE_POLICY', 'drop_oldest')
+    monkeypatch.setattr(email_sender, '_ensure_workers', lambda: None)
+    email_sender._queue.put(email_sender._STOP)
+    email_sender._queue.put(('Low stock', 'first@localhost', 'body'))
+
+    assert email_sender.send_email_async('Low stock', 'second@localhost', 'body')
+    assert list(email_sender._queue.queue) == [email_sender._STOP, ('Low stock', 'second@localhost', 'body')]
+    assert email_sender._queue.unfinished_tasks == 2
+
+    # Nothing left to evict but stop markers: the new message is the one dropped
+    for _ in range(2):
+        email_sender._queue.get_nowait()
+        email_sender._queue.task_done()
+        email_sender._queue.put(email_sender._STOP)
+    assert not email_sender.send_email_async('Low stock', 'third@localhost', 'body')
+    assert list(email_sender._queue.queue) == [email_sender._STOP, email_sender._STOP]
@@ -0,0 +1,51 @@
+import datetime
+
+import numpy as np
+
+from forecasting import compute_reorder_points, build_reorder_plan
+
+
+def test_idle_product_at_zero_stock_does_not_need_reorder():
+    ids = np.array([1, 2, 3, 4], dtype=np.int64)
+    stock = np.array([0.0, 0.0, 50.0, 0.0])
+    min_threshold = np.array([0.0, 5.0, 0.0, 0.0])
+    # Only product 3 sells: 10 a day for the last 30 days
+    demand_ids = np.full(30, 3, dtype=np.int64)
+    demand_days = np.arange(60, 90, dtype=np.int64)
+    demand_qty = np.full(30, 10.0)
+
+    plan = compute_reorder_points(ids, stock, demand_ids, demand_days, demand_qty, 90, min_threshold=min_threshold)
+    # 1: no demand, no threshold; 2: no demand but a threshold; 3: selling with little cover; 4 as 1
+    assert plan['needs_reorder'].tolist() == [False, True, True, False]
+
+
+def test_min_threshold_is_optional():
+    plan = compute_reorder_points(np.array([1], dtype=np.int64), np.array([0.0]),
+                                  np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0), 30)
+    assert plan['needs_reorder'].tolist() == [False]
+
+
+def test_min_threshold_floors_the_reorder_point():
+    ids = np.array([1, 2], dtype=np.int64)
+    # Both sell 1 a day, so the forecast reorder point is well under 20
+    demand_ids = np.repeat(ids, 30)
+    demand_days = np.tile(np.arange(60, 90, dtype=np.int64), 2)
+    plan = compute_reorder_points(ids, np.array([15.0, 25.0]), demand_ids, demand_days, np.ones(60), 90,
+                                  min_threshold=np.array([20.0, 20.0]))
+    assert (plan['reorder_point'] < 15).all()
+    assert plan['reorder_trigger'].tolist() == [20.0, 20.0]
+    assert plan['needs_reorder'].tolist() == [True, False]
+
+
+def test_demand_window_ends_before_today(client, admin_headers, make_product):
+    product_id = make_product(stock_quantity=100)
+    response = client.post('/api/transactions', json={'product_id': product_id, 'transaction_type': 'out', 'quantity': 30},
+                           headers=admin_headers)
+    assert response.status_code == 201, response.json
+
+    today = datetime.datetime.utcnow().date()
+    with client.application.app_context():
+        for day, expected in ((today, 0.0), (today + datetime.timedelta(days=1), 1.0)):
+            plan = build_reorder_plan(history_days=30, today=day)
+            i = int(np.searchsorted(plan['id'], product_id))
+            assert plan['mean_daily_demand'][i] == expected
@@ -0,0 +1,28 @@
+from models import db, Product, Transaction, InventoryStats
+from inventory_stats import get_stats, reconcile, stats_row_id
+
+
+def test_central_writes_land_on_per_product_shards_and_are_summed(client, admin_headers, make_product):
+    first = make_product(stock_quantity=12, min_stock_threshold=10)
+    second = make_product(stock_quantity=12, min_stock_threshold=10)
+    with client.application.app_context():
+        while stats_row_id(product_id=second) == stats_row_id(product_id=first):
+            second = make_product(stock_quantity=12, min_stock_threshold=10)
+        reconcile()
+        before = dict(db.session.query(InventoryStats.id, InventoryStats.catalog_version))
+
+    for product_id in (first, second):
+        response = client.post('/api/transactions', json={'product_id': product_id, 'transaction_type': 'out',
+                                                          'quantity': 5}, headers=admin_headers)
+        assert response.status_code == 201, response.json
+
+    with client.application.app_context():
+        after = dict(db.session.query(InventoryStats.id, InventoryStats.catalog_version))
+        bumped = {row_id for row_id in after if after[row_id] != before.get(row_id)}
+        # Two sales of different products never wait on the same summary row
+        assert bumped == {stats_row_id(product_id=first), stats_row_id(product_id=second)}
+        stats = get_stats()
+        assert stats['total_products'] == Product.query.count()
+        assert stats['low_stock_count'] == Product.query.filter(
+            Product.stock_quantity <= Product.min_stock_threshold).count()
+        assert stats['recent_tx_count'] == Transaction.query.count()
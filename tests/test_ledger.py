@@ -0,0 +1,53 @@
+def _move(client, headers, product_id, kind, quantity):
+    response = client.post('/api/transactions', json={'product_id': product_id, 'transaction_type': kind, 'quantity': quantity},
+                           headers=headers)
+    assert response.status_code == 201, response.json
+
+
+def _transfer(client, headers, product_id, source, destination, quantity):
+    response = client.post('/api/locations/transfers', json={
+        'product_id': product_id, 'from_location_id': source, 'to_location_id': destination, 'quantity': quantity
+    }, headers=headers)
+    assert response.status_code == 201, response.json
+
+
+def _ledger(client, headers, url):
+    rows, cursor = [], None
+    while True:
+        response = client.get(url + (f'&cursor={cursor}' if cursor else ''), headers=headers)
+        assert response.status_code == 200, response.json
+        rows += response.json['transactions']
+        cursor = response.json['next_cursor']
+        if not cursor:
+            return rows
+
+
+def test_balance_carries_across_pages(client, admin_headers, make_product, make_location):
+    product_id = make_product(stock_quantity=100)
+    store = make_location()
+    _move(client, admin_headers, product_id, 'out', 10)
+    _move(client, admin_headers, product_id, 'in', 25)
+    _transfer(client, admin_headers, product_id, None, store, 30)
+    _move(client, admin_headers, product_id, 'out', 5)
+    _transfer(client, admin_headers, product_id, store, None, 12)
+    _move(client, admin_headers, product_id, 'in', 1)
+
+    rows = _ledger(client, admin_headers, f'/api/products/{product_id}/transactions?limit=2')
+    assert [row['delta'] for row in rows] == [1, 12, -5, -30, 25, -10]
+    assert rows[0]['balance'] == 93
+    for newer, older in zip(rows, rows[1:]):
+        assert older['balance'] == newer['balance'] - newer['delta']
+    # Before the oldest movement: the opening stock
+    assert rows[-1]['balance'] - rows[-1]['delta'] == 100
+
+
+def test_location_ledger_pages_from_the_store_balance(client, admin_headers, make_product, make_location):
+    product_id = make_product(stock_quantity=100)
+    store = make_location()
+    for quantity in (10, 20, 30):
+        _transfer(client, admin_headers, product_id, None, store, quantity)
+    _transfer(client, admin_headers, product_id, store, None, 15)
+
+    rows = _ledger(client, admin_headers, f'/api/products/{product_id}/transactions?location_id={store}&limit=1')
+    assert [row['balance'] for row in rows] == [45, 60, 30, 10]
+    assert [row['type'] for row in rows] == ['transfer_out', 'transfer_in', 'transfer_in', 'transfer_in']
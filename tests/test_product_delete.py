@@ -0,0 +1,48 @@
+import datetime
+
+import pytest
+from models import db, LocationStock, MovementRollup, ProductClassification, StockSnapshot
+from routes.product_routes import PRODUCT_OWNED_TABLES
+
+# One row per product-owned table, for a product and a location
+OWNED_ROWS = {
+    LocationStock: lambda product_id, location_id: LocationStock(location_id=location_id, product_id=product_id, quantity=3),
+    MovementRollup: lambda product_id, location_id: MovementRollup(
+        period='day', bucket=datetime.datetime(2026, 1, 1), product_id=product_id, location_id=0, quantity_out=3, movements=1),
+    ProductClassification: lambda product_id, location_id: ProductClassification(
+        product_id=product_id, abc_class='C', xyz_class='Z', computed_at=datetime.datetime.utcnow()),
+    StockSnapshot: lambda product_id, location_id: StockSnapshot(
+        day=datetime.date(2026, 1, 1), location_id=0, product_id=product_id, quantity=5),
+}
+
+
+@pytest.mark.parametrize('model', PRODUCT_OWNED_TABLES, ids=lambda model: model.__name__)
+def test_deleting_a_product_removes_its_owned_rows(client, admin_headers, make_product, make_location, model):
+    product_id, location_id = make_product(), make_location()
+    if model in OWNED_ROWS:
+        # Tables the write paths fill on their own (replenishment lines) need no extra row
+        with client.application.app_context():
+            db.session.add(OWNED_ROWS[model](product_id, location_id))
+            db.session.commit()
+            assert model.query.filter_by(product_id=product_id).count() == 1
+    response = client.delete(f'/api/products/{product_id}', headers=admin_headers)
+    assert response.status_code == 200, response.json
+    with client.application.app_context():
+        assert model.query.filter_by(product_id=product_id).count() == 0
+
+
+def test_product_with_history_is_not_deleted(client, admin_headers, make_product, make_location):
+    moved = make_product(stock_quantity=10)
+    response = client.post('/api/transactions', json={'product_id': moved, 'transaction_type': 'out', 'quantity': 1},
+                           headers=admin_headers)
+    assert response.status_code == 201, response.json
+    transferred = make_product(stock_quantity=10)
+    response = client.post('/api/locations/transfers', json={'product_id': transferred, 'from_location_id': None,
+                                                            'to_location_id': make_location(), 'quantity': 2},
+                           headers=admin_headers)
+    assert response.status_code == 201, response.json
+
+    for product_id in (moved, transferred):
+        response = client.delete(f'/api/products/{product_id}', headers=admin_headers)
+        assert response.status_code == 409
+        assert client.get(f'/api/products/{product_id}/transactions', headers=admin_headers).status_code == 200
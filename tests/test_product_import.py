@@ -0,0 +1,109 @@
+from sqlalchemy import event, func
+
+import product_import
+from models import db, Product, InventoryStats
+from inventory_stats import reconcile
+from product_import import import_products
+from stock_events import hub, _drain
+
+
+def test_import_publishes_stock_changes(client, admin_headers, make_product):
+    product_id = make_product(stock_quantity=40)
+    with client.application.app_context():
+        sku = db.session.get(Product, product_id).sku
+    q = hub.subscribe()
+    try:
+        body = f'sku,name,stock_quantity\n{sku},,25\n{sku}-NEW,Gadget,7\n'
+        response = client.post('/api/products/import', data=body, content_type='text/csv', headers=admin_headers)
+        events = _drain(q)
+    finally:
+        hub.unsubscribe(q)
+    assert response.status_code == 200, response.json
+    assert (response.json['inserted'], response.json['updated']) == (1, 1)
+    stock = {event['product_id']: event['new_stock'] for event in events}
+    assert stock[product_id] == 25
+    assert 7 in stock.values()
+
+
+def test_invalid_utf8_mid_feed_is_a_row_error(client, admin_headers):
+    good = ''.join(f'U8-{i:05d},Item {i},{i}\n' for i in range(600)).encode('utf-8')
+    body = b'sku,name,stock_quantity\n' + good + b'U8-BAD,Caf\xe9,1\n'
+    response = client.post('/api/products/import', data=body, content_type='text/csv', headers=admin_headers)
+    assert response.status_code == 207
+    assert 'not valid UTF-8' in response.json['errors'][-1]['message']
+    # Rows decoded before the bad byte were still imported
+    assert response.json['inserted'] > 0
+    assert response.json['inserted'] + response.json['failed'] <= 601
+
+
+def test_header_that_is_not_utf8_is_rejected(client, admin_headers):
+    response = client.post('/api/products/import', data=b'sku,n\xe9me\n', content_type='text/csv', headers=admin_headers)
+    assert response.status_code == 400
+
+
+def test_sku_created_concurrently_counts_as_update(app_context, make_product, monkeypatch):
+    product_id = make_product(stock_quantity=50, min_stock_threshold=10)
+    product = db.session.get(Product, product_id)
+    reconcile()
+    select_existing = product_import._select_existing
+    calls = []
+
+    def created_after_select(skus):
+        # The chunk's SELECT misses the product, as if another import inserted it just after
+        calls.append(skus)
+        return {} if len(calls) == 1 else select_existing(skus)
+
+    monkeypatch.setattr(product_import, '_select_existing', created_after_select)
+    report = import_products([(2, {'sku': product.sku, 'name': 'Widget', 'stock_quantity': '5'})])
+
+    assert (report.inserted, report.updated, report.failed) == (0, 1, 0)
+    db.session.expire_all()
+    assert db.session.get(Product, product_id).stock_quantity == 5
+    # Counters are spread over the summary rows; their sums must match the catalog
+    products, low_stock = db.session.query(
+        func.sum(InventoryStats.product_count), func.sum(InventoryStats.low_stock_count)
+    ).one()
+    assert products == Product.query.count()
+    assert low_stock == Product.query.filter(Product.stock_quantity <= Product.min_stock_threshold).count()
+
+
+def test_import_alerts_against_the_stock_it_replaced(app_context, make_product, monkeypatch):
+    product_id = make_product(stock_quantity=100, min_stock_threshold=10)
+    product = db.session.get(Product, product_id)
+    select_existing = product_import._select_existing
+
+    def sale_after_select(skus):
+        # A checkout drops stock to 5 between the chunk's SELECT and its UPDATE
+        rows = select_existing(skus)
+        with db.engine.begin() as connection:
+            connection.execute(db.update(Product).where(Product.id == product_id).values(stock_quantity=5))
+        return rows
+
+    calls = []
+    monkeypatch.setattr(product_import, '_select_existing', sale_after_select)
+    monkeypatch.setattr(product_import, 'record_stock_change', lambda *args: calls.append(args))
+    report = import_products([(2, {'sku': product.sku, 'stock_quantity': '8'})])
+
+    assert (report.updated, report.failed) == (1, 0)
+    # Already low before the import: old stock is 5, not the 100 the SELECT saw
+    assert calls == [(product_id, 'Widget', product.sku, 5, 8, 10, 10)]
+
+
+def test_stock_refresh_costs_statements_per_chunk_not_per_row(app_context, make_product):
+    skus = [db.session.get(Product, make_product(stock_quantity=50)).sku for _ in range(20)]
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        report = import_products([(n, {'sku': sku, 'stock_quantity': str(n)}) for n, sku in enumerate(skus, start=2)])
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+
+    assert (report.updated, report.failed) == (20, 0)
+    assert len(statements) < 20
+    db.session.expire_all()
+    assert [db.session.execute(db.select(Product.stock_quantity).filter_by(sku=sku)).scalar() for sku in skus] == \
+        list(range(2, 22))
@@ -0,0 +1,40 @@
+from models import db, Product
+from search_index import word_similarity
+
+
+def _page_through(client, headers, url):
+    ids, cursor = [], None
+    while True:
+        response = client.get(url + (f'&cursor={cursor}' if cursor else ''), headers=headers)
+        assert response.status_code == 200, response.json
+        ids += [p['id'] for p in response.json['products']]
+        cursor = response.json['next_cursor']
+        if not cursor:
+            return ids
+
+
+def test_keyset_on_stock_keeps_rows_without_stock(client, admin_headers, make_product):
+    ids = [make_product(category='NullStock', stock_quantity=stock) for stock in (5, 0, 3, 0, 8)]
+    with client.application.app_context():
+        # Rows from before stock_quantity had a default
+        db.session.execute(db.update(Product).where(Product.id.in_(ids[:2])).values(stock_quantity=None))
+        db.session.commit()
+    for order in ('asc', 'desc'):
+        seen = _page_through(client, admin_headers, f'/api/products?category=NullStock&sort=stock_quantity&order={order}&limit=2')
+        assert sorted(seen) == sorted(ids)
+
+
+def test_fuzzy_match_tolerates_typos(client, admin_headers, make_product):
+    widget = make_product(name='Sprocket Widget', category='Fuzzy')
+    make_product(name='Gasket Seal', category='Fuzzy')
+    response = client.get('/api/products?q=sprockt&match=fuzzy&category=Fuzzy', headers=admin_headers)
+    assert [p['id'] for p in response.json['products']] == [widget]
+    response = client.get('/api/products?q=sprockt&category=Fuzzy', headers=admin_headers)
+    assert response.json['products'] == []
+
+
+def test_word_similarity():
+    assert word_similarity('widgt', 'Blue Widget') > 0.4
+    assert word_similarity('widget', 'Blue Widget') == 1.0
+    assert word_similarity('gasket', 'Blue Widget') < 0.3
+    assert word_similarity('widget', None) == 0.0
@@ -0,0 +1,41 @@
+from models import db, ReplenishmentLine
+from replenishment import run_replenishment, refresh_stale
+
+
+def _line(client, product_id):
+    with client.application.app_context():
+        return db.session.get(ReplenishmentLine, product_id)
+
+
+def _plan(client, headers):
+    response = client.get('/api/reports/replenishment?limit=500', headers=headers)
+    assert response.status_code == 200, response.json
+    return response.json
+
+
+def test_new_and_changed_products_are_replanned_on_read(client, admin_headers, make_product):
+    with client.application.app_context():
+        run_replenishment()
+    # Created after the full run: planned by the next read, not the next nightly run
+    product_id = make_product(stock_quantity=2, min_stock_threshold=20, supplier='Acme Replenish')
+    assert _line(client, product_id).stale
+
+    plan = _plan(client, admin_headers)
+    assert plan['refreshed'] >= 1
+    line = _line(client, product_id)
+    assert not line.stale and line.stock == 2 and line.order_quantity > 0
+    order = next(o for o in plan['purchase_orders'] if o['supplier'] == 'Acme Replenish')
+    assert product_id in [l['product_id'] for l in order['lines']]
+
+    # A movement marks the line stale again; the next read picks up the new stock
+    client.post('/api/transactions', json={'product_id': product_id, 'transaction_type': 'in', 'quantity': 500},
+                headers=admin_headers)
+    assert _line(client, product_id).stale
+    _plan(client, admin_headers)
+    line = _line(client, product_id)
+    assert not line.stale and line.stock == 502 and line.order_quantity == 0
+
+
+def test_nothing_stale_is_a_no_op(app_context):
+    refresh_stale()
+    assert refresh_stale() == 0
@@ -0,0 +1,43 @@
+import datetime
+
+import inventory_stats
+from models import db, Product, InventoryStats
+from inventory_stats import STATS_ID, record_changes
+from response_cache import cached_json
+
+
+def test_revalidation_still_runs_the_periodic_reconcile(client, admin_headers, make_product):
+    make_product()
+    first = client.get('/api/reports/stats', headers=admin_headers)
+    assert first.status_code == 200
+    with client.application.app_context():
+        # Drifted counters whose last recount is overdue
+        row = db.session.get(InventoryStats, STATS_ID)
+        row.product_count = 999999
+        row.reconciled_at = datetime.datetime.utcnow() - datetime.timedelta(days=30)
+        db.session.commit()
+        actual = Product.query.count()
+    inventory_stats._next_check = 0.0
+
+    second = client.get('/api/reports/stats', headers={**admin_headers, 'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 200
+    assert second.headers['ETag'] != first.headers['ETag']
+    assert second.json['total_products'] == actual
+
+
+def test_body_built_across_a_version_bump_is_not_cached(app):
+    builds = []
+
+    def build():
+        builds.append(1)
+        if len(builds) == 1:
+            # A write commits while the body is being built
+            record_changes()
+            db.session.commit()
+        return {'builds': len(builds)}
+
+    for expected in (1, 2, 2):
+        with app.test_request_context('/api/test-cache'):
+            response = cached_json(build)
+            assert response.get_json() == {'builds': expected}
+    assert len(builds) == 2
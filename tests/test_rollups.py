@@ -0,0 +1,38 @@
+import datetime
+
+from sqlalchemy import select, func
+from models import db, MovementRollup
+from rollups import rebuild
+
+
+def _totals(product_id):
+    return db.session.execute(
+        select(func.sum(MovementRollup.quantity_out), func.sum(MovementRollup.movements))
+        .filter_by(product_id=product_id, period='day')
+    ).one()
+
+
+def test_rebuild_in_small_batches_matches_live_rollups(client, admin_headers, make_product):
+    product_id = make_product(stock_quantity=500)
+    for quantity in (3, 4, 5, 6, 7):
+        response = client.post('/api/transactions', json={'product_id': product_id, 'quantity': quantity, 'transaction_type': 'out'},
+                               headers=admin_headers)
+        assert response.status_code == 201, response.json
+    with client.application.app_context():
+        live = _totals(product_id)
+        assert tuple(live) == (25, 5)
+        read = rebuild(batch_size=2)
+        assert read >= 5
+        assert _totals(product_id) == live
+
+
+def test_default_end_is_the_end_of_the_current_period(client, admin_headers):
+    now = datetime.datetime.utcnow()
+    response = client.get('/api/reports/top-movers?period=hour', headers=admin_headers)
+    assert response.status_code == 200
+    end = datetime.datetime.fromisoformat(response.json['end'])
+    assert now < end <= now + datetime.timedelta(hours=1)
+    assert (end.minute, end.second, end.microsecond) == (0, 0, 0)
+    # Same period, same cache entry
+    again = client.get('/api/reports/top-movers?period=hour', headers=admin_headers)
+    assert again.headers['ETag'] == response.headers['ETag']
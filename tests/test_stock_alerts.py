@@ -0,0 +1,59 @@
+import alerts
+from models import db, Product
+from stock_service import set_stock
+
+
+def test_raising_the_threshold_above_stock_alerts(client, admin_headers, make_product):
+    product_id = make_product(stock_quantity=40, min_stock_threshold=10)
+    response = client.put(f'/api/products/{product_id}', json={'min_stock_threshold': 50}, headers=admin_headers)
+    assert response.status_code == 200
+    assert product_id in alerts._pending
+    # Back under the stock level: the pending alert is withdrawn
+    client.put(f'/api/products/{product_id}', json={'min_stock_threshold': 5}, headers=admin_headers)
+    assert product_id not in alerts._pending
+
+
+def test_threshold_change_on_already_low_product_does_not_alert(client, admin_headers, make_product):
+    product_id = make_product(stock_quantity=5, min_stock_threshold=10)
+    alerts._pending.pop(product_id, None)
+    client.put(f'/api/products/{product_id}', json={'min_stock_threshold': 20}, headers=admin_headers)
+    assert product_id not in alerts._pending
+
+
+def test_set_stock_returns_the_level_it_replaced(app_context, make_product):
+    product_id = make_product(stock_quantity=100)
+    product = db.session.get(Product, product_id)
+    assert product.stock_quantity == 100
+    # Another worker sells most of it after this session loaded the product
+    with db.engine.begin() as connection:
+        connection.execute(db.update(Product).where(Product.id == product_id).values(stock_quantity=5))
+
+    assert set_stock(product_id, 50) == (5, 50)
+    db.session.commit()
+
+
+def test_stock_edit_reports_old_and_new_levels(client, admin_headers, make_product, monkeypatch):
+    product_id = make_product(stock_quantity=100, min_stock_threshold=10)
+    calls = []
+    monkeypatch.setattr('routes.product_routes.record_stock_change', lambda *args: calls.append(args))
+    client.put(f'/api/products/{product_id}', json={'stock_quantity': 8}, headers=admin_headers)
+    assert calls == [(product_id, 'Widget', calls[0][2], 100, 8, 10, 10)]
+
+
+def test_null_stock_or_threshold_never_alerts(client, admin_headers, make_product):
+    product_id = make_product(stock_quantity=None, min_stock_threshold=10)
+    response = client.put(f'/api/products/{product_id}', json={'min_stock_threshold': 50}, headers=admin_headers)
+    assert response.status_code == 200
+    assert product_id not in alerts._pending
+
+    product_id = make_product(stock_quantity=5, min_stock_threshold=10)
+    response = client.put(f'/api/products/{product_id}', json={'min_stock_threshold': None}, headers=admin_headers)
+    assert response.status_code == 200
+    assert product_id not in alerts._pending
+
+
+def test_setting_a_threshold_where_there_was_none_alerts(client, admin_headers, make_product):
+    product_id = make_product(stock_quantity=5, min_stock_threshold=None)
+    response = client.put(f'/api/products/{product_id}', json={'min_stock_threshold': 10}, headers=admin_headers)
+    assert response.status_code == 200
+    assert product_id in alerts._pending
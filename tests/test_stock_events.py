@@ -0,0 +1,50 @@
+import threading
+
+from config import Config
+from stock_events import StockHub, RESYNC, _drain
+
+
+def test_overflow_replaces_backlog_with_resync():
+    hub = StockHub(queue_size=3)
+    q = hub.subscribe()
+    for product_id in range(5):
+        hub.publish({'product_id': product_id, 'new_stock': 1})
+    events = _drain(q)
+    assert RESYNC in events
+    assert len(events) <= 3
+    assert hub.stats()['overflows'] >= 1
+
+
+def test_concurrent_overflows_are_counted_and_never_raise():
+    hub = StockHub(queue_size=2)
+    q = hub.subscribe()
+    errors = []
+
+    def publisher():
+        try:
+            for i in range(500):
+                hub.publish({'product_id': i, 'new_stock': i})
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=publisher) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    stats = hub.stats()
+    assert stats['published'] == 4000
+    assert stats['overflows'] > 0
+    assert len(_drain(q)) <= 2
+
+
+def test_thread_bound_workers_keep_threads_for_the_api():
+    if Config.SERVER_WORKER_CLASS == 'gthread':
+        assert Config.STREAM_MAX_SUBSCRIBERS < Config.SERVER_THREADS
+    hub = StockHub(max_subscribers=2)
+    first, second = hub.subscribe(), hub.subscribe()
+    # Past the cap the route answers 503 and the client polls instead
+    assert hub.subscribe() is None
+    hub.unsubscribe(first)
+    assert hub.subscribe() is not None
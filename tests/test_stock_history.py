@@ -0,0 +1,46 @@
+import datetime
+import time
+
+from models import db, StockSnapshot
+from stock_history import stock_at, take_snapshot
+
+
+def _move(client, headers, product_id, kind, quantity):
+    response = client.post('/api/transactions', json={'product_id': product_id, 'transaction_type': kind, 'quantity': quantity},
+                           headers=headers)
+    assert response.status_code == 201, response.json
+
+
+def _history(client, admin_headers, make_product):
+    # 100 opening stock (not in the ledger), -30 before `mid`, -11 after it
+    product_id = make_product(stock_quantity=100)
+    _move(client, admin_headers, product_id, 'out', 30)
+    time.sleep(0.01)
+    mid = datetime.datetime.utcnow()
+    time.sleep(0.01)
+    _move(client, admin_headers, product_id, 'out', 11)
+    return product_id, mid
+
+
+def test_stock_at_without_snapshot_counts_back_from_current_stock(client, admin_headers, make_product):
+    with client.application.app_context():
+        db.session.query(StockSnapshot).delete()
+        db.session.commit()
+    product_id, mid = _history(client, admin_headers, make_product)
+    with client.application.app_context():
+        day, items = stock_at(mid, product_ids=[product_id])
+    assert day is None
+    assert items[0]['quantity'] == 70
+
+
+def test_stock_at_with_snapshot_replays_from_it(client, admin_headers, make_product):
+    product_id, mid = _history(client, admin_headers, make_product)
+    with client.application.app_context():
+        take_snapshot()
+        day, items = stock_at(mid, product_ids=[product_id])
+    assert day == datetime.datetime.utcnow().date()
+    assert items[0]['quantity'] == 70
+
+    response = client.get(f'/api/reports/stock-at?ts={mid.isoformat()}&product_id={product_id}', headers=admin_headers)
+    assert response.json['snapshot_day'] == day.isoformat()
+    assert response.json['items'][0]['quantity'] == 70
@@ -0,0 +1,109 @@
+import datetime
+import json
+
+from models import db, Product
+from stock_history import take_snapshot
+
+
+def _bulk(client, headers, items, query=''):
+    return client.post(f'/api/transactions/bulk{query}', json=items, headers=headers)
+
+
+def _stock(client, product_id):
+    with client.application.app_context():
+        return db.session.get(Product, product_id).stock_quantity
+
+
+def test_mixed_batch_reports_every_item(client, admin_headers, make_product):
+    product_id = make_product(stock_quantity=20)
+    response = _bulk(client, admin_headers, [
+        {'product_id': product_id, 'transaction_type': 'out', 'quantity': 4},
+        {'product_id': 999999, 'transaction_type': 'out', 'quantity': 1},
+        {'product_id': product_id, 'transaction_type': 'sideways', 'quantity': 1},
+        {'product_id': product_id, 'transaction_type': 'in'},
+        {'product_id': product_id, 'transaction_type': 'in', 'quantity': 10},
+    ])
+    assert response.status_code == 207
+    assert (response.json['recorded'], response.json['failed']) == (2, 3)
+    assert response.json['results'] == [
+        {'index': 0, 'status': 'ok', 'new_stock': 16},
+        {'index': 1, 'status': 'error', 'message': 'Product not found'},
+        {'index': 2, 'status': 'error', 'message': 'Invalid transaction type'},
+        {'index': 3, 'status': 'error', 'message': 'Missing fields'},
+        {'index': 4, 'status': 'ok', 'new_stock': 26},
+    ]
+    assert _stock(client, product_id) == 26
+
+
+def test_insufficient_stock_fails_only_that_item(client, admin_headers, make_product):
+    product_id = make_product(stock_quantity=5)
+    response = _bulk(client, admin_headers, [
+        {'product_id': product_id, 'transaction_type': 'out', 'quantity': 3},
+        {'product_id': product_id, 'transaction_type': 'out', 'quantity': 3},
+        {'product_id': product_id, 'transaction_type': 'out', 'quantity': 2},
+    ])
+    assert response.status_code == 207
+    assert [r['status'] for r in response.json['results']] == ['ok', 'error', 'ok']
+    assert response.json['results'][1]['message'] == 'Insufficient stock'
+    assert _stock(client, product_id) == 0
+
+
+def test_malformed_ndjson_line_keeps_its_index(client, admin_headers, make_product):
+    product_id = make_product(stock_quantity=10)
+    line = json.dumps({'product_id': product_id, 'transaction_type': 'out', 'quantity': 1})
+    body = f'{line}\n{{"product_id": \n\n{line}\n'
+    response = client.post('/api/transactions/bulk', data=body, content_type='application/x-ndjson',
+                           headers=admin_headers)
+    assert response.status_code == 207
+    assert [(r['index'], r['status']) for r in response.json['results']] == [(0, 'ok'), (1, 'error'), (2, 'ok')]
+    assert response.json['results'][1]['message'] == 'Malformed item'
+
+
+def test_failed_chunk_rolls_back_and_hides_the_database_error(client, admin_headers, make_product, monkeypatch):
+    product_id = make_product(stock_quantity=10)
+    calls = []
+
+    def fail_first_chunk(rows):
+        calls.append(rows)
+        if len(calls) == 1:
+            raise RuntimeError('UNIQUE constraint failed: secret_table.column')
+
+    monkeypatch.setattr('routes.transaction_routes.record_movements', fail_first_chunk)
+    item = {'product_id': product_id, 'transaction_type': 'out', 'quantity': 1}
+    response = _bulk(client, admin_headers, [item] * 3, query='?chunk_size=2')
+
+    assert response.status_code == 207
+    results = response.json['results']
+    assert [r['status'] for r in results] == ['error', 'error', 'ok']
+    assert 'secret_table' not in json.dumps(results)
+    # Only the second chunk's movement was kept
+    assert _stock(client, product_id) == 9
+
+
+def test_chunk_size_must_be_a_positive_number(client, admin_headers, make_product):
+    product_id = make_product()
+    item = {'product_id': product_id, 'transaction_type': 'in', 'quantity': 1}
+    for value in ('0', '-3', 'abc'):
+        response = _bulk(client, admin_headers, [item], query=f'?chunk_size={value}')
+        assert response.status_code == 400, value
+    assert _stock(client, product_id) == 100
+
+
+def test_timestamps_in_the_future_or_before_the_latest_snapshot_are_refused(client, admin_headers, make_product):
+    product_id = make_product(stock_quantity=10)
+    today = datetime.datetime.utcnow().date()
+    with client.application.app_context():
+        take_snapshot(today)
+    now = datetime.datetime.utcnow()
+    item = {'product_id': product_id, 'transaction_type': 'out', 'quantity': 1}
+    response = _bulk(client, admin_headers, [
+        dict(item, timestamp=(now + datetime.timedelta(hours=1)).isoformat()),
+        dict(item, timestamp=(now - datetime.timedelta(days=1)).isoformat()),
+        dict(item, timestamp=now.isoformat() + '+00:00'),
+    ])
+    assert response.status_code == 207
+    results = response.json['results']
+    assert results[0]['message'] == 'Timestamp is in the future'
+    assert results[1]['message'] == f'Timestamp is before the latest stock snapshot ({today.isoformat()})'
+    assert results[2]['status'] == 'ok'
+    assert _stock(client, product_id) == 9
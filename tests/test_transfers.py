@@ -0,0 +1,65 @@
+import location_stock
+from models import db, Product, LocationStock, User
+
+
+def _record_writes(monkeypatch):
+    # The order in which transfer_stock touches (and so locks) the stock rows
+    writes = []
+    adjust_stock, adjust_location_stock = location_stock.adjust_stock, location_stock.adjust_location_stock
+
+    def central(product_id, delta):
+        writes.append(None)
+        return adjust_stock(product_id, delta)
+
+    def store(location_id, product_id, delta):
+        writes.append(location_id)
+        return adjust_location_stock(location_id, product_id, delta)
+
+    monkeypatch.setattr(location_stock, 'adjust_stock', central)
+    monkeypatch.setattr(location_stock, 'adjust_location_stock', store)
+    return writes
+
+
+def test_rows_are_locked_central_first_then_by_location_id(app_context, make_product, make_location, monkeypatch):
+    product = db.session.get(Product, make_product(stock_quantity=100))
+    low, high = sorted((make_location(), make_location()))
+    admin = User.query.filter_by(username='admin').one().id
+    writes = _record_writes(monkeypatch)
+
+    location_stock.transfer_stock(product, None, high, 40, admin)
+    location_stock.transfer_stock(product, high, low, 15, admin)
+    location_stock.transfer_stock(product, low, high, 5, admin)
+    location_stock.transfer_stock(product, high, None, 10, admin)
+    db.session.commit()
+
+    # Same order whichever way the stock moves, so opposite transfers can't deadlock
+    assert writes == [None, high, low, high, low, high, None, high]
+    levels = dict(db.session.query(LocationStock.location_id, LocationStock.quantity).filter_by(product_id=product.id))
+    assert levels == {low: 10, high: 20}
+    assert db.session.get(Product, product.id).stock_quantity == 70
+
+
+def test_failed_leg_rolls_back_the_whole_transfer(client, admin_headers, make_product, make_location):
+    product_id = make_product(stock_quantity=100)
+    low, high = sorted((make_location(), make_location()))
+    client.post('/api/locations/transfers', json={'product_id': product_id, 'from_location_id': None,
+                                                 'to_location_id': low, 'quantity': 5}, headers=admin_headers)
+    # The destination leg (low) is written first; the source leg (high) has nothing to give
+    response = client.post('/api/locations/transfers', json={'product_id': product_id, 'from_location_id': high,
+                                                            'to_location_id': low, 'quantity': 3}, headers=admin_headers)
+    assert response.status_code == 400
+    with client.application.app_context():
+        levels = dict(db.session.query(LocationStock.location_id, LocationStock.quantity).filter_by(product_id=product_id))
+    assert levels == {low: 5}
+
+
+def test_stock_without_any_threshold_is_not_low(client, admin_headers, make_product, make_location):
+    product_id = make_product(stock_quantity=100, min_stock_threshold=None)
+    location_id = make_location()
+    response = client.post('/api/locations/transfers', json={'product_id': product_id, 'from_location_id': None,
+                                                            'to_location_id': location_id, 'quantity': 5}, headers=admin_headers)
+    assert response.status_code == 201, response.json
+    response = client.get(f'/api/locations/{location_id}/stock', headers=admin_headers)
+    assert response.status_code == 200, response.json
+    assert response.json['items'] == [{'product_id': product_id, 'sku': response.json['items'][0]['sku'], 'name': 'Widget',
+                                       'quantity': 5, 'min_stock_threshold': None, 'is_low': False}]
@@ -1,27 +1,89 @@
-from flask import Blueprint, request, jsonify
-from models import db, Transaction, Product, User
+from flask import Blueprint, request, jsonify, current_app
+from sqlalchemy import tuple_, insert
+from sqlalchemy.orm import joinedload
+from models import db, Transaction, Product, User, Location
+from pagination import parse_limit, encode_cursor, decode_cursor, parse_datetime
+from stock_service import adjust_stock, InsufficientStockError
+from location_stock import adjust_location_stock
 from routes.auth_routes import token_required
-from utils.email_sender import send_email_async
+from alerts import record_stock_change
+from stock_events import publish_stock
+from inventory_stats import record_changes, low_stock_delta
+from replenishment import mark_stale
+from rollups import record_movements
+import datetime
+import json
 
 transaction_bp = Blueprint('transactions', __name__)
 
+# POS clocks may run slightly ahead of the server; later bulk timestamps are rejected
+BULK_CLOCK_SKEW = datetime.timedelta(minutes=5)
+
 @transaction_bp.route('', methods=['GET'])
 @token_required
 def get_transactions(current_user):
-    transactions = Transaction.query.order_by(Transaction.timestamp.desc()).all()
+    # Keyset pagination on (timestamp, id) so deep pages cost the same as the first one
+    try:
+        limit = parse_limit(request.args)
+        query = _filtered_transactions(request.args)
+        cursor = request.args.get('cursor')
+        if cursor:
+            ts, tx_id = decode_cursor(cursor)
+            query = query.filter(
+                tuple_(Transaction.timestamp, Transaction.id) < tuple_(parse_datetime(ts), int(tx_id))
+            )
+    except (ValueError, TypeError):
+        return jsonify({'message': 'Invalid query parameters'}), 400
+
+    transactions = (
+        query.options(joinedload(Transaction.product), joinedload(Transaction.user))
+        .order_by(Transaction.timestamp.desc(), Transaction.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(transactions) > limit
+    transactions = transactions[:limit]
+
     output = []
     for t in transactions:
         t_data = {
             'id': t.id,
+            'product_id': t.product_id,
             'product_name': t.product.name,
             'product_sku': t.product.sku,
             'quantity': t.quantity,
             'transaction_type': t.transaction_type,
             'timestamp': t.timestamp.isoformat(),
-            'user': t.user.username
+            'user': t.user.username,
+            'location_id': t.location_id
         }
         output.append(t_data)
-    return jsonify({'transactions': output})
+
+    next_cursor = None
+    if has_more:
+        last = transactions[-1]
+        next_cursor = encode_cursor(last.timestamp, last.id)
+    return jsonify({'transactions': output, 'next_cursor': next_cursor})
+
+def _filtered_transactions(args):
+    query = Transaction.query
+    if args.get('product_id'):
+        query = query.filter(Transaction.product_id == int(args['product_id']))
+    if args.get('user_id'):
+        query = query.filter(Transaction.user_id == int(args['user_id']))
+    if args.get('location_id'):
+        # 'central' selects movements of the central stock only
+        location = None if args['location_id'] == 'central' else int(args['location_id'])
+        query = query.filter(Transaction.location_id == location)
+    if args.get('type'):
+        if args['type'] not in ('in', 'out'):
+            raise ValueError('type must be in or out')
+        query = query.filter(Transaction.transaction_type == args['type'])
+    if args.get('start'):
+        query = query.filter(Transaction.timestamp >= parse_datetime(args['start']))
+    if args.get('end'):
+        query = query.filter(Transaction.timestamp < parse_datetime(args['end']))
+    return query
 
 @transaction_bp.route('/', methods=['POST'])
 @transaction_bp.route('', methods=['POST'])
@@ -36,15 +98,34 @@ def create_transaction():
     if not product:
         return jsonify({'message': 'Product not found'}), 404
         
-    qty = int(data['quantity'])
-    
-    if data['transaction_type'] == 'out':
-        if product.stock_quantity < qty:
-            return jsonify({'message': 'Insufficient stock'}), 400
-        product.stock_quantity -= qty
-    elif data['transaction_type'] == 'in':
-        product.stock_quantity += qty
-        
+    try:
+        qty = int(data['quantity'])
+    except (ValueError, TypeError):
+        return jsonify({'message': 'Invalid quantity'}), 400
+    if qty <= 0 or data['transaction_type'] not in ('in', 'out'):
+        return jsonify({'message': 'Invalid transaction'}), 400
+
+    # Optional store scope; without it the movement hits the central stock as before
+    location_id = data.get('location_id')
+    if location_id is not None:
+        try:
+            location_id = int(location_id)
+        except (ValueError, TypeError):
+            return jsonify({'message': 'Invalid location'}), 400
+        if db.session.get(Location, location_id) is None:
+            return jsonify({'message': 'Location not found'}), 404
+
+    # Check-and-write happens in a single conditional UPDATE, so concurrent checkouts can't oversell
+    delta = -qty if data['transaction_type'] == 'out' else qty
+    try:
+        if location_id is None:
+            new_stock = adjust_stock(product.id, delta)
+        else:
+            new_stock = adjust_location_stock(location_id, product.id, delta)
+    except InsufficientStockError:
+        db.session.rollback()
+        return jsonify({'message': 'Insufficient stock'}), 400
+
     # Create Record
     # Use the first admin user as the actor if auth context is missing
     # In a real app, use current_user.id from token
@@ -55,30 +136,230 @@ def create_transaction():
         product_id=product.id,
         transaction_type=data['transaction_type'],
         quantity=qty,
-        user_id=actor_id
+        user_id=actor_id,
+        timestamp=datetime.datetime.utcnow(),
+        location_id=location_id
     )
     
+    alert_info = (product.id, product.name, product.sku)
+    threshold = product.min_stock_threshold
     db.session.add(new_tx)
+    record_movements([(product.id, new_tx.timestamp, new_tx.transaction_type, qty, product.price, location_id)])
+    if location_id is None:
+        mark_stale([product.id])
+        record_changes(
+            low_stock=low_stock_delta(new_stock - delta, threshold, new_stock, threshold),
+            transactions=1,
+            product_id=product.id
+        )
+    else:
+        # Only this location's summary shard is written, never a central row
+        record_changes(transactions=1, location_id=location_id)
+    # The summary row is locked last, so it is held only for the commit
     db.session.commit()
 
-    # CHECK LOW STOCK ALERT
-    if data['transaction_type'] == 'out' and product.stock_quantity <= product.min_stock_threshold:
-        # Find admins
-        admins = User.query.filter_by(role='admin').all()
-        for admin in admins:
-            if admin.email:
-                subject = f"URGENT: Low Stock Report - {product.name}"
-                body = (
-                    f"LOW STOCK REPORT\n"
-                    f"--------------------------------------------------\n"
-                    f"Product Name : {product.name}\n"
-                    f"SKU          : {product.sku}\n"
-                    f"Current Stock: {product.stock_quantity} (Below Limit)\n"
-                    f"Min Threshold: {product.min_stock_threshold}\n"
-                    f"--------------------------------------------------\n\n"
-                    f"STATUS: CRITICAL ACTION REQUIRED\n"
-                    f"Immediate action is required to restock this item and prevent stock-outs.\n"
+    publish_stock(alert_info[0], new_stock, location_id)
+
+    # CHECK LOW STOCK ALERT (only fires when this movement crosses the threshold)
+    if location_id is None:
+        record_stock_change(*alert_info, new_stock - delta, new_stock, threshold)
+
+    return jsonify({'message': 'Transaction recorded', 'new_stock': new_stock}), 201
+
+@transaction_bp.route('/bulk', methods=['POST'])
+@token_required
+def create_transactions_bulk(current_user):
+    # Accepts a JSON array, {"transactions": [...]}, or an NDJSON stream (one movement per line)
+    try:
+        items = _read_bulk_items()
+        chunk_size = int(request.args.get('chunk_size') or current_app.config['TRANSACTION_BULK_CHUNK_SIZE'])
+        if chunk_size < 1:
+            raise ValueError('chunk_size must be positive')
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    results = []
+    chunk = []
+    for index, item in enumerate(items):
+        chunk.append((index, item))
+        if len(chunk) >= chunk_size:
+            _apply_bulk_chunk(chunk, current_user.id, results)
+            chunk = []
+    if chunk:
+        _apply_bulk_chunk(chunk, current_user.id, results)
+
+    recorded = sum(1 for r in results if r['status'] == 'ok')
+    return jsonify({
+        'message': f'{recorded} of {len(results)} transactions recorded',
+        'recorded': recorded,
+        'failed': len(results) - recorded,
+        'results': results
+    }), 207 if recorded != len(results) else 201
+
+def _read_bulk_items():
+    if 'ndjson' in (request.content_type or ''):
+        return _iter_ndjson(request.stream)
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('transactions')
+    if not isinstance(data, list):
+        raise ValueError('Expected a JSON array of transactions')
+    return data
+
+def _iter_ndjson(stream):
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            # Keep the line's slot so per-item results stay aligned with the input
+            yield None
+
+def _validate_bulk_item(item):
+    if not isinstance(item, dict):
+        return 'Malformed item'
+    if not item.get('product_id') or not item.get('transaction_type') or not item.get('quantity'):
+        return 'Missing fields'
+    if item['transaction_type'] not in ('in', 'out'):
+        return 'Invalid transaction type'
+    try:
+        if int(item['quantity']) <= 0:
+            return 'Quantity must be positive'
+        int(item['product_id'])
+        if item.get('location_id') is not None:
+            int(item['location_id'])
+        if item.get('timestamp'):
+            _item_timestamp(item)
+    except (ValueError, TypeError):
+        return 'Invalid number or timestamp'
+    return None
+
+def _item_timestamp(item):
+    # Naive UTC, like the rest of the ledger; offsets such as 'Z' or '+05:30' are converted
+    ts = parse_datetime(item['timestamp'])
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return ts
+
+def _timestamp_error(ts, now, snapshot_day):
+    """
+    A backdated movement from before the latest stock snapshot would be missing from
+    that snapshot and skew every point-in-time read after it, so it is refused;
+    so is one from the future.
+    """
+    if ts > now + BULK_CLOCK_SKEW:
+        return 'Timestamp is in the future'
+    if snapshot_day is not None and ts < datetime.datetime.combine(snapshot_day, datetime.time.min):
+        return f'Timestamp is before the latest stock snapshot ({snapshot_day.isoformat()})'
+    return None
+
+def _apply_bulk_chunk(chunk, actor_id, results):
+    # Validate the whole chunk up front and resolve its products with a single query
+    errors = {index: _validate_bulk_item(item) for index, item in chunk}
+    product_ids = {int(item['product_id']) for index, item in chunk if not errors[index]}
+    products = {}
+    if product_ids:
+        rows = db.session.query(
+            Product.id, Product.name, Product.sku, Product.min_stock_threshold, Product.price
+        ).filter(Product.id.in_(product_ids)).all()
+        products = {row.id: row for row in rows}
+    location_ids = {
+        int(item['location_id']) for index, item in chunk if not errors[index] and item.get('location_id') is not None
+    }
+    if location_ids:
+        location_ids = {row[0] for row in db.session.query(Location.id).filter(Location.id.in_(location_ids))}
+
+    chunk_results = []
+    new_rows = []
+    stock_changes = []
+    # Rows without a timestamp get the same one in the ledger and the rollups
+    now = datetime.datetime.utcnow()
+    snapshot_day = None
+    if any(not errors[index] and item.get('timestamp') for index, item in chunk):
+        # Imported on use: stock_history pulls in numpy
+        from stock_history import latest_snapshot_day
+        snapshot_day = latest_snapshot_day(db.session.connection())
+    try:
+        for index, item in chunk:
+            if errors[index]:
+                chunk_results.append({'index': index, 'status': 'error', 'message': errors[index]})
+                continue
+            product = products.get(int(item['product_id']))
+            if not product:
+                chunk_results.append({'index': index, 'status': 'error', 'message': 'Product not found'})
+                continue
+
+            location_id = int(item['location_id']) if item.get('location_id') is not None else None
+            if location_id is not None and location_id not in location_ids:
+                chunk_results.append({'index': index, 'status': 'error', 'message': 'Location not found'})
+                continue
+            timestamp = _item_timestamp(item) if item.get('timestamp') else now
+            error = _timestamp_error(timestamp, now, snapshot_day)
+            if error:
+                chunk_results.append({'index': index, 'status': 'error', 'message': error})
+                continue
+
+            qty = int(item['quantity'])
+            delta = -qty if item['transaction_type'] == 'out' else qty
+            try:
+                if location_id is None:
+                    new_stock = adjust_stock(product.id, delta)
+                else:
+                    new_stock = adjust_location_stock(location_id, product.id, delta)
+            except InsufficientStockError:
+                chunk_results.append({'index': index, 'status': 'error', 'message': 'Insufficient stock'})
+                continue
+
+            row = {
+                'product_id': product.id,
+                'transaction_type': item['transaction_type'],
+                'quantity': qty,
+                'user_id': actor_id,
+                'timestamp': timestamp,
+                'location_id': location_id
+            }
+            new_rows.append(row)
+            chunk_results.append({'index': index, 'status': 'ok', 'new_stock': new_stock})
+            stock_changes.append((product, new_stock - delta, new_stock, location_id))
+
+        if new_rows:
+            db.session.execute(insert(Transaction), new_rows)
+            mark_stale(row['product_id'] for row in new_rows if row['location_id'] is None)
+            record_movements([
+                (row['product_id'], row['timestamp'], row['transaction_type'], row['quantity'],
+                 products[row['product_id']].price, row['location_id'])
+                for row in new_rows
+            ])
+            # Last before the commit: one counter update per location touched by the chunk, and a
+            # single central shard row (the first product's) for all central movements
+            per_location = {}
+            for row in new_rows:
+                per_location[row['location_id']] = per_location.get(row['location_id'], 0) + 1
+            for location_id in sorted(per_location, key=lambda l: (l is not None, l or 0)):
+                record_changes(
+                    low_stock=sum(
+                        low_stock_delta(old, product.min_stock_threshold, new, product.min_stock_threshold)
+                        for product, old, new, location in stock_changes if location is None
+                    ) if location_id is None else 0,
+                    transactions=per_location[location_id],
+                    location_id=location_id,
+                    product_id=next(row['product_id'] for row in new_rows if row['location_id'] == location_id)
                 )
-                send_email_async(subject, admin.email, body)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        # Database error text stays in the server log, not in the POS client's response
+        current_app.logger.exception('Bulk transaction chunk failed')
+        chunk_results = [
+            {'index': index, 'status': 'error', 'message': 'Chunk failed, retry these transactions'} for index, item in chunk
+        ]
+        stock_changes = []
+    results.extend(chunk_results)
 
-    return jsonify({'message': 'Transaction recorded', 'new_stock': product.stock_quantity}), 201
+    # Alerts and live deltas only for committed movements; digests collapse repeats per product
+    for product, old_stock, new_stock, location_id in stock_changes:
+        publish_stock(product.id, new_stock, location_id)
+        if location_id is None:
+            record_stock_change(product.id, product.name, product.sku, old_stock, new_stock, product.min_stock_threshold)
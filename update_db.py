@@ -1,7 +1,55 @@
-from app import app, db
+from sqlalchemy import inspect, text
+from app import create_app, db
+from config import BatchConfig
+from models import MovementRollup
+from search_index import ensure_search_index
+
+app = create_app(BatchConfig)
+
+def migrate_rollup_key(inspector):
+    """
+    movement_rollup gained location_id in its primary key, which ALTER TABLE can't
+    add: copy the rows into a table with the new key (existing rollups are all
+    central stock, location 0) and swap it in. Indexes are recreated below.
+    """
+    rollup = MovementRollup.__table__
+    if not inspector.has_table(rollup.name):
+        return
+    if 'location_id' in {column['name'] for column in inspector.get_columns(rollup.name)}:
+        return
+    # Same metadata, so the product foreign key resolves; taken out again once swapped in
+    staging = rollup.to_metadata(db.metadata, name=f'{rollup.name}_new')
+    # Index names are global on most backends; they are created on the final table afterwards
+    staging.indexes.clear()
+    names = ', '.join(f'"{column.name}"' for column in rollup.columns)
+    selected = ', '.join('0' if column.name == 'location_id' else f'"{column.name}"' for column in rollup.columns)
+    with db.engine.begin() as connection:
+        staging.create(connection)
+        connection.execute(text(f'INSERT INTO "{staging.name}" ({names}) SELECT {selected} FROM "{rollup.name}"'))
+        connection.execute(text(f'DROP TABLE "{rollup.name}"'))
+        connection.execute(text(f'ALTER TABLE "{staging.name}" RENAME TO "{rollup.name}"'))
+    db.metadata.remove(staging)
+    print(f"Migrated {rollup.name} to the (period, bucket, product_id, location_id) key")
 
 # This script will create any new tables defined in models.py that don't exist yet
 # It will NOT drop existing tables
 with app.app_context():
     db.create_all()
+    migrate_rollup_key(inspect(db.engine))
+    # create_all doesn't alter existing tables either: add new nullable columns (e.g. transaction.location_id)
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable and not column.primary_key:
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                with db.engine.begin() as connection:
+                    connection.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+                print(f"Added column {table.name}.{column.name}")
+    # create_all skips indexes on tables that already exist, so add any missing ones
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+    # Rebuild the SQLite full-text product search index (no-op on other databases)
+    ensure_search_index()
     print("Database schema updated successfully.")